@@ -1,5 +1,14 @@
+import mimetypes
+import os
+
 from django.shortcuts import redirect
 from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
 
 class AuthMiddleware:
     """
@@ -35,3 +44,79 @@ class AuthMiddleware:
 
         # Process the request
         return self.get_response(request)
+
+
+def accepted_encodings(header):
+    """
+    {content-coding: q-value} of an Accept-Encoding header, with tokens lower-cased;
+    a malformed q-value counts as 0.
+    """
+    encodings = {}
+    for item in header.split(','):
+        token, *params = [part.strip() for part in item.split(';')]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[token.lower()] = q
+    return encodings
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collected files from STATIC_ROOT, picking the .br/.gz copy written by
+    CompressedManifestStaticFilesStorage when the browser accepts it. Content-hashed
+    names never change, so they are cached for a year as immutable; anything else must
+    be revalidated. Requests for files that are not in STATIC_ROOT pass through (in
+    development runserver serves them from the app directories).
+    """
+    IMMUTABLE = 'public, max-age=31536000, immutable'
+    REVALIDATE = 'public, max-age=0, must-revalidate'
+    ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._hashed_names = None
+
+    def hashed_names(self):
+        if self._hashed_names is None:
+            self._hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._hashed_names
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL):
+            return self.get_response(request)
+        name = request.path[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return self.get_response(request)
+        if not os.path.isfile(path):
+            return self.get_response(request)
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding, served = None, path
+        for candidate, extension in self.ENCODINGS:
+            # "br;q=0" refuses Brotli; "*" stands for any coding not listed
+            if accepted.get(candidate, accepted.get('*', 0)) > 0 and os.path.isfile(path + extension):
+                encoding, served = candidate, path + extension
+                break
+
+        stat = os.stat(served)
+        if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path)
+            response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = self.IMMUTABLE if name in self.hashed_names() else self.REVALIDATE
+        return response
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Institute_Management.middleware.StaticFilesMiddleware',  # precompressed, cache-forever static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -123,9 +124,26 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# `collectstatic` writes content-hashed copies of every asset (plus .gz/.br variants),
+# which {% static %} links to and StaticFilesMiddleware serves with far-future caching.
+# Re-run it on every deploy.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'Institute_Management.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
 # Media files (user uploads like student photos)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered receipt/certificate PDFs (kept out of MEDIA_ROOT: they hold personal data)
+PDF_CACHE_DIR = BASE_DIR / 'pdf_cache'
+
+# Dues reminders (`manage.py dues_reminders`): the channels reminders are queued for, and
+# the SMS gateway ('apps.students.reminders.ConsoleSmsBackend' only prints them). Email
+# goes through EMAIL_BACKEND.
+DUES_REMINDER_CHANNELS = ['email']
+SMS_BACKEND = 'apps.students.reminders.ConsoleSmsBackend'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
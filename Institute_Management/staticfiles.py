@@ -0,0 +1,73 @@
+"""
+Static files storage used by collectstatic: content-hashed names plus precompressed copies.
+
+Every collected file gets a hashed copy (assets/vendor/libs/jquery/jquery.<hash>.js) that
+{% static %} links to, so browsers can cache it forever. Text assets are also written as
+.gz, and as .br when the brotli package is installed, for StaticFilesMiddleware to serve.
+"""
+import gzip
+import logging
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+}
+# Files this small gain nothing from compression
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert_or_keep(matchobj):
+            # Vendor CSS ships references to files that are not part of the theme
+            # (e.g. highlight.js' npm-style @import); leave those untouched.
+            try:
+                return converter(matchobj)
+            except ValueError:
+                logger.warning("%s: could not resolve %s", name, matchobj['url'])
+                return matchobj['matched']
+        return convert_or_keep
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (development checkout, tests): link the plain name
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for extension, compressed in variants:
+            if len(compressed) >= len(content) * 0.95:
+                continue
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self._save(name + extension, ContentFile(compressed))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EnquiriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.Enquiries'
+
+    def ready(self):
+        from . import funnel, matching  # noqa: F401  (funnel rollup and conversion matching receivers)
@@ -0,0 +1,74 @@
+"""
+Keeps EnquiryFunnelRollup in step with the rows it counts.
+
+A rollup row depends on its enquiries and on the enrollments they converted into, so
+every write that can move an enquiry between rows or change a conversion's status
+refreshes the affected rows after commit: Enquiry saves and deletes, StudentEnrollment
+saves and deletes, set-based trash/restore (soft_delete_changed), and (explicitly, as
+they send no signals) conversion matching, Payment.objects.post_batch and batch
+certificate completion.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Enquiry, EnquiryFunnelRollup
+from apps.Settings.models import soft_delete_changed
+from apps.students.models import StudentEnrollment
+
+FUNNEL_FIELDS = ('pk', 'created_at', 'course_id', 'referral_source', 'state')
+
+
+def _keys(enquiries):
+    return {enquiry.funnel_key() for enquiry in enquiries.only(*FUNNEL_FIELDS)}
+
+
+def refresh_funnel(keys):
+    """Recompute the given rollup rows once the transaction commits."""
+    keys = set(keys)
+    if keys:
+        transaction.on_commit(lambda: EnquiryFunnelRollup.objects.refresh(keys))
+
+
+def refresh_enquiries(enquiry_ids):
+    """Refresh the rollup rows counting these enquiries."""
+    refresh_funnel(_keys(Enquiry.all_objects.filter(pk__in=list(enquiry_ids))))
+
+
+def refresh_enrollments(enrollment_ids):
+    """Refresh the rollup rows counting enquiries that converted into these enrollments."""
+    refresh_funnel(_keys(Enquiry.all_objects.filter(converted_enrollment__in=list(enrollment_ids))))
+
+
+@receiver(post_save, sender=Enquiry, dispatch_uid='enquiry_funnel_saved')
+def _enquiry_saved(sender, instance, **kwargs):
+    refresh_funnel({instance._loaded_funnel_key, instance.funnel_key()})
+    instance._loaded_funnel_key = instance.funnel_key()
+
+
+@receiver(post_delete, sender=Enquiry, dispatch_uid='enquiry_funnel_deleted')
+def _enquiry_deleted(sender, instance, **kwargs):
+    refresh_funnel({instance._loaded_funnel_key, instance.funnel_key()})
+
+
+@receiver(post_save, sender=StudentEnrollment, dispatch_uid='enrollment_funnel_saved')
+def _enrollment_saved(sender, instance, created, **kwargs):
+    # A new enrollment has no enquiries yet; conversion matching refreshes them
+    if not created:
+        refresh_enrollments([instance.pk])
+
+
+@receiver(pre_delete, sender=StudentEnrollment, dispatch_uid='enrollment_funnel_deleted')
+def _enrollment_deleted(sender, instance, **kwargs):
+    # Read before the delete clears Enquiry.converted_enrollment
+    refresh_enrollments([instance.pk])
+
+
+@receiver(soft_delete_changed, sender=Enquiry, dispatch_uid='enquiry_funnel_trashed')
+def _enquiries_trashed(sender, pks, **kwargs):
+    refresh_enquiries(pks)
+
+
+@receiver(soft_delete_changed, sender=StudentEnrollment, dispatch_uid='enrollment_funnel_trashed')
+def _enrollments_trashed(sender, pks, **kwargs):
+    refresh_enrollments(pks)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.Enquiries.matching import MATCH_CHUNK_SIZE, match_queryset, unconverted_enquiries
+
+
+class Command(BaseCommand):
+    help = "Link past enquiries to the enrollments they turned into, by matching phone numbers and emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=MATCH_CHUNK_SIZE, help="Enquiries matched per batch of queries.")
+
+    def handle(self, *args, **options):
+        linked = match_queryset(unconverted_enquiries(), chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Linked {linked} enquiries to enrollments."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Enquiries.models import EnquiryFunnelRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute (or verify with --check) the enquiry funnel rollup from the enquiries and enrollments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report rollup rows that differ from the source tables.")
+
+    def handle(self, *args, **options):
+        expected = EnquiryFunnelRollup.compute()
+        stored = EnquiryFunnelRollup.objects.as_totals()
+        differing = [key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key)]
+        for key in sorted(differing, key=str):
+            self.stdout.write(f"{key}: stored={stored.get(key)} actual={expected.get(key)}")
+        self.stdout.write(f"EnquiryFunnelRollup: {len(expected)} rows, {len(differing)} differing.")
+
+        if options['check']:
+            if differing:
+                raise CommandError(f"{len(differing)} funnel rows are out of sync.")
+            self.stdout.write(self.style.SUCCESS("Funnel verified."))
+            return
+        EnquiryFunnelRollup.objects.replace_all(expected)
+        self.stdout.write(self.style.SUCCESS("Funnel rebuilt."))
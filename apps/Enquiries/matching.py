@@ -0,0 +1,128 @@
+"""
+Links enquiries to the enrollment they turned into.
+
+An enquiry converts when a student with the same email (or, failing that, the same
+phone number) enrolled on or after the enquiry date: into the enquired course if the
+student took it, otherwise into their first enrollment after the enquiry. Matching
+runs on the indexed phone_key / email_key columns of both tables, a chunk of enquiries
+at a time with a fixed number of queries per chunk. Saves of enquiries, students and
+enrollments match incrementally; `manage.py match_enquiries` covers history.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .funnel import refresh_enquiries
+from .models import Enquiry
+from apps.Settings.models import soft_delete_changed
+from apps.students.models import Student, StudentEnrollment
+
+MATCH_CHUNK_SIZE = 1000
+
+
+def unconverted_enquiries():
+    return Enquiry.objects.filter(is_deleted=False, converted_enrollment__isnull=True)
+
+
+def _by_key(rows):
+    """{key: set of student ids} from (student_id, key) pairs."""
+    index = {}
+    for student_id, key in rows:
+        if key:
+            index.setdefault(key, set()).add(student_id)
+    return index
+
+
+def match_enquiries(enquiries):
+    """
+    Link each of `enquiries` (Enquiry instances without a conversion) to its resulting
+    enrollment, if there is one. Returns the number linked.
+    """
+    enquiries = [enquiry for enquiry in enquiries if enquiry.phone_key or enquiry.email_key]
+    if not enquiries:
+        return 0
+    phones = {enquiry.phone_key for enquiry in enquiries if enquiry.phone_key}
+    emails = {enquiry.email_key for enquiry in enquiries if enquiry.email_key}
+    students = list(Student.objects.filter(
+        Q(phone_key__in=phones) | Q(email_key__in=emails), is_deleted=False,
+    ).values_list('pk', 'phone_key', 'email_key'))
+    if not students:
+        return 0
+    by_phone = _by_key((pk, phone) for pk, phone, _ in students)
+    by_email = _by_key((pk, email) for pk, _, email in students)
+
+    enrollments = {}
+    rows = StudentEnrollment.objects.filter(
+        student__in=[pk for pk, _, _ in students], is_deleted=False,
+    ).order_by('enrollment_date', 'pk').values_list('pk', 'student_id', 'course_id', 'enrollment_date')
+    for row in rows:
+        enrollments.setdefault(row[1], []).append(row)
+
+    now = timezone.now()
+    linked = []
+    for enquiry in enquiries:
+        # An email is personal; a phone number is often shared by a family
+        candidates = by_email.get(enquiry.email_key) or by_phone.get(enquiry.phone_key) or ()
+        enquired_on = timezone.localdate(enquiry.created_at)
+        later = [row for pk in candidates for row in enrollments.get(pk, ()) if row[3] >= enquired_on]
+        if not later:
+            continue
+        same_course = [row for row in later if row[2] == enquiry.course_id]
+        pk, student_id, _, _ = min(same_course or later, key=lambda row: (row[3], row[0]))
+        enquiry.converted_enrollment_id = pk
+        enquiry.converted_student_id = student_id
+        enquiry.converted_at = now
+        linked.append(enquiry)
+    Enquiry.objects.bulk_update(linked, ['converted_enrollment', 'converted_student', 'converted_at'])
+    refresh_enquiries([enquiry.pk for enquiry in linked])
+    return len(linked)
+
+
+def match_queryset(queryset, chunk_size=MATCH_CHUNK_SIZE):
+    """match_enquiries() over a queryset of enquiries, a chunk at a time. Returns the number linked."""
+    linked, chunk = 0, []
+    fields = ('pk', 'phone_key', 'email_key', 'course_id', 'created_at')
+    for enquiry in queryset.only(*fields).iterator(chunk_size=chunk_size):
+        chunk.append(enquiry)
+        if len(chunk) >= chunk_size:
+            linked += match_enquiries(chunk)
+            chunk = []
+    return linked + match_enquiries(chunk)
+
+
+def match_students(student_ids):
+    """Link the open enquiries that share an email or phone number with these students."""
+    keys = Student.objects.filter(pk__in=student_ids).values_list('phone_key', 'email_key')
+    phones = {phone for phone, _ in keys if phone}
+    emails = {email for _, email in keys if email}
+    if phones or emails:
+        match_queryset(unconverted_enquiries().filter(Q(phone_key__in=phones) | Q(email_key__in=emails)))
+
+
+@receiver(post_save, sender=Enquiry, dispatch_uid='enquiry_match_conversion')
+def _enquiry_saved(sender, instance, **kwargs):
+    if instance.converted_enrollment_id is None and not instance.is_deleted:
+        match_enquiries([instance])
+
+
+@receiver(soft_delete_changed, sender=Enquiry, dispatch_uid='enquiry_match_restored')
+def _enquiries_restored(sender, pks, deleted, **kwargs):
+    if not deleted:
+        match_queryset(unconverted_enquiries().filter(pk__in=pks))
+
+
+@receiver(post_save, sender=StudentEnrollment, dispatch_uid='enrollment_match_enquiries')
+def _enrollment_saved(sender, instance, created, **kwargs):
+    if created:
+        student_id = instance.student_id
+        transaction.on_commit(lambda: match_students([student_id]))
+
+
+@receiver(post_save, sender=Student, dispatch_uid='student_match_enquiries')
+def _student_saved(sender, instance, created, update_fields=None, **kwargs):
+    # A new or corrected phone/email can match enquiries made before the enrollment
+    if not created and (update_fields is None or {'contact', 'email'} & set(update_fields)):
+        student_id = instance.pk
+        transaction.on_commit(lambda: match_students([student_id]))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.students.models import normalise_email, normalise_phone
+
+
+def backfill_match_keys(apps, schema_editor):
+    Enquiry = apps.get_model('Enquiries', 'Enquiry')
+    batch = []
+    for obj in Enquiry.objects.only('pk', 'phone', 'email').iterator(chunk_size=2000):
+        obj.phone_key = normalise_phone(obj.phone)
+        obj.email_key = normalise_email(obj.email)
+        batch.append(obj)
+        if len(batch) >= 2000:
+            Enquiry.objects.bulk_update(batch, ['phone_key', 'email_key'])
+            batch = []
+    Enquiry.objects.bulk_update(batch, ['phone_key', 'email_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Enquiries', '0001_initial'),
+        ('students', '0009_match_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enquiry',
+            name='converted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='converted_enrollment',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='enquiries', to='students.studentenrollment'),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='converted_student',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='enquiries', to='students.student'),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='email_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='phone_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_match_keys, migrations.RunPython.noop),
+    ]
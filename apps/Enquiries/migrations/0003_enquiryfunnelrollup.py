@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.Enquiries.models import EnquiryFunnelRollup as CurrentRollup
+
+
+def backfill_funnel(apps, schema_editor):
+    Enquiry = apps.get_model('Enquiries', 'Enquiry')
+    EnquiryFunnelRollup = apps.get_model('Enquiries', 'EnquiryFunnelRollup')
+    EnquiryFunnelRollup.objects.bulk_create([
+        EnquiryFunnelRollup(**dict(zip(CurrentRollup.ROLLUP_KEY, key)), **dict(zip(CurrentRollup.STAGES, counts)))
+        for key, counts in CurrentRollup.compute(enquiry_model=Enquiry).items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Enquiries', '0002_enquiry_conversion'),
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnquiryFunnelRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('referral_source', models.CharField(blank=True, default='', max_length=20)),
+                ('state', models.CharField(blank=True, default='', max_length=50)),
+                ('enquiries', models.PositiveIntegerField(default=0)),
+                ('enrolled', models.PositiveIntegerField(default=0)),
+                ('fully_paid', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+            ],
+            options={
+                'unique_together': {('month', 'course', 'referral_source', 'state')},
+            },
+        ),
+        migrations.RunPython(backfill_funnel, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Enquiries', '0003_enquiryfunnelrollup'),
+        ('courses', '0002_listing_indexes'),
+        ('students', '0011_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['is_deleted', 'created_at'], name='enquiry_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at'], name='enquiry_list_pidx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['is_deleted', 'deleted_at'], name='enquiry_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='enquiry_trash_pidx'),
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+import datetime
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, DateField, Max, Min, Q, Value, When
 from django.utils import timezone
 from apps.courses.models import Course
-from apps.students.models import Student
+from apps.Settings.models import SoftDeleteMixin, soft_delete_indexes
+from apps.students.models import Student, StudentEnrollment, month_start, normalise_email, normalise_phone
 
 # State Choices
 INDIAN_STATES = [
@@ -52,7 +56,7 @@ REFERRAL_SOURCE_CHOICES = [
     ('other', 'Other'),
 ]
 
-class Enquiry(models.Model):
+class Enquiry(SoftDeleteMixin):
     name = models.CharField(max_length=200)
     email = models.EmailField(max_length=254, blank=True, null=True)  # made optional
     phone = models.CharField(max_length=15)
@@ -85,21 +89,42 @@ class Enquiry(models.Model):
     message = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # Soft delete fields
-    is_deleted = models.BooleanField(default=False)
-    deleted_at = models.DateTimeField(blank=True, null=True)
+    # normalise_phone(phone) / normalise_email(email), matched against the same keys on Student
+    phone_key = models.CharField(max_length=10, blank=True, default='', db_index=True, editable=False)
+    email_key = models.CharField(max_length=254, blank=True, default='', db_index=True, editable=False)
+
+    # The enrollment this enquiry turned into, filled in by apps.Enquiries.matching
+    converted_student = models.ForeignKey(
+        Student, on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='enquiries',
+    )
+    converted_enrollment = models.ForeignKey(
+        StudentEnrollment, on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='enquiries',
+    )
+    converted_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Where this enquiry is counted in EnquiryFunnelRollup, as loaded
+        self._loaded_funnel_key = self.funnel_key() if self.pk else None
 
-    def delete(self, *args, **kwargs):
-        # Soft delete implementation
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    def funnel_key(self):
+        """This enquiry's EnquiryFunnelRollup key, or None if a field it needs is deferred."""
+        values = self.__dict__
+        if any(name not in values for name in ('created_at', 'course_id', 'referral_source', 'state')):
+            return None
+        created_at = values['created_at'] or timezone.now()
+        return (
+            month_start(timezone.localtime(created_at)), values['course_id'],
+            values['referral_source'] or '', values['state'] or '',
+        )
 
-    def restore(self):
-        # Restore a soft-deleted enquiry
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    def save(self, *args, **kwargs):
+        self.phone_key = normalise_phone(self.phone)
+        self.email_key = normalise_email(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'phone', 'email'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'phone_key', 'email_key'}
+        super().save(*args, **kwargs)
 
     def get_referral_source_display(self):
         return dict(REFERRAL_SOURCE_CHOICES).get(self.referral_source, self.referral_source or "-")
@@ -108,12 +133,14 @@ class Enquiry(models.Model):
         """
         Returns the Student object if reference_registration_number matches a student.
         """
-        if self.reference_registration_number:
-            try:
-                return Student.objects.get(student_id=self.reference_registration_number)
-            except Student.DoesNotExist:
-                return None
-        return None
+        if not self.reference_registration_number:
+            return None
+        # Looked up once per instance; the detail page asks for it more than once
+        cached = getattr(self, '_reference_student', None)
+        if cached is None or cached[0] != self.reference_registration_number:
+            student = Student.objects.filter(student_id=self.reference_registration_number).first()
+            self._reference_student = cached = (self.reference_registration_number, student)
+        return cached[1]
 
     def reference_student_data(self):
         """
@@ -139,3 +166,149 @@ class Enquiry(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = soft_delete_indexes('enquiry', list=['created_at'])
+
+
+# An enquiry counts as converted while the enrollment it converted into is not in the trash
+CONVERTED = Q(converted_enrollment__isnull=False, converted_enrollment__is_deleted=False)
+
+
+class EnquiryFunnelManager(models.Manager):
+
+    def refresh(self, keys):
+        """
+        Recompute the rows for `keys` (ROLLUP_KEY tuples) from the enquiries they count.
+        Each row is overwritten with absolute numbers, so repeating a refresh is harmless.
+        """
+        keys = {key for key in keys if key is not None}
+        if not keys:
+            return
+        totals = self.model.compute(keys)
+        with transaction.atomic():
+            for key in keys:
+                lookup = dict(zip(self.model.ROLLUP_KEY, key))
+                counts = dict(zip(self.model.STAGES, totals.get(key, ())))
+                if not counts:
+                    self.filter(**lookup).delete()
+                    continue
+                if self.filter(**lookup).update(**counts):
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(**lookup, **counts)
+                except IntegrityError:
+                    # Another writer inserted the row first
+                    self.filter(**lookup).update(**counts)
+
+    def replace_all(self, totals):
+        """Replace the whole table with {key tuple: stage counts} in one transaction."""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [self.model(**dict(zip(self.model.ROLLUP_KEY, key)), **dict(zip(self.model.STAGES, counts)))
+                 for key, counts in totals.items()],
+                batch_size=1000,
+            )
+
+    def as_totals(self):
+        """The stored rows as {key tuple: stage counts}, for comparing with a rebuild."""
+        return {
+            tuple(row[:len(self.model.ROLLUP_KEY)]): tuple(row[len(self.model.ROLLUP_KEY):])
+            for row in self.values_list(*self.model.ROLLUP_KEY, *self.model.STAGES)
+        }
+
+
+class EnquiryFunnelRollup(models.Model):
+    """
+    Enquiries pre-aggregated per month of enquiry, course, referral source and state, with
+    how many of them went on to enroll, pay in full and complete the course (through the
+    enrollment each converted into). Kept up to date by Enquiry and StudentEnrollment
+    writes (see funnel.py); `manage.py rebuild_enquiry_funnel` recomputes it from scratch.
+    """
+    month = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    referral_source = models.CharField(max_length=20, blank=True, default='')
+    state = models.CharField(max_length=50, blank=True, default='')
+    enquiries = models.PositiveIntegerField(default=0)
+    enrolled = models.PositiveIntegerField(default=0)
+    fully_paid = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+
+    ROLLUP_KEY = ('month', 'course_id', 'referral_source', 'state')
+    STAGES = ('enquiries', 'enrolled', 'fully_paid', 'completed')
+
+    objects = EnquiryFunnelManager()
+
+    class Meta:
+        unique_together = ('month', 'course', 'referral_source', 'state')
+
+    @staticmethod
+    def _month_range(month):
+        """The aware [start, end) datetimes of a month in the current time zone."""
+        start = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+        end = timezone.make_aware(datetime.datetime.combine(month_start(month + datetime.timedelta(days=31)), datetime.time.min))
+        return start, end
+
+    @classmethod
+    def _month_of_created_at(cls, months):
+        """
+        created_at's month, bucketed against the local month boundaries of `months`. Not
+        TruncMonth: on MySQL that converts time zones in SQL, which returns NULL unless the
+        server's time zone tables are loaded.
+        """
+        whens = []
+        for month in sorted(months):
+            start, end = cls._month_range(month)
+            whens.append(When(created_at__gte=start, created_at__lt=end, then=Value(month)))
+        return Case(*whens, output_field=DateField())
+
+    @classmethod
+    def _key_filter(cls, key):
+        month, course_id, referral_source, state = key
+        start, end = cls._month_range(month)
+        condition = Q(created_at__gte=start, created_at__lt=end, course_id=course_id)
+        condition &= Q(referral_source=referral_source) if referral_source else Q(referral_source__isnull=True) | Q(referral_source='')
+        condition &= Q(state=state) if state else Q(state__isnull=True) | Q(state='')
+        return condition
+
+    @classmethod
+    def compute(cls, keys=None, enquiry_model=None):
+        """
+        Stage counts recomputed from the Enquiry table, all of them or just for `keys`:
+        {key tuple: (enquiries, enrolled, fully_paid, completed)}. Deleted enquiries are not
+        counted, nor conversions into deleted enrollments.
+        """
+        enquiries = (enquiry_model or Enquiry).objects.filter(is_deleted=False)
+        if keys is not None:
+            condition = Q()
+            for key in keys:
+                condition |= cls._key_filter(key)
+            enquiries = enquiries.filter(condition)
+            months = {key[0] for key in keys}
+        else:
+            bounds = enquiries.aggregate(first=Min('created_at'), last=Max('created_at'))
+            months = set()
+            if bounds['first'] is not None:
+                month, last = (month_start(timezone.localtime(bounds[end])) for end in ('first', 'last'))
+                while month <= last:
+                    months.add(month)
+                    month = month_start(month + datetime.timedelta(days=31))
+        if not months:
+            return {}
+        rows = enquiries.annotate(month=cls._month_of_created_at(months)).values_list(
+            'month', 'course_id', 'referral_source', 'state',
+        ).annotate(
+            enquiries=Count('pk'),
+            enrolled=Count('pk', filter=CONVERTED),
+            fully_paid=Count('pk', filter=CONVERTED & Q(converted_enrollment__payment_status='paid')),
+            completed=Count('pk', filter=CONVERTED & Q(converted_enrollment__status='completed')),
+        ).order_by()
+        totals = {}
+        for month, course_id, referral_source, state, *counts in rows:
+            key = (month_start(month), course_id, referral_source or '', state or '')
+            previous = totals.get(key, (0, 0, 0, 0))
+            totals[key] = tuple(a + b for a, b in zip(previous, counts))
+        return totals
+
+    def __str__(self):
+        return f"{self.month:%b %Y} {self.course_id} {self.referral_source or '-'} {self.state or '-'}: {self.enquiries}"
@@ -1,3 +1,195 @@
+import datetime
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Enquiry, EnquiryFunnelRollup
+from apps.courses.models import Course
+from apps.students.models import Payment, Student, StudentEnrollment
+
+
+class ReportFilterTests(TestCase):
+    """Malformed date filters are ignored rather than failing the report."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+
+    def test_funnel_month_out_of_range(self):
+        response = self.client.get(reverse('enquiry_funnel_report'), {'from': '2026-13', 'to': '2026-00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['filters']['from'], '2026-13')
+
+    def test_conversion_impossible_date(self):
+        response = self.client.get(reverse('enquiry_conversion_report'), {'from': '2026-02-30', 'to': '2026-04-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['date_from'])
+
+
+class ConversionReportTests(TestCase):
+    """The conversion report and the funnel agree on what counts as converted."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        course = Course.objects.create(course_name='Tally', course_fee=Decimal('3000'), course_duration=3)
+        student = Student.objects.create(
+            full_name='Asha Rao', father_name='Ravi Rao', gender='female', email='asha@example.com',
+            dob=datetime.date(2001, 5, 4), contact='9876543210', state='Goa', city='Panaji', pincode='403001',
+        )
+        self.enrollment = StudentEnrollment.objects.create(student=student, course=course, admission_fee=Decimal('500'))
+        for name in ('Asha Rao', 'Meera Nair'):
+            Enquiry.objects.create(name=name, phone='9000000000', state='Goa', city='Panaji', course=course)
+        Enquiry.objects.filter(name='Asha Rao').update(converted_enrollment=self.enrollment)
+
+    def converted(self):
+        response = self.client.get(reverse('enquiry_conversion_report'))
+        funnel = sum(counts[1] for counts in EnquiryFunnelRollup.compute().values())
+        return response.context['totals']['converted'], response.context['by_course'][0]['converted'], funnel
+
+    def test_trashed_enrollment_not_converted(self):
+        self.assertEqual(self.converted(), (1, 1, 1))
+        StudentEnrollment.objects.filter(pk=self.enrollment.pk).soft_delete()
+        self.assertEqual(self.converted(), (0, 0, 0))
+
+
+class MatchingTests(TestCase):
+    """Enquiries are linked to the enrollment they turned into, by email first, then by phone."""
+
+    def setUp(self):
+        self.tally = Course.objects.create(course_name='Tally', course_fee=Decimal('3000'), course_duration=3)
+        self.python = Course.objects.create(course_name='Python', course_fee=Decimal('9000'), course_duration=6)
+
+    def student(self, name, email, contact):
+        return Student.objects.create(
+            full_name=name, father_name='Ravi Rao', gender='female', email=email, dob=datetime.date(2001, 5, 4),
+            contact=contact, state='Goa', city='Panaji', pincode='403001',
+        )
+
+    def enquiry(self, name, phone, email=None, course=None):
+        return Enquiry.objects.create(name=name, phone=phone, email=email, state='Goa', city='Panaji', course=course or self.tally)
+
+    def enroll(self, student, course, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return StudentEnrollment.objects.create(student=student, course=course, admission_fee=Decimal('500'), **fields)
+
+    def test_on_enrollment(self):
+        by_email = self.enquiry('Asha', '9000000001', email='Asha@Example.com')
+        by_phone = self.enquiry('Bina', '+91 90000 00002', course=self.python)
+        asha = self.student('Asha Rao', 'asha@example.com', '9111111111')
+        with self.captureOnCommitCallbacks(execute=True):
+            # Enrolled in two courses at once: the enquired one counts
+            StudentEnrollment.objects.create(student=asha, course=self.python, admission_fee=Decimal('500'))
+            tally = StudentEnrollment.objects.create(student=asha, course=self.tally, admission_fee=Decimal('500'))
+        # Bina's brother enrolls with the family phone; the sister enquired
+        self.enroll(self.student('Dev Rao', 'dev@example.com', '9000000002'), self.python)
+        brother_enrollment = StudentEnrollment.objects.get(student__full_name='Dev Rao')
+
+        by_email.refresh_from_db()
+        self.assertEqual((by_email.converted_enrollment, by_email.converted_student), (tally, asha))
+        by_phone.refresh_from_db()
+        self.assertEqual(by_phone.converted_enrollment, brother_enrollment)
+        self.assertIsNotNone(by_phone.converted_at)
+
+    def test_email_before_phone_and_dates(self):
+        # Shares a phone with one student and the email of another
+        enquiry = self.enquiry('Asha', '9000000001', email='asha@example.com')
+        asha = self.student('Asha Rao', 'asha@example.com', '9111111111')
+        self.enroll(self.student('Mira Rao', 'mira@example.com', '9000000001'), self.tally)
+        enquiry.refresh_from_db()
+        self.assertIsNone(enquiry.converted_enrollment)  # the email's owner has not enrolled yet
+
+        self.enroll(asha, self.tally, enrollment_date=datetime.date.today() - datetime.timedelta(days=30))
+        enquiry.refresh_from_db()
+        self.assertIsNone(enquiry.converted_enrollment)  # enrolled before enquiring
+        later = self.enroll(asha, self.python)
+        enquiry.refresh_from_db()
+        self.assertEqual(enquiry.converted_enrollment, later)
+
+    def test_existing_enrollment_and_command(self):
+        asha = self.student('Asha Rao', 'asha@example.com', '9111111111')
+        enrollment = self.enroll(asha, self.tally)
+        self.assertEqual(self.enquiry('Asha', '9111111111').converted_enrollment, enrollment)
+
+        Enquiry.objects.update(converted_enrollment=None, converted_student=None, converted_at=None)
+        out = io.StringIO()
+        call_command('match_enquiries', stdout=out)
+        self.assertIn('Linked 1 enquiries', out.getvalue())
+        self.assertEqual(Enquiry.objects.get().converted_enrollment, enrollment)
+
+
+class FunnelRollupTests(TestCase):
+    """Each write that moves an enquiry through the funnel keeps the rollup equal to a rebuild."""
+
+    def setUp(self):
+        self.tally = Course.objects.create(course_name='Tally', course_fee=Decimal('3000'), course_duration=3)
+        self.month = timezone.localdate().replace(day=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enquiry = Enquiry.objects.create(
+                name='Asha', phone='9000000001', email='asha@example.com', state='Goa', city='Panaji', course=self.tally,
+            )
+
+    def assertStages(self, stages):
+        key = (self.month, self.tally.pk, '', 'Goa')
+        self.assertEqual(EnquiryFunnelRollup.objects.as_totals().get(key), stages)
+        call_command('rebuild_enquiry_funnel', check=True, stdout=io.StringIO())
+
+    def test_stages(self):
+        self.assertStages((1, 0, 0, 0))
+        student = Student.objects.create(
+            full_name='Asha Rao', father_name='Ravi Rao', gender='female', email='asha@example.com',
+            dob=datetime.date(2001, 5, 4), contact='9111111111', state='Goa', city='Panaji', pincode='403001',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = StudentEnrollment.objects.create(student=student, course=self.tally, admission_fee=Decimal('500'))
+        self.assertStages((1, 1, 0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.post_batch([
+                Payment(enrollment=enrollment, amount=amount, amount_paid=amount, payment_mode='cash', remarks=remarks)
+                for remarks, amount in (('Admission Fee', Decimal('500')), ('Course Fee', Decimal('3000')))
+            ])
+        self.assertStages((1, 1, 1, 0))
+
+    def test_trash_and_edits(self):
+        student = Student.objects.create(
+            full_name='Asha Rao', father_name='Ravi Rao', gender='female', email='asha@example.com',
+            dob=datetime.date(2001, 5, 4), contact='9111111111', state='Goa', city='Panaji', pincode='403001',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = StudentEnrollment.objects.create(student=student, course=self.tally, admission_fee=Decimal('500'))
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.status = 'completed'
+            enrollment.save()
+        self.assertStages((1, 1, 0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentEnrollment.objects.filter(pk=enrollment.pk).soft_delete()
+        self.assertStages((1, 0, 0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentEnrollment.all_objects.filter(pk=enrollment.pk).restore()
+        self.assertStages((1, 1, 0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enquiry.state = 'Kerala'
+            self.enquiry.save()
+        self.assertStages(None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enquiry.state = 'Goa'
+            self.enquiry.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.hard_delete()
+        self.assertStages((1, 0, 0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enquiry.delete()
+        self.assertStages(None)
 
-# Create your tests here.
+    def test_check_and_rebuild(self):
+        EnquiryFunnelRollup.objects.update(enquiries=5)
+        with self.assertRaisesMessage(CommandError, '1 funnel rows are out of sync.'):
+            call_command('rebuild_enquiry_funnel', check=True, stdout=io.StringIO())
+        call_command('rebuild_enquiry_funnel', stdout=io.StringIO())
+        self.assertStages((1, 0, 0, 0))
@@ -8,6 +8,8 @@ urlpatterns = [
     path('edit/<int:pk>/', views.enquiry_edit, name='enquiry_edit'),
     path('delete/<int:pk>/', views.enquiry_delete, name='enquiry_delete'),
     path('detail/<int:pk>/', views.enquiry_detail, name='enquiry_detail'),
+    path('conversions/', views.conversion_report, name='enquiry_conversion_report'),
+    path('funnel/', views.funnel_report, name='enquiry_funnel_report'),
 
     # Trash and Restore
     path('trash/', views.enquiry_trash, name='enquiry_trash'),
@@ -1,13 +1,18 @@
+import datetime
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q
+from django.db import models
+from django.db.models import Count, Q, Sum
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from .models import Enquiry, INDIAN_STATES, REFERRAL_SOURCE_CHOICES
+from .models import CONVERTED, Enquiry, EnquiryFunnelRollup, INDIAN_STATES, REFERRAL_SOURCE_CHOICES
 from .forms import EnquiryForm
 from apps.courses.models import Course
-from apps.students.models import Student
+from apps.students.models import Student, StudentEnrollment
 
 
 @login_required
@@ -103,6 +108,9 @@ def enquiry_detail(request, pk):
         'sidebar_active': 'enquiries',
         'enquiry': enquiry,
         'referenced_student': referenced_student,
+        'converted_enrollment': StudentEnrollment.objects.select_related('course').filter(
+            pk=enquiry.converted_enrollment_id,
+        ).first() if enquiry.converted_enrollment_id else None,
     }
     return render(request, 'enquiries/enquiry_detail.html', context)
 
@@ -110,14 +118,9 @@ def enquiry_detail(request, pk):
 @login_required
 def enquiry_trash(request):
     """
-    View list of soft-deleted enquiries (Trash).
+    Trashed enquiries are listed on the Enquiries tab of the shared trash page.
     """
-    enquiries = Enquiry.objects.filter(is_deleted=True).order_by('-deleted_at')
-    context = {
-        'sidebar_active': 'enquiries',
-        'enquiries': enquiries,
-    }
-    return render(request, 'enquiries/enquiry_trash.html', context)
+    return redirect(f"{reverse('student_trash')}?tab=enquiries")
 
 
 @login_required
@@ -138,9 +141,9 @@ def enquiry_permanent_delete(request, pk):
     """
     Permanently delete an enquiry from database.
     """
-    enquiry = get_object_or_404(Enquiry, pk=pk)
+    enquiry = get_object_or_404(Enquiry, pk=pk, is_deleted=True)
     if request.method == 'POST':
-        enquiry.delete(hard=True)  # Assuming model supports hard delete with this parameter
+        enquiry.hard_delete()
         messages.success(request, "❌ Enquiry permanently deleted.")
         return redirect('enquiry_trash')
     return render(request, 'enquiries/enquiry_permanent_delete_confirm.html', {'enquiry': enquiry, 'sidebar_active': 'enquiries'})
@@ -167,3 +170,155 @@ def api_enquiry_referral_lookup(request):
         return JsonResponse(data)
     except Student.DoesNotExist:
         return JsonResponse({'error': 'Not found'}, status=404)
+
+
+def _conversion_rows(queryset, group_by, labels=None):
+    """
+    Enquiries, conversions and conversion rate per value of `group_by`, busiest first.
+    Conversions into trashed enrollments are not counted, as in the funnel report.
+    """
+    rows = queryset.values(group_by).annotate(
+        enquiries=Count('pk'),
+        converted=Count('pk', filter=CONVERTED),
+        same_course=Count('pk', filter=CONVERTED & Q(converted_enrollment__course=models.F('course'))),
+    ).order_by('-enquiries', group_by)
+    result = []
+    for row in rows:
+        key = row[group_by]
+        result.append({
+            'label': (labels or {}).get(key, key) or 'Not specified',
+            'enquiries': row['enquiries'],
+            'converted': row['converted'],
+            'same_course': row['same_course'],
+            'rate': round(100 * row['converted'] / row['enquiries'], 1) if row['enquiries'] else 0,
+        })
+    return result
+
+
+def _parse_day(value):
+    """A YYYY-MM-DD date, or None (also for an impossible date such as 2026-02-30)."""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def _day_start(day):
+    """Local midnight at the start of `day`, as an aware datetime."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+@login_required
+def conversion_report(request):
+    """
+    Enquiry-to-enrollment conversion per course and per referral source, for enquiries
+    made between the optional `from` and `to` dates.
+    """
+    enquiries = Enquiry.objects.filter(is_deleted=False)
+    date_from = _parse_day(request.GET.get('from'))
+    date_to = _parse_day(request.GET.get('to'))
+    # Bounds on created_at itself (not its date) so the range is an index seek
+    if date_from:
+        enquiries = enquiries.filter(created_at__gte=_day_start(date_from))
+    if date_to:
+        enquiries = enquiries.filter(created_at__lt=_day_start(date_to + datetime.timedelta(days=1)))
+
+    totals = enquiries.aggregate(enquiries=Count('pk'), converted=Count('pk', filter=CONVERTED))
+    context = {
+        'sidebar_active': 'enquiries',
+        'by_course': _conversion_rows(enquiries, 'course__course_name'),
+        'by_source': _conversion_rows(enquiries, 'referral_source', dict(REFERRAL_SOURCE_CHOICES)),
+        'totals': totals,
+        'overall_rate': round(100 * totals['converted'] / totals['enquiries'], 1) if totals['enquiries'] else 0,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
+    return render(request, 'enquiries/conversion_report.html', context)
+
+
+# ?by= value: (rollup column grouped on, column heading)
+FUNNEL_DIMENSIONS = {
+    'course': ('course__course_name', 'Course'),
+    'source': ('referral_source', 'Referral Source'),
+    'state': ('state', 'State'),
+    'month': ('month', 'Month'),
+}
+
+
+def _parse_month(value):
+    """First day of a YYYY-MM month, or None (also for an impossible month such as 2026-13)."""
+    try:
+        return parse_date(f'{value}-01') if value else None
+    except ValueError:
+        return None
+
+
+@login_required
+def funnel_report(request):
+    """
+    Enquiries -> enrolled -> fully paid -> completed, broken down by course, referral
+    source, state or month of enquiry. Read from EnquiryFunnelRollup, never from the
+    Enquiry table.
+    """
+    by = request.GET.get('by')
+    if by not in FUNNEL_DIMENSIONS:
+        by = 'course'
+    column, heading = FUNNEL_DIMENSIONS[by]
+
+    rows = EnquiryFunnelRollup.objects.all()
+    month_from = _parse_month(request.GET.get('from'))
+    month_to = _parse_month(request.GET.get('to'))
+    if month_from:
+        rows = rows.filter(month__gte=month_from)
+    if month_to:
+        rows = rows.filter(month__lte=month_to)
+    course_id = request.GET.get('course')
+    if course_id and course_id.isdigit():
+        rows = rows.filter(course_id=course_id)
+    source = request.GET.get('source')
+    if source:
+        rows = rows.filter(referral_source=source)
+    state = request.GET.get('state')
+    if state:
+        rows = rows.filter(state=state)
+
+    stages = {stage: Sum(stage) for stage in EnquiryFunnelRollup.STAGES}
+    grouped = rows.values(column).annotate(**stages).order_by(column if by == 'month' else '-enquiries', column)
+    labels = {'source': dict(REFERRAL_SOURCE_CHOICES), 'state': dict(INDIAN_STATES)}.get(by, {})
+    breakdown = []
+    for row in grouped:
+        value = row[column]
+        if by == 'month':
+            label = f"{value:%b %Y}"
+        else:
+            label = labels.get(value, value) or 'Not specified'
+        breakdown.append({'label': label, **_funnel_stages(row)})
+
+    context = {
+        'sidebar_active': 'enquiries',
+        'by': by,
+        'heading': heading,
+        'dimensions': [(key, title) for key, (_, title) in FUNNEL_DIMENSIONS.items()],
+        'breakdown': breakdown,
+        'totals': _funnel_stages(rows.aggregate(**stages)),
+        'courses': Course.objects.filter(is_deleted=False).order_by('course_name'),
+        'referral_sources': REFERRAL_SOURCE_CHOICES,
+        'states': INDIAN_STATES,
+        'filters': {
+            'from': request.GET.get('from', ''), 'to': request.GET.get('to', ''),
+            'course': course_id or '', 'source': source or '', 'state': state or '',
+        },
+    }
+    return render(request, 'enquiries/funnel_report.html', context)
+
+
+def _funnel_stages(row):
+    """Stage counts of an aggregated rollup row, each with its share of the enquiries."""
+    enquiries = row['enquiries'] or 0
+    return {
+        stage: {
+            'count': row[stage] or 0,
+            'rate': round(100 * (row[stage] or 0) / enquiries, 1) if enquiries else 0,
+        }
+        for stage in EnquiryFunnelRollup.STAGES
+    }
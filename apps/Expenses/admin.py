@@ -1,8 +1,18 @@
 from django.contrib import admin
 from .models import Expense
+from apps.students.exports import export_expenses
 
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
     list_display = ('expense_name', 'expense_by', 'amount', 'date')
     search_fields = ('expense_name', 'expense_by__name')
     list_filter = ('expense_by', 'date')
+    actions = ['export_csv', 'export_xlsx']
+
+    @admin.action(description="Export selected expenses (CSV)")
+    def export_csv(self, request, queryset):
+        return export_expenses(queryset, 'csv')
+
+    @admin.action(description="Export selected expenses (Excel)")
+    def export_xlsx(self, request, queryset):
+        return export_expenses(queryset, 'xlsx')
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:34
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_expense_rollup(apps, schema_editor):
+    Expense = apps.get_model('Expenses', 'Expense')
+    MonthlyExpenseRollup = apps.get_model('Expenses', 'MonthlyExpenseRollup')
+    rows = Expense.objects.filter(is_deleted=False).annotate(month=TruncMonth('date')).values(
+        'month', 'expense_by_id',
+    ).annotate(total=Sum('amount'), count=Count('pk')).order_by()
+    MonthlyExpenseRollup.objects.bulk_create([
+        MonthlyExpenseRollup(month=row['month'], expense_by_id=row['expense_by_id'],
+                             total_amount=row['total'], entries=row['count'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses', '0001_initial'),
+        ('Teams', '0002_team_deleted_at_team_is_deleted_alter_team_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('entries', models.IntegerField(default=0)),
+                ('expense_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Teams.team')),
+            ],
+            options={
+                'unique_together': {('month', 'expense_by')},
+            },
+        ),
+        migrations.RunPython(backfill_expense_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses', '0002_monthlyexpenserollup'),
+        ('Teams', '0003_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['is_deleted', 'date'], name='expense_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['date'], name='expense_list_pidx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['is_deleted', 'deleted_at'], name='expense_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='expense_trash_pidx'),
+        ),
+    ]
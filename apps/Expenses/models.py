@@ -1,27 +1,97 @@
-from django.db import models
-from django.utils import timezone
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from apps.Settings.models import RollupManager, SoftDeleteMixin, rollup_deltas, soft_delete_changed, soft_delete_indexes
 from apps.Teams.models import Team
 
-class Expense(models.Model):
+class Expense(SoftDeleteMixin):
     expense_name = models.CharField(max_length=255)
     expense_by = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='expenses')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     remarks = models.TextField(blank=True, null=True)
     date = models.DateField(auto_now_add=True)
-    
-    # Add these two fields for soft delete
-    is_deleted = models.BooleanField(default=False)
-    deleted_at = models.DateTimeField(blank=True, null=True)
 
-    def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # Where the stored row is counted in the monthly rollup, before this save changes it
+            previous = None
+            if not self._state.adding:
+                previous = Expense.all_objects.filter(pk=self.pk).first()
+            super().save(*args, **kwargs)
+
+            deltas = rollup_deltas()
+            if previous:
+                previous.add_to_rollup(deltas, sign=-1)
+            self.add_to_rollup(deltas)
+            MonthlyExpenseRollup.objects.add(deltas)
 
-    def restore(self):
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    def add_to_rollup(self, deltas, sign=1):
+        """Add (or with sign=-1 remove) this expense's contribution to MonthlyExpenseRollup deltas."""
+        if self.is_deleted:
+            return
+        delta = deltas[(self.date.replace(day=1), self.expense_by_id)]
+        delta[0] += sign * Decimal(self.amount)
+        delta[1] += sign
+
+    class Meta:
+        indexes = soft_delete_indexes('expense', list=['date'])
 
     def __str__(self):
         return f"{self.expense_name} - ₹{self.amount} by {self.expense_by.name}"
+
+
+@receiver(post_delete, sender=Expense, dispatch_uid='expense_rollup_post_delete')
+def _expense_deleted(sender, instance, **kwargs):
+    # Hard deletes (queryset.delete(), cascades from Team)
+    deltas = rollup_deltas()
+    instance.add_to_rollup(deltas, sign=-1)
+    MonthlyExpenseRollup.objects.add(deltas)
+
+
+@receiver(soft_delete_changed, sender=Expense, dispatch_uid='expense_rollup_soft_delete')
+def _expenses_trashed(sender, pks, deleted, **kwargs):
+    # Set-based trash/restore (e.g. with their team member): take the expenses out of the rollup, or put them back
+    rows = Expense.all_objects.filter(pk__in=pks).annotate(month=TruncMonth('date')).values_list(
+        'month', 'expense_by_id',
+    ).annotate(total=Sum('amount'), count=Count('pk')).order_by()
+    sign = -1 if deleted else 1
+    deltas = rollup_deltas()
+    for month, expense_by_id, total, count in rows:
+        delta = deltas[(month, expense_by_id)]
+        delta[0] += sign * total
+        delta[1] += sign * count
+    MonthlyExpenseRollup.objects.add(deltas)
+
+
+class MonthlyExpenseRollup(models.Model):
+    """
+    Expenses pre-aggregated per month and spender for the summary reports. Kept up to
+    date by Expense writes; soft-deleted expenses are not counted.
+    `manage.py rebuild_finance_rollups` recomputes it from scratch.
+    """
+    month = models.DateField()
+    expense_by = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='+')
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    entries = models.IntegerField(default=0)
+
+    ROLLUP_KEY = ('month', 'expense_by_id')
+
+    objects = RollupManager()
+
+    class Meta:
+        unique_together = ('month', 'expense_by')
+
+    @classmethod
+    def compute(cls):
+        """Totals recomputed from the Expense table, in the shape of RollupManager.as_totals()."""
+        rows = Expense.objects.filter(is_deleted=False).annotate(month=TruncMonth('date')).values_list(
+            'month', 'expense_by_id',
+        ).annotate(total=Sum('amount'), count=Count('pk')).order_by()
+        return {(month, expense_by_id): (total, count) for month, expense_by_id, total, count in rows}
+
+    def __str__(self):
+        return f"{self.month:%b %Y} {self.expense_by_id}: ₹{self.total_amount}"
@@ -1,3 +1,52 @@
+import io
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Expense, MonthlyExpenseRollup
+from apps.Teams.models import Team
+
+
+class ExpenseRollupTests(TestCase):
+    """Expense edits, trash, restore and deletes keep MonthlyExpenseRollup equal to a rebuild."""
+
+    def setUp(self):
+        self.team = self.member('Ravi')
+        self.expense = Expense.objects.create(expense_name='Printer ink', expense_by=self.team, amount=Decimal('250'))
+        self.month = timezone.localdate().replace(day=1)
+
+    def member(self, name):
+        return Team.objects.create(
+            name=name, designation='Trainer', phone='9876543210', email=f'{name.lower()}@example.com',
+            city='Panaji', state='Goa', pincode='403001',
+        )
+
+    def assertTotals(self, totals):
+        self.assertEqual(MonthlyExpenseRollup.objects.as_totals(), totals)
+        call_command('rebuild_finance_rollups', check=True, stdout=io.StringIO())
+
+    def test_changes(self):
+        Expense.objects.create(expense_name='Paper', expense_by=self.team, amount=Decimal('50'))
+        self.assertTotals({(self.month, self.team.pk): (Decimal('300.00'), 2)})
+
+        other = self.member('Mira')
+        self.expense.amount = Decimal('200')
+        self.expense.expense_by = other
+        self.expense.save()
+        self.assertTotals({(self.month, self.team.pk): (Decimal('50.00'), 1), (self.month, other.pk): (Decimal('200.00'), 1)})
+
+        self.expense.delete()
+        self.assertTotals({(self.month, self.team.pk): (Decimal('50.00'), 1)})
+        self.expense.restore()
+        self.assertTotals({(self.month, self.team.pk): (Decimal('50.00'), 1), (self.month, other.pk): (Decimal('200.00'), 1)})
+
+        # Trashing a team member takes their expenses along
+        other.delete()
+        self.assertTotals({(self.month, self.team.pk): (Decimal('50.00'), 1)})
+        Team.all_objects.filter(pk=other.pk).restore()
+        self.assertTotals({(self.month, self.team.pk): (Decimal('50.00'), 1), (self.month, other.pk): (Decimal('200.00'), 1)})
 
-# Create your tests here.
+        Expense.all_objects.filter(expense_by=self.team).delete()
+        self.assertTotals({(self.month, other.pk): (Decimal('200.00'), 1)})
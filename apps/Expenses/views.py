@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
 
 from .models import Expense
 from .forms import ExpenseForm
@@ -69,10 +69,7 @@ def expense_delete(request, pk):
     expense = get_object_or_404(Expense, pk=pk, is_deleted=False)
 
     if request.method == 'POST':
-        # Soft delete: mark as deleted
-        expense.is_deleted = True
-        expense.deleted_at = timezone.now()
-        expense.save()
+        expense.delete()  # Soft delete
         messages.success(request, "Expense moved to trash.")
         return redirect('expense_list')
 
@@ -85,14 +82,8 @@ def expense_delete(request, pk):
 
 @login_required
 def expense_trash(request):
-    # Show expenses that are moved to trash
-    expenses = Expense.objects.filter(is_deleted=True).order_by('-deleted_at')
-
-    context = {
-        'expenses': expenses,
-        'sidebar_active': 'expense_trash',
-    }
-    return render(request, 'expenses/expense_list.html', context)
+    # Trashed expenses are listed on the Expenses tab of the shared trash page
+    return redirect(f"{reverse('student_trash')}?tab=expenses")
 
 
 @login_required
@@ -100,9 +91,7 @@ def expense_restore(request, pk):
     expense = get_object_or_404(Expense, pk=pk, is_deleted=True)
 
     if request.method == 'POST':
-        expense.is_deleted = False
-        expense.deleted_at = None
-        expense.save()
+        expense.restore()
         messages.success(request, "Expense restored successfully.")
         return redirect('expense_list')
 
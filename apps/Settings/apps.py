@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SettingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.Settings'
+
+    def ready(self):
+        from . import images  # noqa: F401  (post_save receiver for image renditions)
@@ -4,7 +4,10 @@ from .models import Setting
 class SettingForm(forms.ModelForm):
     class Meta:
         model = Setting
-        fields = ['admission_fee']
+        fields = ['admission_fee', 'trash_retention_days', 'reminder_days_ahead', 'reminder_interval_days']
         widgets = {
             'admission_fee': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'trash_retention_days': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'reminder_days_ahead': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'reminder_interval_days': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
         }
@@ -0,0 +1,156 @@
+"""
+Resized renditions of uploaded photos (Student.photo, Team.image).
+
+Each rendition is stored next to the original under renditions/, e.g.
+students/photos/abc.jpg -> renditions/students/photos/abc.thumb.webp, so its name can be
+worked out from the original without a database lookup. Renditions are made in a
+background thread after the upload is committed; until then (or if one fails) templates
+fall back to the original file. build_image_renditions creates any that are missing.
+When an image is replaced or its row deleted, the renditions of the old file are removed.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+logger = logging.getLogger(__name__)
+
+# name: longest side in pixels (about twice the largest size it is displayed at)
+RENDITIONS = {
+    'thumb': 96,
+    'medium': 320,
+}
+RENDITION_QUALITY = 80
+RENDITION_FORMAT, RENDITION_EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+# Image fields that get renditions: model label -> field name
+IMAGE_FIELDS = {
+    'students.Student': 'photo',
+    'Teams.Team': 'image',
+}
+
+_executor = None
+
+
+def rendition_name(name, size):
+    stem, _ = os.path.splitext(name)
+    return f"renditions/{stem}.{size}.{RENDITION_EXTENSION}"
+
+
+def rendition_url(file, size):
+    """URL of the `size` rendition of an image field file, or of the original if there is none yet."""
+    if not file:
+        return ''
+    name = rendition_name(file.name, size)
+    if file.storage.exists(name):
+        return file.storage.url(name)
+    return file.url
+
+
+def _encode(image, longest_side):
+    image = image.copy()
+    image.thumbnail((longest_side, longest_side), Image.LANCZOS)
+    if RENDITION_FORMAT == 'WEBP':
+        transparent = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+        options = {'method': 4}
+    else:
+        image = image.convert('RGB')
+        options = {'optimize': True, 'progressive': True}
+    out = io.BytesIO()
+    # No exif/icc_profile arguments, so camera metadata (GPS included) is dropped
+    image.save(out, RENDITION_FORMAT, quality=RENDITION_QUALITY, **options)
+    return out.getvalue()
+
+
+def build_renditions(name, storage=default_storage, overwrite=False):
+    """Create the missing renditions of the stored image `name`. Returns how many were written."""
+    targets = {
+        size: rendition_name(name, size) for size in RENDITIONS
+        if overwrite or not storage.exists(rendition_name(name, size))
+    }
+    if not targets:
+        return 0
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)  # phone photos are often stored sideways
+        image.load()
+    for size, target in targets.items():
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(_encode(image, RENDITIONS[size])))
+    return len(targets)
+
+
+def delete_renditions(name, storage=default_storage):
+    """Remove the renditions of the stored image `name` (the original is left alone)."""
+    for size in RENDITIONS:
+        target = rendition_name(name, size)
+        if storage.exists(target):
+            storage.delete(target)
+
+
+def _build_in_background(name, storage):
+    try:
+        build_renditions(name, storage)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception("Could not build renditions of %s", name)
+
+
+def schedule_renditions(file):
+    """Build renditions of an image field file in a background thread, once the transaction commits."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+    name, storage = file.name, file.storage
+    transaction.on_commit(lambda: _executor.submit(_build_in_background, name, storage))
+
+
+def image_fields():
+    """(model, field name) for every field in IMAGE_FIELDS."""
+    return [(apps.get_model(label), field) for label, field in IMAGE_FIELDS.items()]
+
+
+def _stored_name(instance, field):
+    # The raw attribute, so a deferred field is not loaded just to be remembered
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value) or None
+
+
+@receiver(post_init, sender='students.Student', dispatch_uid='image_renditions_loaded_student')
+@receiver(post_init, sender='Teams.Team', dispatch_uid='image_renditions_loaded_team')
+def _image_loaded(sender, instance, **kwargs):
+    # The image this row was loaded with, whose renditions go when it is replaced
+    instance._loaded_image_name = _stored_name(instance, IMAGE_FIELDS[sender._meta.label])
+
+
+@receiver(post_save, dispatch_uid='image_renditions')
+def _image_saved(sender, instance, update_fields=None, **kwargs):
+    field = IMAGE_FIELDS.get(sender._meta.label)
+    if field is None or (update_fields is not None and field not in update_fields):
+        return
+    file = getattr(instance, field)
+    previous = getattr(instance, '_loaded_image_name', None)
+    if previous and previous != file.name:
+        storage = file.storage
+        transaction.on_commit(lambda: delete_renditions(previous, storage))
+    instance._loaded_image_name = file.name or None
+    if file and not file.storage.exists(rendition_name(file.name, 'thumb')):
+        schedule_renditions(file)
+
+
+@receiver(post_delete, sender='students.Student', dispatch_uid='image_renditions_deleted_student')
+@receiver(post_delete, sender='Teams.Team', dispatch_uid='image_renditions_deleted_team')
+def _image_deleted(sender, instance, **kwargs):
+    file = getattr(instance, IMAGE_FIELDS[sender._meta.label])
+    if file:
+        name, storage = file.name, file.storage
+        transaction.on_commit(lambda: delete_renditions(name, storage))
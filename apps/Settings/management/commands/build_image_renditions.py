@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from PIL import Image, UnidentifiedImageError
+
+from apps.Settings.images import build_renditions, image_fields
+
+
+class Command(BaseCommand):
+    help = "Create the thumbnail and medium renditions of student and team photos that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help="Rebuild renditions that already exist.")
+
+    def handle(self, *args, **options):
+        written = failed = 0
+        for model, field in image_fields():
+            names = model._default_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True)
+            storage = model._meta.get_field(field).storage
+            for name in names.iterator():
+                try:
+                    written += build_renditions(name, storage, overwrite=options['overwrite'])
+                except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+                    failed += 1
+                    self.stderr.write(f"{model._meta.label} {name}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} renditions; {failed} images could not be read."))
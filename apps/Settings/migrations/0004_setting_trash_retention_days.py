@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Settings', '0003_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='setting',
+            name='trash_retention_days',
+            field=models.PositiveIntegerField(default=90, help_text='Trashed records older than this are permanently deleted by the purge job. 0 keeps them forever.', verbose_name='Keep trash for (days)'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:14
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Settings', '0004_setting_trash_retention_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='setting',
+            name='reminder_days_ahead',
+            field=models.PositiveIntegerField(default=3, help_text='Students are reminded of installments falling due within this many days. 0 reminds only once overdue.', verbose_name='Remind about dues (days before)'),
+        ),
+        migrations.AddField(
+            model_name='setting',
+            name='reminder_interval_days',
+            field=models.PositiveIntegerField(default=7, help_text='A student with dues still outstanding is reminded again after this many days.', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Repeat dues reminders every (days)'),
+        ),
+    ]
@@ -1,4 +1,17 @@
-from django.db import models
+import copy
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.validators import MinValueValidator
+from django.db import IntegrityError, models, transaction
+from django.db.models import BigIntegerField, F, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
 
 class Setting(models.Model):
     admission_fee = models.DecimalField(
@@ -8,6 +21,22 @@ class Setting(models.Model):
         help_text="This fee will automatically be added to every new student's payment",
         default=0  # <--- Add a default to prevent IntegrityError
     )
+    trash_retention_days = models.PositiveIntegerField(
+        default=90,
+        verbose_name="Keep trash for (days)",
+        help_text="Trashed records older than this are permanently deleted by the purge job. 0 keeps them forever.",
+    )
+    reminder_days_ahead = models.PositiveIntegerField(
+        default=3,
+        verbose_name="Remind about dues (days before)",
+        help_text="Students are reminded of installments falling due within this many days. 0 reminds only once overdue.",
+    )
+    reminder_interval_days = models.PositiveIntegerField(
+        default=7,
+        validators=[MinValueValidator(1)],
+        verbose_name="Repeat dues reminders every (days)",
+        help_text="A student with dues still outstanding is reminded again after this many days.",
+    )
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -16,3 +45,279 @@ class Setting(models.Model):
     class Meta:
         verbose_name = "Setting"
         verbose_name_plural = "Settings"
+
+
+SETTINGS_CACHE_KEY = 'settings:singleton'
+SETTINGS_VERSION_KEY = 'settings:version'
+# Upper bound on how stale a worker can be when CACHES is per-process (LocMemCache)
+SETTINGS_CACHE_TIMEOUT = 60
+
+# (version, Setting) last seen by this process
+_process_settings = None
+
+
+def get_settings():
+    """
+    The site Setting row, cached. Each call is one lookup of the version key in the
+    Django cache; the row itself is only read from the database when the version has
+    changed (any Setting save/delete) or expired. With a shared cache backend every
+    worker sees a change immediately; with the default per-process cache within
+    SETTINGS_CACHE_TIMEOUT seconds.
+
+    The whole instance is cached, so new fields on Setting need no changes here. When
+    no row exists yet an unsaved Setting() carrying the field defaults is returned.
+    Each call returns a copy of the cached instance: it is for reading, and changes to
+    it are neither saved nor seen by other callers. Edit a row loaded from the database.
+    """
+    global _process_settings
+    version = cache.get(SETTINGS_VERSION_KEY)
+    if version is not None:
+        if _process_settings and _process_settings[0] == version:
+            return copy.copy(_process_settings[1])
+        setting = cache.get(SETTINGS_CACHE_KEY, version=version)
+    else:
+        version, setting = time.time_ns(), None
+
+    if setting is None:
+        setting = Setting.objects.order_by('pk').first() or Setting()
+        cache.set(SETTINGS_CACHE_KEY, setting, SETTINGS_CACHE_TIMEOUT, version=version)
+        cache.set(SETTINGS_VERSION_KEY, version, SETTINGS_CACHE_TIMEOUT)
+    _process_settings = (version, setting)
+    return copy.copy(setting)
+
+
+def invalidate_settings_cache():
+    """Move every process to a new settings version; the next get_settings() reloads."""
+    global _process_settings
+    _process_settings = None
+    cache.delete(SETTINGS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Setting, dispatch_uid='settings_cache_post_save')
+@receiver(post_delete, sender=Setting, dispatch_uid='settings_cache_post_delete')
+def _setting_changed(sender, **kwargs):
+    # After commit, so no worker can re-cache the old row under the new version
+    transaction.on_commit(invalidate_settings_cache)
+
+
+def max_numeric_suffix(queryset, field, prefix=''):
+    """
+    Highest integer that follows `prefix` in `field` across `queryset` (0 if none).
+    Only used once per sequence, to seed its counter from rows created before it existed.
+    """
+    result = queryset.filter(**{f'{field}__regex': rf'^{prefix}[0-9]+$'}).aggregate(
+        top=Max(Cast(Substr(field, len(prefix) + 1), BigIntegerField()))
+    )['top']
+    return result or 0
+
+
+def soft_delete_indexes(prefix, **listings):
+    """
+    Indexes for the listings of a soft-deletable model: `listings` maps a name to the
+    columns a listing of live rows is ordered by, and the trash listing (ordered by
+    deleted_at) is always included.
+
+    Each listing gets a composite index led by is_deleted (<prefix>_<name>_idx), which
+    MySQL and PostgreSQL use for "is_deleted = false ORDER BY ...", and a partial index
+    over just the live (or, for the trash, deleted) rows (<prefix>_<name>_pidx), which
+    SQLite needs because it cannot use the composite one for "NOT is_deleted". Backends
+    without partial indexes (MySQL) skip the latter.
+    """
+    indexes = []
+    for name, fields in [*listings.items(), ('trash', ['deleted_at'])]:
+        rows = Q(is_deleted=name == 'trash')
+        indexes.append(models.Index(fields=['is_deleted', *fields], name=f'{prefix}_{name}_idx'))
+        indexes.append(models.Index(fields=list(fields), condition=rows, name=f'{prefix}_{name}_pidx'))
+    return indexes
+
+
+# Sent by SoftDeleteQuerySet.soft_delete()/restore() after their UPDATE, with
+# `pks` (the rows that changed) and `deleted`: the set-based counterpart of the
+# post_save receivers that keep rollups, caches and indexes in step
+soft_delete_changed = Signal()
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def soft_delete(self):
+        """
+        Move the live rows to the trash with one UPDATE per table, taking the relations
+        named in the model's SOFT_DELETE_CASCADE along. Returns the number of rows of
+        this model that changed.
+        """
+        return self._set_deleted(True, timezone.now())
+
+    def restore(self):
+        """
+        Take the trashed rows out of the trash, with the related rows that were trashed
+        with them (or later) and are not held there by another trashed parent. Call it
+        on `all_objects`: `objects` never sees a trashed row.
+        """
+        return self._set_deleted(False, None)
+
+    def _set_deleted(self, deleted, deleted_at):
+        model = self.model
+        with transaction.atomic():
+            pks = list(self.filter(is_deleted=not deleted).values_list('pk', flat=True))
+            if not pks:
+                return 0
+            # Children first: restoring them reads the parents' deleted_at
+            for children in cascaded_rows(model, pks, deleted):
+                children._set_deleted(deleted, deleted_at)
+            model.all_objects.filter(pk__in=pks).update(is_deleted=deleted, deleted_at=deleted_at)
+            soft_delete_changed.send(sender=model, pks=pks, deleted=deleted)
+        return len(pks)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """`objects` of a soft-deletable model: the live rows only."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class SoftDeleteMixin(models.Model):
+    """
+    is_deleted/deleted_at plus the two managers: `objects` (live rows) and `all_objects`
+    (every row). `all_objects` is declared first, so it is the default manager that
+    related managers, ModelForm unique checks, the admin and get_object_or_404() use.
+    SOFT_DELETE_CASCADE names the reverse relations whose rows go to the trash (and
+    come back) with a row of this model.
+    """
+    is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    all_objects = SoftDeleteQuerySet.as_manager()
+    objects = SoftDeleteManager()
+
+    SOFT_DELETE_CASCADE = ()
+
+    def delete(self, *args, **kwargs):
+        deleted_at = timezone.now()
+        with transaction.atomic():
+            for children in cascaded_rows(type(self), [self.pk], True):
+                children._set_deleted(True, deleted_at)
+            self.is_deleted = True
+            self.deleted_at = deleted_at
+            self.save(update_fields=['is_deleted', 'deleted_at'])
+
+    def restore(self, *args, **kwargs):
+        with transaction.atomic():
+            for children in cascaded_rows(type(self), [self.pk], False):
+                children._set_deleted(False, None)
+            self.is_deleted = False
+            self.deleted_at = None
+            self.save(update_fields=['is_deleted', 'deleted_at'])
+
+    def hard_delete(self, *args, **kwargs):
+        """Really delete the row, along with whatever the database cascades take with it."""
+        return super().delete(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+def cascaded_rows(model, pks, deleted):
+    """
+    Querysets (one per SOFT_DELETE_CASCADE relation) of the rows that follow the `model`
+    rows `pks` into the trash, or (deleted=False) back out of it. When restoring, rows
+    still held in the trash by another trashed parent are dated with that parent, so
+    they come back when it is restored.
+    """
+    for name in model.SOFT_DELETE_CASCADE:
+        relation = model._meta.get_field(name)
+        child, parent = relation.related_model, relation.field.name
+        rows = child.all_objects.filter(**{f'{parent}__in': pks})
+        if not deleted:
+            # Rows trashed before their parent were trashed on their own
+            rows = rows.filter(deleted_at__gte=F(f'{parent}__deleted_at'))
+            for field in child._meta.concrete_fields:
+                if field.is_relation and field.name != parent and issubclass(field.related_model, SoftDeleteMixin):
+                    held = rows.filter(**{f'{field.name}__is_deleted': True, f'{field.name}__deleted_at__gt': F('deleted_at')})
+                    by_date = {}
+                    for pk, deleted_at in held.values_list('pk', f'{field.name}__deleted_at'):
+                        by_date.setdefault(deleted_at, []).append(pk)
+                    for deleted_at, held_pks in by_date.items():
+                        child.all_objects.filter(pk__in=held_pks).update(deleted_at=deleted_at)
+                    rows = rows.exclude(**{f'{field.name}__is_deleted': True})
+        yield rows
+
+
+class Sequence(models.Model):
+    """
+    Named counter used to allocate human-readable identifiers (student IDs, enrollment
+    t_ids, certificate numbers, employee codes). The row is locked with SELECT ... FOR UPDATE
+    while a block of values is reserved, so concurrent saves never hand out the same value.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, name, count=1, seed=None):
+        """
+        Reserve `count` consecutive values of sequence `name` and return the first one.
+        `seed` is a callable returning the last value already in use; it is only called
+        the first time the sequence is used.
+        """
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(name=name).first()
+            if sequence is None:
+                cls.objects.get_or_create(name=name, defaults={'last_value': seed() if seed else 0})
+                sequence = cls.objects.select_for_update().get(name=name)
+            first = sequence.last_value + 1
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value'])
+        return first
+
+    def __str__(self):
+        return f"{self.name} = {self.last_value}"
+
+
+def rollup_deltas():
+    """Accumulator for RollupManager.add(): {key tuple: [amount, entries]}."""
+    return defaultdict(lambda: [Decimal('0.00'), 0])
+
+
+class RollupManager(models.Manager):
+    """
+    Manager for pre-aggregated report tables. The model lists its grouping columns in
+    ROLLUP_KEY and stores the aggregate in `total_amount` and `entries`.
+    """
+
+    def add(self, deltas):
+        """
+        Apply {key tuple: (amount, entries)} increments. Existing rows are changed with
+        UPDATE ... SET total_amount = total_amount + delta, so concurrent writers never
+        overwrite each other; missing rows are inserted for positive increments.
+        """
+        for key, (amount, entries) in deltas.items():
+            if not amount and not entries:
+                continue
+            lookup = dict(zip(self.model.ROLLUP_KEY, key))
+            changes = {'total_amount': F('total_amount') + amount, 'entries': F('entries') + entries}
+            if self.filter(**lookup).update(**changes) or entries < 0:
+                # Removing from a row that no longer exists (e.g. during a cascade) is a no-op
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(**lookup, total_amount=amount, entries=entries)
+            except IntegrityError:
+                # Another writer inserted the row first
+                self.filter(**lookup).update(**changes)
+
+    def replace_all(self, totals):
+        """Replace the whole table with {key tuple: (amount, entries)} in one transaction."""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [self.model(**dict(zip(self.model.ROLLUP_KEY, key)), total_amount=amount, entries=entries)
+                 for key, (amount, entries) in totals.items()],
+                batch_size=1000,
+            )
+
+    def as_totals(self):
+        """The stored rows as {key tuple: (amount, entries)}, for comparing with a rebuild."""
+        return {
+            tuple(row[:-2]): (row[-2], row[-1])
+            for row in self.values_list(*self.model.ROLLUP_KEY, 'total_amount', 'entries')
+            if row[-2] or row[-1]
+        }
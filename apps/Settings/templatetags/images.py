@@ -0,0 +1,11 @@
+from django import template
+
+from apps.Settings.images import rendition_url
+
+register = template.Library()
+
+
+@register.filter
+def rendition(file, size='thumb'):
+    """{{ student.photo|rendition:'medium' }}: URL of a resized copy, or of the original until it exists."""
+    return rendition_url(file, size)
@@ -1,3 +1,200 @@
-from django.test import TestCase
+import io
+import tempfile
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponseNotFound
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from . import images
+from .models import Sequence, Setting, get_settings, invalidate_settings_cache
+from apps.Teams.models import Team
+from Institute_Management.middleware import StaticFilesMiddleware, accepted_encodings
+
+
+class StaticFilesMiddlewareTests(SimpleTestCase):
+    """Precompressed static files are served only in an encoding the browser accepts."""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        for name in ('app.css', 'app.css.br', 'app.css.gz'):
+            Path(root.name, name).write_bytes(name.encode())
+        self.enterContext(override_settings(STATIC_ROOT=root.name, STATIC_URL='/static/'))
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponseNotFound())
+
+    def encoding(self, accept_encoding):
+        request = RequestFactory().get('/static/app.css', HTTP_ACCEPT_ENCODING=accept_encoding)
+        response = self.middleware(request)
+        response.close()
+        return response.get('Content-Encoding')
+
+    def test_parse(self):
+        self.assertEqual(accepted_encodings('gzip, BR;q=0.5, identity; q=0, x;q=abc'), {
+            'gzip': 1.0, 'br': 0.5, 'identity': 0.0, 'x': 0.0,
+        })
+
+    def test_negotiation(self):
+        cases = {
+            'gzip, deflate, br': 'br',
+            'br;q=0, gzip': 'gzip',
+            'br;q=0, gzip;q=0': None,
+            'x-gzip-like': None,
+            '*': 'br',
+            '*;q=0.5, br;q=0': 'gzip',
+            '': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header):
+                self.assertEqual(self.encoding(header), expected)
+
+
+class RenditionTests(TestCase):
+    """Renditions follow their image: replaced or deleted with it."""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=root.name))
+
+    def upload(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def renditions(self, name):
+        return [default_storage.exists(images.rendition_name(name, size)) for size in images.RENDITIONS]
+
+    def save(self, team):
+        with self.captureOnCommitCallbacks(execute=True):
+            team.save()
+        if images._executor is not None:  # wait for the background renditions
+            images._executor.shutdown(wait=True)
+            images._executor = None
+
+    def test_replaced_and_deleted(self):
+        team = Team(
+            name='Asha', designation='Trainer', phone='9876543210', email='asha@example.com',
+            city='Panaji', state='Goa', pincode='403001', image=self.upload('first.jpg'),
+        )
+        self.save(team)
+        first = team.image.name
+        self.assertEqual(self.renditions(first), [True, True])
+
+        team = Team.all_objects.get(pk=team.pk)
+        team.image = self.upload('second.jpg')
+        self.save(team)
+        self.assertEqual(self.renditions(first), [False, False])
+        self.assertEqual(self.renditions(team.image.name), [True, True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Team.all_objects.filter(pk=team.pk).delete()
+        self.assertEqual(self.renditions(team.image.name), [False, False])
+
+    def test_fallback_and_command(self):
+        # Not committed, so no renditions are built in the background
+        team = Team.objects.create(
+            name='Asha', designation='Trainer', phone='9876543210', email='asha@example.com',
+            city='Panaji', state='Goa', pincode='403001', image=self.upload('photo.jpg'),
+        )
+        self.assertEqual(images.rendition_url(team.image, 'thumb'), team.image.url)
+        self.assertEqual(images.rendition_url(Team(image='').image, 'thumb'), '')
+
+        broken = Team.objects.create(
+            name='Mira', designation='Trainer', phone='9876543210', email='other@example.com',
+            city='Panaji', state='Goa', pincode='403001', image=SimpleUploadedFile('broken.jpg', b'not an image'),
+        )
+        out, err = io.StringIO(), io.StringIO()
+        call_command('build_image_renditions', stdout=out, stderr=err)
+        self.assertIn('Wrote 2 renditions; 1 images could not be read.', out.getvalue())
+        self.assertIn(broken.image.name, err.getvalue())
+
+        thumb = images.rendition_name(team.image.name, 'thumb')
+        self.assertEqual(images.rendition_url(team.image, 'thumb'), default_storage.url(thumb))
+        with default_storage.open(thumb) as file:
+            self.assertEqual(max(Image.open(file).size), images.RENDITIONS['thumb'])
+
+
+class SequenceTests(TestCase):
+    """Sequence.reserve() hands out consecutive blocks, seeded once from the rows already in use."""
+
+    def test_reserve(self):
+        seeds = []
+
+        def seed():
+            seeds.append(1)
+            return 41
+
+        self.assertEqual(Sequence.reserve('test', seed=seed), 42)
+        self.assertEqual(Sequence.reserve('test', 3, seed=seed), 43)
+        self.assertEqual(Sequence.reserve('test', seed=seed), 46)
+        self.assertEqual(len(seeds), 1)
+        self.assertEqual(Sequence.reserve('other'), 1)
+
+
+class SettingsCacheTests(TestCase):
+    """get_settings() reads the row once, hands out copies, and reloads after a change is committed."""
+
+    def setUp(self):
+        invalidate_settings_cache()
+        self.addCleanup(invalidate_settings_cache)
+
+    def test_cache(self):
+        self.assertEqual(get_settings().admission_fee, 0)  # no row yet: the field defaults
+        with self.captureOnCommitCallbacks(execute=True):
+            setting = Setting.objects.create(admission_fee=Decimal('500'))
+        self.assertEqual(get_settings().admission_fee, 500)
+        with self.assertNumQueries(0):
+            get_settings().admission_fee = Decimal('1')
+            self.assertEqual(get_settings().admission_fee, 500)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            setting.admission_fee = Decimal('750')
+            setting.save()
+            # Not before commit
+            self.assertEqual(get_settings().admission_fee, 500)
+        self.assertEqual(get_settings().admission_fee, 750)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            setting.delete()
+        self.assertEqual(get_settings().admission_fee, 0)
+
+
+class CollectStaticTests(SimpleTestCase):
+    """collectstatic writes hashed and compressed copies; hashed names are served as immutable."""
+
+    def setUp(self):
+        source, root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        Path(source.name, 'logo.png').write_bytes(b'png')
+        Path(source.name, 'app.css').write_text('.logo { background: url("logo.png"); }\n' * 20)
+        self.enterContext(override_settings(
+            STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name, STATIC_URL='/static/',
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.root = Path(root.name)
+
+    def get(self, name):
+        middleware = StaticFilesMiddleware(lambda request: HttpResponseNotFound())
+        response = middleware(RequestFactory().get(f'/static/{name}', HTTP_ACCEPT_ENCODING='gzip'))
+        response.close()
+        return response
+
+    def test_collected(self):
+        css = staticfiles_storage.stored_name('app.css')
+        self.assertNotEqual(css, 'app.css')
+        self.assertIn(staticfiles_storage.stored_name('logo.png'), (self.root / css).read_text())
+        self.assertTrue((self.root / f'{css}.gz').exists())
+        self.assertFalse((self.root / 'logo.png.gz').exists())  # too small to compress
+
+        response = self.get(css)
+        self.assertEqual((response['Cache-Control'], response['Content-Encoding']), (StaticFilesMiddleware.IMMUTABLE, 'gzip'))
+        self.assertEqual(self.get('app.css')['Cache-Control'], StaticFilesMiddleware.REVALIDATE)
+        self.assertEqual(self.get('missing.css').status_code, 404)
@@ -6,8 +6,9 @@ from .forms import SettingForm
 
 @login_required
 def setting_edit(request):
-    # Assume only one Setting instance; create if not exists.
-    setting, created = Setting.objects.get_or_create(pk=1)
+    # Single Setting instance; saving the form creates it if it does not exist yet.
+    # Bound to a fresh row, not the cached get_settings() one, which form validation would change.
+    setting = Setting.objects.order_by('pk').first() or Setting()
     if request.method == 'POST':
         form = SettingForm(request.POST, instance=setting)
         if form.is_valid():
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Teams', '0002_team_deleted_at_team_is_deleted_alter_team_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['is_deleted', 'id'], name='team_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['id'], name='team_list_pidx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['is_deleted', 'deleted_at'], name='team_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='team_trash_pidx'),
+        ),
+    ]
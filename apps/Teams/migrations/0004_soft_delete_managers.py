@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:04
+
+import django.db.models.manager
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Teams', '0003_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='team',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
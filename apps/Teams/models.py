@@ -1,5 +1,6 @@
 from django.db import models
-from django.utils import timezone
+
+from apps.Settings.models import Sequence, SoftDeleteMixin, max_numeric_suffix, soft_delete_indexes
 
 INDIAN_STATES = [
     ('Andhra Pradesh', 'Andhra Pradesh'),
@@ -41,7 +42,7 @@ INDIAN_STATES = [
     ('Puducherry', 'Puducherry'),
 ]
 
-class Team(models.Model):
+class Team(SoftDeleteMixin):
     name = models.CharField(max_length=100)
     designation = models.CharField(max_length=100)
     phone = models.CharField(max_length=15)
@@ -52,28 +53,19 @@ class Team(models.Model):
     state = models.CharField(max_length=100, choices=INDIAN_STATES)
     pincode = models.CharField(max_length=10)
 
-    # Soft delete fields
-    is_deleted = models.BooleanField(default=False)
-    deleted_at = models.DateTimeField(blank=True, null=True)
+    # Trashing a team member trashes the expenses they recorded
+    SOFT_DELETE_CASCADE = ('expenses',)
 
     def save(self, *args, **kwargs):
         if not self.employee_code:
-            last = Team.objects.all().order_by('-id').first()
-            next_id = 1 if not last else last.id + 1
+            next_id = Sequence.reserve('employee_code', seed=lambda: max_numeric_suffix(
+                Team.all_objects.all(), 'employee_code', 'CP-0724-'
+            ))
             self.employee_code = f"CP-0724-{next_id:02d}"
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        """Soft delete: mark as deleted with timestamp."""
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save(update_fields=['is_deleted', 'deleted_at'])
-
-    def restore(self):
-        """Restore from soft delete."""
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    class Meta:
+        indexes = soft_delete_indexes('team', list=['id'])
 
     def __str__(self):
         return f"{self.name} ({self.employee_code})"
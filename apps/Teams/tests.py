@@ -1,3 +1,21 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Team
+
+
+class EmployeeCodeTests(TestCase):
+    """Employee codes continue from the highest one in use, trashed members included."""
+
+    def team(self, name, **fields):
+        return Team.objects.create(
+            name=name, designation='Trainer', phone='9876543210', email=f'{name.lower()}@example.com',
+            city='Panaji', state='Goa', pincode='403001', **fields,
+        )
+
+    def test_codes(self):
+        # As saved before the sequence existed
+        Team.all_objects.bulk_create([Team(
+            name='Old', designation='Trainer', phone='1', email='old@example.com', city='Panaji',
+            state='Goa', pincode='403001', employee_code='CP-0724-07', is_deleted=True,
+        )])
+        self.assertEqual([self.team(name).employee_code for name in ('Asha', 'Bina')], ['CP-0724-08', 'CP-0724-09'])
@@ -1,7 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
 
 from .models import Team, INDIAN_STATES
 from .forms import TeamForm
@@ -63,10 +62,8 @@ def team_update(request, pk):
 def team_delete(request, pk):
     team = get_object_or_404(Team, pk=pk, is_deleted=False)
     if request.method == 'POST':
-        # Soft delete - mark as deleted instead of actual deletion
-        team.is_deleted = True
-        team.deleted_at = timezone.now()
-        team.save(update_fields=['is_deleted', 'deleted_at'])
+        # Soft delete, together with the member's expenses
+        team.delete()
         messages.success(request, "Team member moved to trash.")
         return redirect('team_list')
 
@@ -89,7 +86,6 @@ def team_member_detail(request, pk):
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
 
 from .models import Team
 
@@ -97,9 +93,7 @@ from .models import Team
 def team_restore(request, pk):
     team = get_object_or_404(Team, pk=pk, is_deleted=True)
     if request.method == "POST":
-        team.is_deleted = False
-        team.deleted_at = None
-        team.save(update_fields=['is_deleted', 'deleted_at'])
+        team.restore()
         messages.success(request, "Team member restored successfully.")
         return redirect('team_list')  # or wherever you want to redirect after restore
     return render(request, "team/team_restore_confirm.html", {"team": team})
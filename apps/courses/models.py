@@ -1,7 +1,8 @@
 from django.db import models
-from django.utils import timezone
 
-class Course(models.Model):
+from apps.Settings.models import SoftDeleteMixin, soft_delete_indexes
+
+class Course(SoftDeleteMixin):
     DURATION_TYPE_CHOICES = [
         ('weeks', 'Weeks'),
         ('months', 'Months'),
@@ -27,25 +28,11 @@ class Course(models.Model):
         verbose_name="Duration Type"
     )
 
-    # Soft delete fields
-    is_deleted = models.BooleanField(default=False)
-    deleted_at = models.DateTimeField(blank=True, null=True)
-
-    def delete(self, *args, **kwargs):
-        """
-        Soft delete - mark as deleted with a timestamp.
-        """
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    # Trashing a course trashes its enrollments
+    SOFT_DELETE_CASCADE = ('studentenrollment',)
 
-    def restore(self):
-        """
-        Restore soft-deleted course.
-        """
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+    class Meta:
+        indexes = soft_delete_indexes('course', list=['id'], name=['course_name'])
 
     def __str__(self):
         return self.course_name
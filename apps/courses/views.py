@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from .models import Course
 from .forms import CourseForm
 from django.contrib.auth.decorators import login_required
@@ -14,15 +15,10 @@ def course_list(request):
     }
     return render(request, 'courses/course_list.html', context)
 
-# List all deleted (trashed) courses
+# Trashed courses are listed on the Courses tab of the shared trash page
 @login_required
 def course_trash(request):
-    courses = Course.objects.filter(is_deleted=True).order_by('-deleted_at')
-    context = {
-        'courses': courses,
-        'sidebar_active': 'courses',
-    }
-    return render(request, 'courses/course_trash.html', context)
+    return redirect(f"{reverse('student_trash')}?tab=courses")
 
 # Create a new course
 @login_required
@@ -0,0 +1,79 @@
+/**
+ * Typeahead for inputs with data-autocomplete-url: shows matching students as the user
+ * types and writes the chosen student's ID into the hidden field named by
+ * data-autocomplete-target.
+ */
+
+'use strict';
+
+document.addEventListener('DOMContentLoaded', function () {
+  const label = s => s.full_name + ' (' + s.student_id + ')' + (s.contact ? ' · ' + s.contact : '');
+
+  document.querySelectorAll('input[data-autocomplete-url]').forEach(function (input) {
+    const target = document.getElementById(input.dataset.autocompleteTarget);
+    const menu = document.createElement('div');
+    menu.className = 'list-group position-absolute w-100 shadow-sm';
+    menu.style.zIndex = 1050;
+    input.parentNode.appendChild(menu);
+
+    let timer = null;
+    let request = 0;
+
+    function lookup(query) {
+      const current = ++request;
+      return fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query), {
+        headers: { Accept: 'application/json' }
+      })
+        .then(response => (response.ok ? response.json() : []))
+        .then(results => (current === request ? results : null));
+    }
+
+    function choose(student) {
+      target.value = student.student_id;
+      input.value = label(student);
+      menu.innerHTML = '';
+    }
+
+    function show(results) {
+      menu.innerHTML = '';
+      results.forEach(function (student) {
+        const item = document.createElement('button');
+        item.type = 'button';
+        item.className = 'list-group-item list-group-item-action';
+        item.textContent = label(student);
+        item.addEventListener('mousedown', function (event) {
+          event.preventDefault(); // keep focus so blur does not close the menu first
+          choose(student);
+        });
+        menu.appendChild(item);
+      });
+    }
+
+    input.addEventListener('input', function () {
+      target.value = '';
+      clearTimeout(timer);
+      const query = input.value.trim();
+      if (!query) {
+        menu.innerHTML = '';
+        return;
+      }
+      timer = setTimeout(function () {
+        lookup(query).then(results => results && show(results));
+      }, 100);
+    });
+
+    input.addEventListener('blur', function () {
+      menu.innerHTML = '';
+    });
+
+    // Re-displayed form (e.g. after a validation error): show the chosen student's name
+    if (target.value) {
+      lookup(target.value).then(function (results) {
+        const student = (results || []).find(s => s.student_id === target.value);
+        if (student) {
+          input.value = label(student);
+        }
+      });
+    }
+  });
+});
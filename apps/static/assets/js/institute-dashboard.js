@@ -0,0 +1,79 @@
+/**
+ * Institute dashboard: renders each .analytics-chart once its JSON dataset has loaded.
+ * Charts are fetched after the page shell renders, and only when scrolled into view.
+ */
+
+'use strict';
+
+document.addEventListener('DOMContentLoaded', function () {
+  if (typeof ApexCharts === 'undefined') {
+    return;
+  }
+
+  const currency = value => '₹' + Number(value).toLocaleString('en-IN', { maximumFractionDigits: 2 });
+
+  function renderChart(el, data) {
+    const isMoney = el.dataset.dataset !== 'enrollments-per-course';
+    el.innerHTML = '';
+    const options = {
+      chart: {
+        type: el.dataset.type || 'bar',
+        height: 320,
+        stacked: el.dataset.stacked === 'true',
+        toolbar: { show: false }
+      },
+      series: data.series,
+      xaxis: { categories: data.labels },
+      plotOptions: { bar: { horizontal: el.dataset.horizontal === 'true', borderRadius: 4 } },
+      dataLabels: { enabled: false },
+      stroke: { width: el.dataset.type === 'line' ? 3 : 0, curve: 'smooth' },
+      legend: { position: 'top' },
+      yaxis: { labels: { formatter: value => (isMoney ? currency(value) : Math.round(value)) } },
+      tooltip: {
+        y: {
+          formatter: function (value, opts) {
+            let text = isMoney ? currency(value) : value;
+            if (data.counts && opts && opts.dataPointIndex !== undefined) {
+              text += ' (' + data.counts[opts.dataPointIndex] + ' enrollments)';
+            }
+            return text;
+          }
+        }
+      },
+      noData: { text: 'No data yet' }
+    };
+    if (window.config && config.colors) {
+      options.colors = [config.colors.primary, config.colors.success, config.colors.warning, config.colors.info, config.colors.danger];
+    }
+    new ApexCharts(el, options).render();
+  }
+
+  function load(el) {
+    fetch(el.dataset.url, { credentials: 'same-origin', headers: { Accept: 'application/json' } })
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(response.statusText);
+        }
+        return response.json();
+      })
+      .then(data => renderChart(el, data))
+      .catch(() => {
+        el.innerHTML = '<p class="text-danger text-center my-5">Could not load this chart.</p>';
+      });
+  }
+
+  const charts = document.querySelectorAll('.analytics-chart');
+  if ('IntersectionObserver' in window) {
+    const observer = new IntersectionObserver(function (entries) {
+      entries.forEach(entry => {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load(entry.target);
+        }
+      });
+    });
+    charts.forEach(el => observer.observe(el));
+  } else {
+    charts.forEach(load);
+  }
+});
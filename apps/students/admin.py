@@ -5,7 +5,8 @@ from django.http import HttpResponse
 from django.utils.html import format_html
 import re
 
-from .models import Student, StudentEnrollment, Payment
+from .models import DuesReminder, InstallmentSchedule, Student, StudentEnrollment, Payment
+from .exports import export_enrollments, export_payments
 
 class PaymentInline(admin.TabularInline):
     model = Payment
@@ -13,6 +14,17 @@ class PaymentInline(admin.TabularInline):
     fields = ('payment_date', 'amount_paid', 'payment_mode', 'payment_status')
     readonly_fields = ('payment_date',)
 
+class InstallmentInline(admin.TabularInline):
+    # Derived from the enrollment and its payments; see InstallmentSchedule
+    model = InstallmentSchedule
+    extra = 0
+    can_delete = False
+    fields = ('number', 'due_date', 'amount', 'amount_paid', 'status')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(StudentEnrollment)
 class StudentEnrollmentAdmin(admin.ModelAdmin):
     list_display = (
@@ -31,7 +43,19 @@ class StudentEnrollmentAdmin(admin.ModelAdmin):
     search_fields = (
         'student__full_name', 'student__father_name', 'student__email', 'student__contact', 'course__course_name'
     )
-    inlines = [PaymentInline]
+    inlines = [PaymentInline, InstallmentInline]
+    actions = ['export_csv', 'export_xlsx']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_financials().select_related('student__referred_by')
+
+    @admin.action(description="Export selected enrollments (CSV)")
+    def export_csv(self, request, queryset):
+        return export_enrollments(queryset, 'csv')
+
+    @admin.action(description="Export selected enrollments (Excel)")
+    def export_xlsx(self, request, queryset):
+        return export_enrollments(queryset, 'xlsx')
 
     # Related student fields display methods
     def get_full_name(self, obj):
@@ -74,13 +98,13 @@ class StudentEnrollmentAdmin(admin.ModelAdmin):
     get_state.admin_order_field = 'student__state'
 
     def get_referred_by_display(self, obj):
-        if obj.referred_by:
-            return obj.referred_by.full_name
-        return obj.referred_by_name
+        if obj.student.referred_by:
+            return obj.student.referred_by.full_name
+        return obj.student.referred_by_name
     get_referred_by_display.short_description = "Referred By"
 
     def get_referral_source_display(self, obj):
-        return obj.get_referral_source_display()
+        return obj.student.get_referral_source_display()
     get_referral_source_display.short_description = "Referral Source"
 
     def get_payment_method(self, obj):
@@ -96,8 +120,9 @@ class StudentEnrollmentAdmin(admin.ModelAdmin):
     get_payment_status.short_description = "Payment Status"
 
     def amount_paid(self, obj):
-        return obj.course_fee_paid + obj.admission_fee_paid
+        return obj.total_paid_amount
     amount_paid.short_description = "Total Paid"
+    amount_paid.admin_order_field = 'total_paid_amount'
 
     def amount_due(self, obj):
         return obj.amount_due
@@ -122,3 +147,20 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ('enrollment', 'payment_date', 'amount_paid', 'payment_mode', 'payment_status')
     search_fields = ('enrollment__student__full_name', 'enrollment__course__course_name')
     list_filter = ('payment_mode', 'payment_status')
+    actions = ['export_csv', 'export_xlsx']
+
+    @admin.action(description="Export selected payments (CSV)")
+    def export_csv(self, request, queryset):
+        return export_payments(queryset, 'csv')
+
+    @admin.action(description="Export selected payments (Excel)")
+    def export_xlsx(self, request, queryset):
+        return export_payments(queryset, 'xlsx')
+
+@admin.register(DuesReminder)
+class DuesReminderAdmin(admin.ModelAdmin):
+    list_display = ('student', 'channel', 'recipient', 'amount', 'status', 'attempts', 'created_at', 'sent_at')
+    search_fields = ('student__full_name', 'student__student_id', 'recipient')
+    list_filter = ('status', 'channel')
+    list_select_related = ('student',)
+    readonly_fields = ('student', 'channel', 'recipient', 'subject', 'body', 'amount', 'attempts', 'last_error', 'created_at', 'claimed_at', 'sent_at')
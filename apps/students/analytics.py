@@ -0,0 +1,158 @@
+"""
+Aggregates behind the dashboard charts, served as JSON and cached.
+
+Every dataset is cached for ANALYTICS_CACHE_TIMEOUT seconds under a shared version key.
+Payment, StudentEnrollment and Expense writes drop the version (signal receivers below,
+plus explicit calls from the bulk paths that bypass signals), so the next request
+recomputes. Collections and income/expense figures are read from the monthly rollups,
+not from the Payment table.
+"""
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Payment, StudentEnrollment, MonthlyPaymentRollup, PAYMENT_MODE_CHOICES, STATUS_CHOICES
+from apps.Expenses.models import Expense, MonthlyExpenseRollup
+from apps.Settings.models import soft_delete_changed
+
+ANALYTICS_CACHE_TIMEOUT = 300
+ANALYTICS_VERSION_KEY = 'analytics:version'
+ANALYTICS_MONTHS = 12
+
+# (label, lowest days overdue, highest days overdue)
+DUES_AGEING_BUCKETS = [
+    ('Not yet due', None, 0),
+    ('1-30 days', 1, 30),
+    ('31-60 days', 31, 60),
+    ('61-90 days', 61, 90),
+    ('90+ days', 91, None),
+]
+
+
+def _recent_months(count=ANALYTICS_MONTHS):
+    """First days of the last `count` months, oldest first, ending with the current month."""
+    month = timezone.localdate().replace(day=1)
+    months = []
+    for _ in range(count):
+        months.append(month)
+        month = (month - datetime.timedelta(days=1)).replace(day=1)
+    return months[::-1]
+
+
+def _monthly_series(rollup, months):
+    totals = dict(rollup.filter(month__gte=months[0]).values_list('month').annotate(total=Sum('total_amount')))
+    return [float(totals.get(month, 0)) for month in months]
+
+
+def collections():
+    """Collected amount per month for the last twelve months, one series per payment mode."""
+    months = _recent_months()
+    return {
+        'labels': [f"{month:%b %Y}" for month in months],
+        'series': [
+            {'name': label, 'data': _monthly_series(MonthlyPaymentRollup.objects.filter(payment_mode=mode), months)}
+            for mode, label in PAYMENT_MODE_CHOICES
+        ],
+    }
+
+
+def income_vs_expenses():
+    """Monthly income, expenses and net for the last twelve months."""
+    months = _recent_months()
+    income = _monthly_series(MonthlyPaymentRollup.objects.all(), months)
+    expenses = _monthly_series(MonthlyExpenseRollup.objects.all(), months)
+    return {
+        'labels': [f"{month:%b %Y}" for month in months],
+        'series': [
+            {'name': 'Income', 'data': income},
+            {'name': 'Expenses', 'data': expenses},
+            {'name': 'Net', 'data': [round(i - e, 2) for i, e in zip(income, expenses)]},
+        ],
+    }
+
+
+def enrollments_per_course():
+    """Enrollments per active course, split by enrollment status."""
+    rows = StudentEnrollment.objects.filter(is_deleted=False, course__is_deleted=False).values(
+        'course__course_name',
+    ).annotate(**{
+        status: Count('pk', filter=Q(status=status)) for status, _ in STATUS_CHOICES
+    }).order_by('course__course_name')
+    rows = list(rows)
+    return {
+        'labels': [row['course__course_name'] for row in rows],
+        'series': [{'name': label, 'data': [row[status] for row in rows]} for status, label in STATUS_CHOICES],
+    }
+
+
+def dues_ageing():
+    """Outstanding balances bucketed by days past the enrollment due date."""
+    today = timezone.localdate()
+    buckets = {}
+    for index, (label, low, high) in enumerate(DUES_AGEING_BUCKETS):
+        condition = Q()
+        if low is None:
+            condition &= Q(due_date__isnull=True) | Q(due_date__gte=today - datetime.timedelta(days=high))
+        else:
+            condition &= Q(due_date__lte=today - datetime.timedelta(days=low))
+            if high is not None:
+                condition &= Q(due_date__gte=today - datetime.timedelta(days=high))
+        buckets[f'amount_{index}'] = Sum('amount_remaining', filter=condition)
+        buckets[f'count_{index}'] = Count('pk', filter=condition)
+    totals = StudentEnrollment.objects.filter(is_deleted=False, amount_remaining__gt=0).aggregate(**buckets)
+    return {
+        'labels': [label for label, _, _ in DUES_AGEING_BUCKETS],
+        'series': [{
+            'name': 'Outstanding',
+            'data': [float(totals[f'amount_{index}'] or Decimal('0')) for index in range(len(DUES_AGEING_BUCKETS))],
+        }],
+        'counts': [totals[f'count_{index}'] for index in range(len(DUES_AGEING_BUCKETS))],
+    }
+
+
+DATASETS = {
+    'collections': collections,
+    'income-vs-expenses': income_vs_expenses,
+    'enrollments-per-course': enrollments_per_course,
+    'dues-ageing': dues_ageing,
+}
+
+
+def get_analytics(name):
+    """The named dataset from cache, computing and caching it on a miss. KeyError if unknown."""
+    compute = DATASETS[name]
+    version = cache.get(ANALYTICS_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.set(ANALYTICS_VERSION_KEY, version, ANALYTICS_CACHE_TIMEOUT)
+    key = f'analytics:{name}'
+    data = cache.get(key, version=version)
+    if data is None:
+        data = compute()
+        data['generated_at'] = timezone.now().isoformat()
+        cache.set(key, data, ANALYTICS_CACHE_TIMEOUT, version=version)
+    return data
+
+
+def invalidate_analytics():
+    """Make every dataset recompute on its next request."""
+    cache.delete(ANALYTICS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Payment, dispatch_uid='analytics_payment_saved')
+@receiver(post_delete, sender=Payment, dispatch_uid='analytics_payment_deleted')
+@receiver(post_save, sender=StudentEnrollment, dispatch_uid='analytics_enrollment_saved')
+@receiver(post_delete, sender=StudentEnrollment, dispatch_uid='analytics_enrollment_deleted')
+@receiver(post_save, sender=Expense, dispatch_uid='analytics_expense_saved')
+@receiver(post_delete, sender=Expense, dispatch_uid='analytics_expense_deleted')
+@receiver(soft_delete_changed, sender=StudentEnrollment, dispatch_uid='analytics_enrollments_trashed')
+@receiver(soft_delete_changed, sender=Expense, dispatch_uid='analytics_expenses_trashed')
+def _finance_data_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_analytics)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StudentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.students'
+
+    def ready(self):
+        # Connect the dashboard/PDF cache invalidation, search, autocomplete and referral receivers
+        from . import analytics, autocomplete, documents, referrals, search  # noqa: F401
@@ -0,0 +1,217 @@
+"""
+In-process autocomplete indexes of active students and courses.
+
+Each worker keeps a sorted array of (key, id) pairs per kind, built on first use: a
+student is filed under its name words, student ID and phone digits, a course under its
+name words. A lookup is a binary search for the typed prefix, with no database work
+beyond one indexed read of AutocompleteChange. That table is written (after commit)
+whenever a Student or Course is saved or deleted; workers re-read just the changed
+objects and patch their arrays. Change ids can commit out of order, so a worker keeps
+the ids it found missing below the last one it read and looks for them again on its
+next syncs, for CHANGE_GAP_TIMEOUT. Indexes are rebuilt from scratch every
+AUTOCOMPLETE_REBUILD_INTERVAL (which also prunes change rows older than a day), and
+whenever a worker has been idle long enough that rows it needs may have been pruned.
+"""
+import datetime
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AutocompleteChange, Student
+from .search import _fold, _phone_digits, _words
+from apps.courses.models import Course
+from apps.Settings.models import soft_delete_changed
+
+AUTOCOMPLETE_RESULTS = 10
+AUTOCOMPLETE_REBUILD_INTERVAL = 3600  # seconds
+CHANGE_RETENTION = datetime.timedelta(days=1)
+# Seconds a missing change id is looked for before it is taken to be a rolled-back insert
+CHANGE_GAP_TIMEOUT = 60
+# More missing ids than this and the indexes are rebuilt instead
+MAX_CHANGE_GAPS = 1000
+# Index entries looked at per query before giving up on filling the result list
+MAX_SCAN = 5000
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs plus a record (the JSON returned to the browser) per id."""
+
+    def __init__(self, kind, queryset, fields, keys):
+        self.kind = kind
+        self.queryset = queryset
+        self.fields = fields
+        self.keys_for = keys
+        self.entries = []
+        self.records = {}
+        self.terms = {}
+
+    def load(self, ids=None):
+        """Records of active objects, all of them or just `ids`: {id: record}."""
+        queryset = self.queryset()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return {row['pk']: row for row in queryset.values('pk', *self.fields).iterator(chunk_size=5000)}
+
+    def rebuild(self):
+        records = self.load()
+        entries = []
+        terms = {}
+        for pk, record in records.items():
+            terms[pk] = self.keys_for(record)
+            entries.extend((key, pk) for key in terms[pk])
+        entries.sort()
+        self.entries, self.records, self.terms = entries, records, terms
+
+    def update(self, ids):
+        """Re-read `ids` and replace their entries (dropping the ones no longer active)."""
+        fresh = self.load(ids)
+        for pk in ids:
+            for key in self.terms.pop(pk, ()):
+                position = bisect_left(self.entries, (key, pk))
+                if position < len(self.entries) and self.entries[position] == (key, pk):
+                    del self.entries[position]
+            self.records.pop(pk, None)
+            if pk in fresh:
+                self.records[pk] = fresh[pk]
+                self.terms[pk] = self.keys_for(fresh[pk])
+                for key in self.terms[pk]:
+                    insort(self.entries, (key, pk))
+
+    def search(self, query, limit):
+        words = sorted(set(_words(query)), key=len, reverse=True)
+        if not words:
+            return []
+        first, rest = words[0], words[1:]
+        results, seen = [], set()
+        position = bisect_left(self.entries, (first,))
+        end = min(len(self.entries), position + MAX_SCAN)
+        while position < end and len(results) < limit:
+            key, pk = self.entries[position]
+            position += 1
+            if not key.startswith(first):
+                break
+            if pk in seen:
+                continue
+            seen.add(pk)
+            if all(any(term.startswith(word) for term in self.terms[pk]) for word in rest):
+                results.append(self.records[pk])
+        return results
+
+
+def _student_keys(record):
+    keys = set(_words(record['full_name']))
+    keys.add(_fold(record['student_id']))
+    digits = _phone_digits(record['contact'])
+    if digits:
+        keys.add(digits)
+    return keys
+
+
+def _course_keys(record):
+    return set(_words(record['course_name']))
+
+
+INDEXES = {
+    'student': PrefixIndex(
+        'student', lambda: Student.objects.filter(is_deleted=False),
+        ['student_id', 'full_name', 'email', 'contact', 'father_name'], _student_keys,
+    ),
+    'course': PrefixIndex(
+        'course', lambda: Course.objects.filter(is_deleted=False),
+        ['course_name', 'course_fee', 'course_duration', 'duration_type'], _course_keys,
+    ),
+}
+
+_lock = threading.Lock()
+_state = {'last_change': None, 'built_at': 0.0, 'synced_at': 0.0}
+# Change ids below last_change not seen yet: {id: when first missed}
+_gaps = {}
+
+
+def _sync():
+    """Bring every index up to date. Call with _lock held."""
+    now = time.monotonic()
+    stale = (
+        _state['last_change'] is None
+        or now - _state['built_at'] > AUTOCOMPLETE_REBUILD_INTERVAL
+        or now - _state['synced_at'] > CHANGE_RETENTION.total_seconds() / 2
+        or len(_gaps) > MAX_CHANGE_GAPS
+    )
+    if stale:
+        # Note the position in the change log first, so changes made during the
+        # rebuild are applied (again, harmlessly) on the next sync
+        latest = AutocompleteChange.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for index in INDEXES.values():
+            index.rebuild()
+        AutocompleteChange.objects.filter(created_at__lt=timezone.now() - CHANGE_RETENTION).delete()
+        _state.update(last_change=latest, built_at=now, synced_at=now)
+        _gaps.clear()
+        return
+
+    last = _state['last_change']
+    changes = list(AutocompleteChange.objects.filter(Q(pk__gt=last) | Q(pk__in=list(_gaps))).order_by('pk').values_list(
+        'pk', 'kind', 'object_id',
+    ))
+    seen = {pk for pk, _, _ in changes}
+    for pk in list(_gaps):
+        if pk in seen or now - _gaps[pk] > CHANGE_GAP_TIMEOUT:
+            del _gaps[pk]
+    if changes and changes[-1][0] > last:
+        # Ids skipped on the way to the newest one may belong to inserts not committed yet
+        for pk in range(last + 1, changes[-1][0]):
+            if pk not in seen:
+                _gaps[pk] = now
+        _state['last_change'] = changes[-1][0]
+    if changes:
+        changed = {}
+        for _, kind, object_id in changes:
+            changed.setdefault(kind, set()).add(object_id)
+        for kind, ids in changed.items():
+            index = INDEXES.get(kind)
+            if index is not None:
+                index.update([int(pk) for pk in ids] if kind == 'course' else list(ids))
+    _state['synced_at'] = now
+
+
+def autocomplete(kind, query, limit=AUTOCOMPLETE_RESULTS):
+    """Records of the active students or courses (`kind`) with a key starting with each word of `query`."""
+    with _lock:
+        _sync()
+        return INDEXES[kind].search(query, limit)
+
+
+def record_changes(kind, ids):
+    """Log changed objects for the autocomplete indexes of every worker, once the transaction commits."""
+    ids = [str(pk) for pk in ids]
+    if not ids:
+        return
+
+    def write():
+        AutocompleteChange.objects.bulk_create([AutocompleteChange(kind=kind, object_id=pk) for pk in ids])
+    # Written after commit, so a worker reading the row also sees the change it logs. Ids
+    # may still commit out of order; _sync() looks again for the ones it found missing
+    transaction.on_commit(write)
+
+
+@receiver(post_save, sender=Student, dispatch_uid='autocomplete_student_saved')
+@receiver(post_delete, sender=Student, dispatch_uid='autocomplete_student_deleted')
+def _student_changed(sender, instance, **kwargs):
+    record_changes('student', [instance.pk])
+
+
+@receiver(post_save, sender=Course, dispatch_uid='autocomplete_course_saved')
+@receiver(post_delete, sender=Course, dispatch_uid='autocomplete_course_deleted')
+def _course_changed(sender, instance, **kwargs):
+    record_changes('course', [instance.pk])
+
+
+@receiver(soft_delete_changed, sender=Student, dispatch_uid='autocomplete_students_trashed')
+@receiver(soft_delete_changed, sender=Course, dispatch_uid='autocomplete_courses_trashed')
+def _trashed(sender, pks, **kwargs):
+    record_changes('student' if sender is Student else 'course', pks)
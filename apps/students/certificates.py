@@ -0,0 +1,165 @@
+"""
+Certificates for a whole batch at once.
+
+complete_enrollments() marks the selected enrollments completed and hands out any
+missing certificate numbers as one block, in a single transaction. certificate_zip_stream()
+then yields a ZIP of their certificates: PDFs already in the document cache are added
+as they are, the rest are rendered by a pool of worker processes and added (and cached)
+as each one finishes. A certificate that fails to render is left out and listed, with
+its error, in the ZIP's ERRORS.txt.
+"""
+import datetime
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from dateutil import relativedelta
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils.text import slugify
+
+from . import documents
+from .analytics import invalidate_analytics
+from .exports import _ChunkBuffer
+from .models import StudentEnrollment, reserve_certificate_numbers
+from apps.Enquiries.funnel import refresh_enrollments
+
+CERTIFICATE_TEMPLATE = "students/certificate.html"
+CERTIFICATE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Written into the ZIP when any certificate could not be rendered
+ERRORS_NAME = 'ERRORS.txt'
+
+logger = logging.getLogger(__name__)
+
+# Enough for the url fetcher, which maps /static/ and /media/ paths to local files
+DEFAULT_BASE_URL = 'http://localhost/'
+
+
+def certificate_end_date(enrollment):
+    duration = getattr(enrollment.course, 'course_duration', 0) or 0
+    dtype = getattr(enrollment.course, "duration_type", "months")
+
+    if dtype == "months":
+        return enrollment.enrollment_date + relativedelta.relativedelta(months=duration)
+    if dtype == "weeks":
+        return enrollment.enrollment_date + datetime.timedelta(weeks=duration)
+    if dtype == "days":
+        return enrollment.enrollment_date + datetime.timedelta(days=duration)
+    return None
+
+
+def certificate_document(enrollment):
+    """(context, depends_on) for rendering an enrollment's certificate."""
+    end_date = certificate_end_date(enrollment)
+    context = {
+        "student": enrollment.student,
+        "enrollment": enrollment,
+        "end_date": end_date,
+    }
+    return context, [enrollment, enrollment.student, enrollment.course, end_date]
+
+
+def batch_enrollments(course=None, batch_time=None, enrollment_ids=None):
+    """
+    Enrollments of `course` at `batch_time` that are still running or already completed,
+    or, when `enrollment_ids` is given, exactly those enrollments (by id or t_id).
+    """
+    queryset = StudentEnrollment.objects.filter(is_deleted=False, student__is_deleted=False)
+    if enrollment_ids:
+        ids = [str(value).strip() for value in enrollment_ids if str(value).strip()]
+        return queryset.filter(Q(pk__in=[int(value) for value in ids if value.isdigit()]) | Q(t_id__in=ids))
+    return queryset.filter(course=course, batch_time=batch_time, status__in=['active', 'completed'])
+
+
+def complete_enrollments(queryset):
+    """
+    Mark every enrollment in `queryset` completed and give the ones without a certificate
+    number a block of new numbers, in one transaction. Returns the enrollments, with
+    student and course loaded, ordered by student name.
+    """
+    with transaction.atomic():
+        enrollments = list(
+            queryset.select_for_update(of=('self',)).select_related('student', 'course').order_by('student__full_name', 'pk')
+        )
+        if not enrollments:
+            return []
+        missing = [enrollment for enrollment in enrollments if not enrollment.certificate_number]
+        if missing:
+            for enrollment, number in zip(missing, reserve_certificate_numbers(len(missing))):
+                enrollment.certificate_number = number
+            StudentEnrollment.objects.bulk_update(missing, ['certificate_number'])
+        StudentEnrollment.objects.filter(pk__in=[enrollment.pk for enrollment in enrollments]).update(status='completed')
+        for enrollment in enrollments:
+            enrollment.status = 'completed'
+        transaction.on_commit(invalidate_analytics)
+        refresh_enrollments([enrollment.pk for enrollment in enrollments])
+    return enrollments
+
+
+def _archive_name(enrollment, extension):
+    return f"{enrollment.certificate_number}-{slugify(enrollment.student.full_name) or enrollment.student_id}.{extension}"
+
+
+def certificate_zip_stream(enrollments, request=None, workers=CERTIFICATE_WORKERS, failed=None):
+    """
+    Yield the bytes of a ZIP holding one certificate per enrollment. The response is
+    already streaming when a render fails, so the failures go into ERRORS.txt in the ZIP
+    (and onto the `failed` list, when given) instead of an error status.
+    """
+    template = get_template(CERTIFICATE_TEMPLATE)
+    base_url = request.build_absolute_uri('/') if request else DEFAULT_BASE_URL
+    buffer = _ChunkBuffer()
+    # PDFs are already compressed
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        pending, errors = [], []
+        for enrollment in enrollments:
+            context, depends_on = certificate_document(enrollment)
+            if documents.weasyprint is None:
+                archive.writestr(_archive_name(enrollment, 'html'), template.render(context, request))
+                yield buffer.drain()
+                continue
+            _, path = documents.cached_document(CERTIFICATE_TEMPLATE, depends_on, documents.CERTIFICATE, enrollment.pk)
+            if path.exists():
+                archive.write(path, _archive_name(enrollment, 'pdf'))
+                yield buffer.drain()
+            else:
+                pending.append((_archive_name(enrollment, 'pdf'), path, template.render(context, request)))
+
+        if pending:
+            # Spawned rather than forked workers, so they never share this process's
+            # database connections; each one only needs Django's settings and templates.
+            pool = ProcessPoolExecutor(
+                max_workers=max(1, min(workers, len(pending))),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+            try:
+                futures = {
+                    pool.submit(documents.html_to_pdf, html, base_url): (name, path)
+                    for name, path, html in pending
+                }
+                for future in as_completed(futures):
+                    name, path = futures.pop(future)
+                    try:
+                        pdf = future.result()
+                    except Exception as exc:  # one bad certificate (or a dead worker) must not end the ZIP
+                        logger.exception("Rendering certificate %s failed.", name)
+                        errors.append(f"{name}: {str(exc) or exc.__class__.__name__}")
+                        continue
+                    documents.store_document(path, pdf)
+                    archive.writestr(name, pdf)
+                    yield buffer.drain()
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+        if errors:
+            archive.writestr(ERRORS_NAME, "These certificates could not be rendered:\n\n" + "\n".join(sorted(errors)) + "\n")
+            yield buffer.drain()
+            if failed is not None:
+                failed.extend(errors)
+    yield buffer.drain()
@@ -0,0 +1,150 @@
+"""
+PDF rendering of receipts and certificates, cached on disk.
+
+A document is stored as PDF_CACHE_DIR/<kind>/<owner id>/<key>.pdf, where the key is a
+SHA-256 of the template (name and modification time) and the field values of every
+record the document shows. An unchanged receipt is therefore served straight from disk;
+any change to the payment, enrollment, student or course gives a new key, and the stale
+file is replaced on the next render. Payment writes also remove the affected receipts
+right away. Anything else a document shows must be in depends_on too: receipts print
+the date they were rendered, so the views add today's date and a receipt is rendered
+at most once a day.
+
+PDFs are produced with WeasyPrint (see requirements.txt for the system libraries it
+needs). Without it the views log a warning and serve the HTML, as before.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import FileResponse, HttpResponse
+from django.template.loader import get_template
+
+from .models import Payment
+
+try:
+    import weasyprint
+except (ImportError, OSError):  # OSError: Pango/cairo libraries missing
+    weasyprint = None
+
+logger = logging.getLogger(__name__)
+
+ENROLLMENT_RECEIPT = 'enrollment-receipt'
+PAYMENT_RECEIPT = 'payment-receipt'
+CERTIFICATE = 'certificate'
+
+
+def pdf_cache_dir():
+    return Path(getattr(settings, 'PDF_CACHE_DIR', Path(settings.BASE_DIR) / 'pdf_cache'))
+
+
+def _fingerprint(value):
+    """JSON-able form of a context value; model instances become their concrete field values."""
+    if isinstance(value, models.Model):
+        fields = {}
+        for field in value._meta.concrete_fields:
+            raw = getattr(value, field.attname)
+            fields[field.attname] = raw.name if isinstance(raw, models.fields.files.FieldFile) else _fingerprint(raw)
+        return [value._meta.label, fields]
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _fingerprint(item) for key, item in value.items()}
+    if isinstance(value, (datetime.date, datetime.time, Decimal)):
+        return str(value)
+    return value
+
+
+def document_key(template_name, depends_on):
+    template = get_template(template_name)
+    source = getattr(template.origin, 'name', None)
+    payload = json.dumps([
+        template_name,
+        os.path.getmtime(source) if source and os.path.exists(source) else None,
+        _fingerprint(depends_on),
+    ], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _url_fetcher(url, *args, **kwargs):
+    """Load /static/ and /media/ files from disk instead of over HTTP from this same server."""
+    path = urlparse(url).path
+    local = None
+    if path.startswith(settings.STATIC_URL):
+        relative = path[len(settings.STATIC_URL):]
+        local = finders.find(relative) or os.path.join(settings.STATIC_ROOT, relative)
+    elif path.startswith(settings.MEDIA_URL):
+        local = os.path.join(settings.MEDIA_ROOT, path[len(settings.MEDIA_URL):])
+    if local and os.path.exists(local):
+        url = Path(local).resolve().as_uri()
+    return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+
+def cached_document(template_name, depends_on, kind, owner_id):
+    """(key, path) of the cached PDF for these records; the file may not exist yet."""
+    key = document_key(template_name, depends_on)
+    return key, pdf_cache_dir() / kind / str(owner_id) / f'{key}.pdf'
+
+
+def html_to_pdf(html, base_url):
+    """Render an HTML document to PDF bytes. Touches no models, so it can run in a worker process."""
+    return weasyprint.HTML(string=html, base_url=base_url, url_fetcher=_url_fetcher).write_pdf()
+
+
+def store_document(path, pdf):
+    """Write `pdf` to `path`, replacing any stale PDF cached for the same document."""
+    directory = path.parent
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob('*.pdf'):
+        stale.unlink(missing_ok=True)
+    # Write then rename, so a concurrent request never serves a half-written file
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as tmp:
+        tmp.write(pdf)
+    os.replace(tmp.name, path)
+
+
+def render_document(request, template_name, context, depends_on, kind, owner_id, filename):
+    """
+    Serve `template_name` rendered with `context` as a PDF, from the disk cache when the
+    records in `depends_on` are unchanged since it was last rendered.
+    """
+    if weasyprint is None:
+        logger.warning("WeasyPrint is not available; serving %s as HTML.", template_name)
+        return HttpResponse(get_template(template_name).render(context, request), content_type='text/html')
+
+    key, path = cached_document(template_name, depends_on, kind, owner_id)
+    if not path.exists():
+        html = get_template(template_name).render(context, request)
+        store_document(path, html_to_pdf(html, request.build_absolute_uri('/')))
+
+    response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename=filename)
+    response['ETag'] = f'"{key}"'
+    return response
+
+
+def invalidate_documents(kind, owner_id):
+    shutil.rmtree(pdf_cache_dir() / kind / str(owner_id), ignore_errors=True)
+
+
+@receiver(post_save, sender=Payment, dispatch_uid='documents_payment_saved')
+@receiver(post_delete, sender=Payment, dispatch_uid='documents_payment_deleted')
+def _payment_changed(sender, instance, **kwargs):
+    # Capture the ids now: Model.delete() clears instance.pk before the commit hook runs
+    payment_id, enrollment_id = instance.pk, instance.enrollment_id
+
+    def invalidate():
+        invalidate_documents(PAYMENT_RECEIPT, payment_id)
+        invalidate_documents(ENROLLMENT_RECEIPT, enrollment_id)
+    transaction.on_commit(invalidate)
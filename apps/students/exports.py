@@ -0,0 +1,221 @@
+"""
+Streaming CSV / XLSX exports of enrollments, payments and expenses.
+
+Rows are pulled with QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE) and written to a
+StreamingHttpResponse as they are produced, so memory use does not grow with the size
+of the table. XLSX files are written as a streamed zip of plain SpreadsheetML, which
+needs no third-party library.
+"""
+import csv
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+
+ENROLLMENT_COLUMNS = [
+    ('Enrollment ID', lambda e: e.t_id),
+    ('Student ID', lambda e: e.student.student_id),
+    ('Full Name', lambda e: e.student.full_name),
+    ('Email', lambda e: e.student.email),
+    ('Contact', lambda e: e.student.contact),
+    ('Course', lambda e: e.course.course_name),
+    ('Batch Time', lambda e: e.batch_time),
+    ('Enrollment Date', lambda e: e.enrollment_date),
+    ('Due Date', lambda e: e.due_date),
+    ('Status', lambda e: e.get_status_display()),
+    ('Payment Method', lambda e: e.get_payment_method_display()),
+    ('Payment Mode', lambda e: e.get_payment_mode_display()),
+    ('Course Fee', lambda e: e.course.course_fee),
+    ('Discount', lambda e: e.discount),
+    ('Admission Fee', lambda e: e.admission_fee),
+    ('Final Amount', lambda e: e.final_amount),
+    ('Admission Fee Paid', lambda e: e.admission_fee_paid),
+    ('Course Fee Paid', lambda e: e.course_fee_paid),
+    ('Total Paid', lambda e: e.total_amount_paid),
+    ('Amount Remaining', lambda e: e.amount_remaining),
+    ('Amount Due', lambda e: e.amount_due),
+    ('Payment Status', lambda e: e.get_payment_status_display()),
+    ('Certificate Number', lambda e: e.certificate_number),
+]
+
+PAYMENT_COLUMNS = [
+    ('Payment Date', lambda p: p.payment_date),
+    ('Enrollment ID', lambda p: p.enrollment.t_id),
+    ('Student ID', lambda p: p.enrollment.student.student_id),
+    ('Student', lambda p: p.enrollment.student.full_name),
+    ('Course', lambda p: p.enrollment.course.course_name),
+    ('Fee Type', lambda p: p.remarks),
+    ('Amount', lambda p: p.amount),
+    ('Amount Paid', lambda p: p.amount_paid),
+    ('Payment Mode', lambda p: p.get_payment_mode_display()),
+    ('Payment Status', lambda p: p.get_payment_status_display()),
+    ('Payment Method', lambda p: p.enrollment.get_payment_method_display()),
+]
+
+EXPENSE_COLUMNS = [
+    ('Date', lambda x: x.date),
+    ('Expense', lambda x: x.expense_name),
+    ('Expense By', lambda x: x.expense_by.name),
+    ('Amount', lambda x: x.amount),
+    ('Remarks', lambda x: x.remarks),
+]
+
+
+def enrollment_export_queryset(queryset):
+    return queryset.select_related('student', 'course').order_by('enrollment_date', 'id')
+
+
+def payment_export_queryset(queryset):
+    return queryset.select_related(
+        'enrollment', 'enrollment__student', 'enrollment__course'
+    ).order_by('payment_date', 'id')
+
+
+def expense_export_queryset(queryset):
+    return queryset.select_related('expense_by').order_by('date', 'id')
+
+
+def _rows(queryset, columns):
+    for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [value(obj) for _, value in columns]
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: writerow() returns the line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def _csv_stream(header, rows):
+    writer = csv.writer(_Echo())
+    yield '﻿' + writer.writerow(header)  # BOM so Excel opens the file as UTF-8
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class _ChunkBuffer:
+    """Write-only, unseekable file for ZipFile; drain() hands back what was written so far."""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+
+# Characters that are not allowed in XML 1.0 text
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def _xlsx_stream(sheet_name, header, rows):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in XLSX_PARTS.items():
+            archive.writestr(name, xml)
+        archive.writestr('xl/workbook.xml', WORKBOOK_XML.format(name=escape(sheet_name[:31])))
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode())
+            for count, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if count % 500 == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def export_response(queryset, columns, name, file_format='csv'):
+    """
+    StreamingHttpResponse with `queryset` rendered through `columns` (a list of
+    (header, accessor) pairs) as CSV, or XLSX when file_format == 'xlsx'.
+    """
+    header = [title for title, _ in columns]
+    rows = _rows(queryset, columns)
+    filename = f"{name}_{timezone.localdate():%Y%m%d}"
+    if file_format == 'xlsx':
+        response = StreamingHttpResponse(
+            _xlsx_stream(name.replace('_', ' ').title(), header, rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        filename += '.xlsx'
+    else:
+        response = StreamingHttpResponse(_csv_stream(header, rows), content_type='text/csv; charset=utf-8')
+        filename += '.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_enrollments(queryset, file_format='csv'):
+    return export_response(enrollment_export_queryset(queryset), ENROLLMENT_COLUMNS, 'enrollments', file_format)
+
+
+def export_payments(queryset, file_format='csv'):
+    return export_response(payment_export_queryset(queryset), PAYMENT_COLUMNS, 'payments', file_format)
+
+
+def export_expenses(queryset, file_format='csv'):
+    return export_response(expense_export_queryset(queryset), EXPENSE_COLUMNS, 'expenses', file_format)
@@ -3,8 +3,9 @@ from django.utils import timezone
 from decimal import Decimal
 
 from .models import Student, StudentEnrollment, REFERRAL_SOURCE_CHOICES, STATUS_CHOICES, Payment
+from .referrals import would_create_cycle
 from apps.courses.models import Course
-from apps.Settings.models import Setting
+from apps.Settings.models import get_settings
 
 
 class StudentEnrollmentForm(forms.ModelForm):
@@ -19,7 +20,8 @@ class StudentEnrollmentForm(forms.ModelForm):
         queryset=Student.objects.filter(is_deleted=False),
         required=False,
         label='Select Existing Student',
-        widget=forms.Select(attrs={'class': 'form-select'}),
+        # Picked with the autocomplete box in the template; a <select> would list every student
+        widget=forms.HiddenInput,
     )
 
     # New student fields
@@ -120,9 +122,7 @@ class StudentEnrollmentForm(forms.ModelForm):
 
         # Set admission fee initial from settings if creating new enrollment
         if not (self.instance and self.instance.pk):
-            setting = Setting.objects.first()
-            default_adm_fee = setting.admission_fee if setting else Decimal('0.00')
-            self.fields['admission_fee'].initial = default_adm_fee
+            self.fields['admission_fee'].initial = get_settings().admission_fee
 
     def clean(self):
         cleaned_data = super().clean()
@@ -136,6 +136,11 @@ class StudentEnrollmentForm(forms.ModelForm):
                 qs = qs.exclude(pk=self.instance.student.pk)
             if qs.exists():
                 self.add_error('email', 'A student with this email already exists.')
+
+        referred_by_student_id = cleaned_data.get('referred_by_student_id')
+        student = getattr(self.instance, 'student', None) if self.instance and self.instance.pk else None
+        if student_type == 'new' and student and would_create_cycle(student.pk, referred_by_student_id):
+            self.add_error('referred_by_student_id', 'A student cannot be referred by themselves or by someone they referred.')
         return cleaned_data
 
     def save(self, commit=True):
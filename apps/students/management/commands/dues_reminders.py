@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.students.reminders import REMINDER_BATCH_SIZE, queue_reminders, reminder_channels, send_reminders
+
+
+class Command(BaseCommand):
+    help = "Queue fee reminders for upcoming and overdue installments, then send the queued reminders in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days-ahead', type=int, help="Remind about installments due within this many days (default: the setting).")
+        parser.add_argument('--interval', type=int, help="Days before a student is reminded again (default: the setting).")
+        parser.add_argument('--channel', action='append', choices=['email', 'sms'], help="Channel to queue for; repeatable (default: DUES_REMINDER_CHANNELS).")
+        parser.add_argument('--batch-size', type=int, default=REMINDER_BATCH_SIZE, help="Reminders sent per backend call.")
+        parser.add_argument('--queue-only', action='store_true', help="Queue reminders without sending them.")
+        parser.add_argument('--send-only', action='store_true', help="Only send reminders already queued.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the reminders that would be queued.")
+        parser.add_argument('--every', type=int, metavar='SECONDS', help="Keep running, repeating every SECONDS.")
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once(options)
+            if not options['every'] or options['dry_run']:
+                return
+            time.sleep(options['every'])
+
+    def run_once(self, options):
+        channels = options['channel'] or reminder_channels()
+        if not options['send_only']:
+            queued = queue_reminders(
+                days_ahead=options['days_ahead'], interval=options['interval'], channels=channels,
+                dry_run=options['dry_run'],
+            )
+            verb = "would be" if options['dry_run'] else "were"
+            for channel, count in queued.items():
+                self.stdout.write(f"{channel}: {count} reminders {verb} queued")
+        if not options['queue_only'] and not options['dry_run']:
+            sent, failed = send_reminders(batch_size=options['batch_size'], channels=channels)
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminders, {failed} failed."))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_time
+
+from apps.courses.models import Course
+from apps.students.certificates import (
+    CERTIFICATE_WORKERS, batch_enrollments, certificate_zip_stream, complete_enrollments,
+)
+
+
+class Command(BaseCommand):
+    help = "Mark a batch's enrollments completed and write all of their certificates to a ZIP file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="ZIP file to write.")
+        parser.add_argument('--course', help="Course name or id.")
+        parser.add_argument('--batch-time', help="Batch time as HH:MM; omit for enrollments without one.")
+        parser.add_argument('--enrollment', action='append', default=[], help="Enrollment id or t_id (repeatable); used instead of --course.")
+        parser.add_argument('--workers', type=int, default=CERTIFICATE_WORKERS, help="Processes rendering PDFs.")
+
+    def handle(self, *args, **options):
+        course = None
+        if not options['enrollment']:
+            if not options['course']:
+                raise CommandError("Give --course (with --batch-time) or one or more --enrollment.")
+            value = options['course']
+            course = Course.objects.filter(is_deleted=False, **(
+                {'pk': value} if value.isdigit() else {'course_name__iexact': value}
+            )).first()
+            if course is None:
+                raise CommandError(f"No active course {value!r}.")
+
+        batch_time = None
+        if options['batch_time']:
+            batch_time = parse_time(options['batch_time'])
+            if batch_time is None:
+                raise CommandError(f"Invalid batch time {options['batch_time']!r}.")
+
+        enrollments = complete_enrollments(batch_enrollments(course, batch_time, options['enrollment']))
+        if not enrollments:
+            raise CommandError("No enrollments match that batch.")
+
+        failed = []
+        with open(options['output'], 'wb') as out:
+            for chunk in certificate_zip_stream(enrollments, workers=options['workers'], failed=failed):
+                out.write(chunk)
+        if failed:
+            raise CommandError(
+                f"{len(failed)} of {len(enrollments)} certificates could not be rendered (see ERRORS.txt in "
+                f"{options['output']}):\n" + "\n".join(failed)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {len(enrollments)} enrollments; certificates written to {options['output']}."
+        ))
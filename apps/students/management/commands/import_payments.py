@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.students.models import PAYMENT_MODE_CHOICES
+from apps.students.payment_import import import_payments, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import payments from a CSV file or bank-statement export, matching rows to enrollments by t_id, student ID or contact."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import.")
+        parser.add_argument('--mode', default='bank_transfer', choices=dict(PAYMENT_MODE_CHOICES),
+                            help="Payment mode for rows without a mode column.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="Rows validated and posted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and match rows without posting payments.")
+        parser.add_argument('--report', help="Write unmatched and rejected rows to this CSV file.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                report = import_payments(
+                    stream, default_mode=options['mode'], chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as out:
+                report.write_csv(out)
+        else:
+            for number, raw, reason in report.rejected:
+                self.stdout.write(f"Row {number}: {reason}")
+
+        verb = "Would post" if options['dry_run'] else "Posted"
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report.rows_read} rows. {verb} {report.payments_posted} payments totalling ₹{report.amount_posted}; "
+            f"{len(report.rejected)} rows need reconciliation."
+        ))
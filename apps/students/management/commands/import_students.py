@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.students.student_import import import_students, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Create students and enrollments (with initial payments) in bulk from a CSV spreadsheet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="Rows validated and inserted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate rows without creating anything.")
+        parser.add_argument('--report', help="Write rejected rows to this CSV file.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                report = import_students(stream, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as out:
+                report.write_csv(out)
+        else:
+            for number, raw, reason in report.rejected:
+                self.stdout.write(f"Row {number}: {reason}")
+
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report.rows_read} rows. {verb} {report.students_created} students with "
+            f"{report.payments_posted} initial payments totalling ₹{report.amount_posted}; "
+            f"{len(report.rejected)} rows rejected."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.students.trash import PURGE_CHUNK_SIZE, PURGE_ORDER, TRASH_KINDS, purge, purgeable, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Permanently delete records that have been in the trash longer than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Retention in days (default: the trash retention setting).")
+        parser.add_argument('--chunk-size', type=int, default=PURGE_CHUNK_SIZE, help="Records deleted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the records that would be deleted.")
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        if cutoff is None:
+            self.stdout.write("Trash retention is unlimited; nothing to purge.")
+            return
+        total = 0
+        for kind in PURGE_ORDER:
+            model = TRASH_KINDS[kind].model
+            if options['dry_run']:
+                count = purgeable(model, cutoff).count()
+            else:
+                count = purge(model, cutoff, chunk_size=options['chunk_size'])
+            total += count
+            self.stdout.write(f"{kind}: {count}")
+        verb = "would be" if options['dry_run'] else "were"
+        self.stdout.write(self.style.SUCCESS(f"{total} records trashed before {cutoff:%Y-%m-%d %H:%M} {verb} deleted."))
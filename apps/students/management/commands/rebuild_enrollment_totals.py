@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.students.models import StudentEnrollment, paid_totals_aggregates
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify with --check) the stored paid-to-date totals on every enrollment from its payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report enrollments whose stored totals are out of sync.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        enrollments = StudentEnrollment.all_objects.select_related('course').annotate(
+            **paid_totals_aggregates('payments__')
+        ).order_by('pk')
+
+        checked = mismatched = 0
+        for enrollment in enrollments.iterator(chunk_size=options['chunk_size']):
+            checked += 1
+            admission_paid = Decimal(enrollment.admission_paid or 0)
+            course_paid = Decimal(enrollment.course_paid or 0)
+            if enrollment.admission_fee_paid_total == admission_paid and enrollment.course_fee_paid_total == course_paid:
+                continue
+
+            mismatched += 1
+            self.stdout.write(
+                f"{enrollment.t_id or enrollment.pk}: stored admission={enrollment.admission_fee_paid_total} "
+                f"course={enrollment.course_fee_paid_total}, actual admission={admission_paid} course={course_paid}"
+            )
+            if not check_only:
+                with transaction.atomic():
+                    enrollment.admission_fee_paid_total = admission_paid
+                    enrollment.course_fee_paid_total = course_paid
+                    enrollment.save()
+
+        if check_only and mismatched:
+            raise CommandError(f"{mismatched} of {checked} enrollments have out-of-sync paid totals.")
+
+        action = "found" if check_only else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} enrollments, {action} {mismatched} mismatches."))
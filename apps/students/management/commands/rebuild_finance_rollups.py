@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.Expenses.models import MonthlyExpenseRollup
+from apps.students.models import MonthlyPaymentRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute (or verify with --check) the monthly payment and expense rollups from the source tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report rollup rows that differ from the source tables.")
+
+    def handle(self, *args, **options):
+        mismatched = 0
+        for model in (MonthlyPaymentRollup, MonthlyExpenseRollup):
+            expected = model.compute()
+            stored = model.objects.as_totals()
+            differing = [key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key)]
+            mismatched += len(differing)
+            for key in sorted(differing, key=str):
+                self.stdout.write(f"{model.__name__} {key}: stored={stored.get(key)} actual={expected.get(key)}")
+            if not options['check']:
+                model.objects.replace_all(expected)
+            self.stdout.write(f"{model.__name__}: {len(expected)} rows, {len(differing)} differing.")
+
+        if options['check'] and mismatched:
+            raise CommandError(f"{mismatched} rollup rows are out of sync.")
+        self.stdout.write(self.style.SUCCESS("Rollups verified." if options['check'] else "Rollups rebuilt."))
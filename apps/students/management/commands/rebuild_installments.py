@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.students.models import StudentEnrollment, installment_changes, sync_installments
+
+
+class Command(BaseCommand):
+    help = "Regenerate (or verify with --check) the installment schedule of every enrollment."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report enrollments whose schedule is out of sync.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Enrollments handled per batch.")
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        enrollments = StudentEnrollment.all_objects.select_related('course').order_by('pk')
+
+        checked = mismatched = 0
+        chunk = []
+        for enrollment in enrollments.iterator(chunk_size=options['chunk_size']):
+            chunk.append(enrollment)
+            if len(chunk) >= options['chunk_size']:
+                mismatched += self._handle_chunk(chunk, check_only)
+                checked += len(chunk)
+                chunk = []
+        mismatched += self._handle_chunk(chunk, check_only)
+        checked += len(chunk)
+
+        if check_only and mismatched:
+            raise CommandError(f"{mismatched} of {checked} enrollments have out-of-sync installment schedules.")
+
+        action = "found" if check_only else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} enrollments, {action} {mismatched} mismatches."))
+
+    def _handle_chunk(self, enrollments, check_only):
+        create, update, delete = installment_changes(enrollments)
+        changed = {row.enrollment_id for row in create + update + delete}
+        for enrollment in enrollments:
+            if enrollment.pk in changed:
+                self.stdout.write(f"{enrollment.t_id or enrollment.pk}: installment schedule out of sync")
+        if not check_only:
+            sync_installments(enrollments)
+        return len(changed)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.students.models import ReferralPath, Student
+from apps.students.referrals import referral_paths
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify with --check) the referral closure table from Student.referred_by."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report whether the closure table is out of sync.")
+
+    def handle(self, *args, **options):
+        expected = set(referral_paths(dict(Student.all_objects.values_list('student_id', 'referred_by_id'))))
+        stored = set(ReferralPath.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        missing, extra = expected - stored, stored - expected
+        self.stdout.write(f"ReferralPath: {len(expected)} paths, {len(missing)} missing, {len(extra)} extra.")
+
+        if options['check']:
+            if missing or extra:
+                raise CommandError(f"{len(missing) + len(extra)} referral paths are out of sync.")
+            self.stdout.write(self.style.SUCCESS("Referral paths verified."))
+            return
+        with transaction.atomic():
+            ReferralPath.objects.all().delete()
+            ReferralPath.objects.bulk_create(
+                [ReferralPath(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in expected],
+                batch_size=2000,
+            )
+        self.stdout.write(self.style.SUCCESS("Referral paths rebuilt."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.students.models import Student, StudentSearchTerm
+from apps.students.search import index_students
+
+REBUILD_CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = "Rebuild the student search index (StudentSearchTerm) from the Student table."
+
+    def handle(self, *args, **options):
+        StudentSearchTerm.objects.all().delete()
+        chunk, indexed = [], 0
+        for student in Student.all_objects.only('student_id', 'full_name', 'email', 'contact').iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            chunk.append(student)
+            if len(chunk) >= REBUILD_CHUNK_SIZE:
+                index_students(chunk)
+                indexed += len(chunk)
+                chunk = []
+        index_students(chunk)
+        indexed += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} students."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.students.referrals import ReferralCycleError, resolve_referrer_names
+
+
+class Command(BaseCommand):
+    help = "Link students whose referrer is only recorded as free text (referred_by_name) to the matching student."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List the matches without saving them.")
+
+    def handle(self, *args, **options):
+        matches = resolve_referrer_names()
+        linked = 0
+        for student, referrer in matches:
+            self.stdout.write(f"{student.pk} '{student.referred_by_name}' -> {referrer.pk} {referrer.full_name}")
+            if options['dry_run']:
+                continue
+            student.referred_by = referrer
+            try:
+                with transaction.atomic():
+                    student.save(update_fields=['referred_by'])
+            except ReferralCycleError as exc:
+                self.stdout.write(self.style.WARNING(f"  skipped: {exc}"))
+                continue
+            linked += 1
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{len(matches)} students can be linked to their referrer."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Linked {linked} of {len(matches)} matched students to their referrer."))
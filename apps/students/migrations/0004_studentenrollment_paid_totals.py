@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:20
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def backfill_paid_totals(apps, schema_editor):
+    StudentEnrollment = apps.get_model('students', 'StudentEnrollment')
+    Payment = apps.get_model('students', 'Payment')
+    totals = Payment.objects.values('enrollment_id').annotate(
+        admission_paid=Sum('amount_paid', filter=Q(remarks__iexact='Admission Fee')),
+        course_paid=Sum('amount_paid', filter=Q(remarks__iexact='Course Fee')),
+    ).order_by()
+    for row in totals.iterator():
+        StudentEnrollment.objects.filter(pk=row['enrollment_id']).update(
+            admission_fee_paid_total=row['admission_paid'] or Decimal('0.00'),
+            course_fee_paid_total=row['course_paid'] or Decimal('0.00'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_alter_studentenrollment_admission_fee_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentenrollment',
+            name='admission_fee_paid_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='studentenrollment',
+            name='course_fee_paid_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_paid_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        ('students', '0004_studentenrollment_paid_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(fields=['is_deleted', 'enrollment_date', 'id'], name='enrollment_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(fields=['is_deleted', 'amount_remaining', 'id'], name='enrollment_dues_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(fields=['payment_status', 'amount_remaining'], name='enrollment_pay_status_idx'),
+        ),
+    ]
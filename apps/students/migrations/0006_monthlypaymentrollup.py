@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:34
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_payment_rollup(apps, schema_editor):
+    Payment = apps.get_model('students', 'Payment')
+    MonthlyPaymentRollup = apps.get_model('students', 'MonthlyPaymentRollup')
+    rows = Payment.objects.filter(enrollment__is_deleted=False).annotate(
+        month=TruncMonth('payment_date'),
+    ).values_list('month', 'enrollment__course_id', 'payment_mode', 'enrollment__payment_method').annotate(
+        total=Sum('amount_paid'), count=Count('pk'),
+    ).order_by()
+    totals = {}
+    for month, course_id, payment_mode, payment_method, total, count in rows:
+        key = (month, course_id, payment_mode, payment_method or '')
+        amount, entries = totals.get(key, (Decimal('0.00'), 0))
+        totals[key] = (amount + total, entries + count)
+    MonthlyPaymentRollup.objects.bulk_create([
+        MonthlyPaymentRollup(month=month, course_id=course_id, payment_mode=payment_mode,
+                             payment_method=payment_method, total_amount=amount, entries=entries)
+        for (month, course_id, payment_mode, payment_method), (amount, entries) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        ('students', '0005_studentenrollment_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyPaymentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('payment_mode', models.CharField(choices=[('cash', 'Cash'), ('card', 'Card'), ('upi', 'UPI'), ('bank_transfer', 'Bank Transfer'), ('online', 'Online')], max_length=20)),
+                ('payment_method', models.CharField(blank=True, default='', max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('entries', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+            ],
+            options={
+                'unique_together': {('month', 'course', 'payment_mode', 'payment_method')},
+            },
+        ),
+        migrations.RunPython(backfill_payment_rollup, migrations.RunPython.noop),
+    ]
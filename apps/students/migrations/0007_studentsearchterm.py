@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.students.search import student_search_terms
+
+
+def backfill_search_terms(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    StudentSearchTerm = apps.get_model('students', 'StudentSearchTerm')
+    rows = Student.objects.values_list('student_id', 'full_name', 'email', 'contact')
+    StudentSearchTerm.objects.bulk_create((
+        StudentSearchTerm(student_id=row[0], term=term)
+        for row in rows.iterator(chunk_size=2000)
+        for term in student_search_terms(*row)
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_monthlypaymentrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='students.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'student'], name='student_search_term_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
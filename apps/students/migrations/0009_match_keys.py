@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:47
+
+from django.db import migrations, models
+
+from apps.students.models import normalise_email, normalise_phone
+
+
+def backfill_match_keys(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    batch = []
+    for obj in Student.objects.only('pk', 'contact', 'email').iterator(chunk_size=2000):
+        obj.phone_key = normalise_phone(obj.contact)
+        obj.email_key = normalise_email(obj.email)
+        batch.append(obj)
+        if len(batch) >= 2000:
+            Student.objects.bulk_update(batch, ['phone_key', 'email_key'])
+            batch = []
+    Student.objects.bulk_update(batch, ['phone_key', 'email_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_autocompletechange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='email_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='phone_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_match_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.students.referrals import referral_paths
+
+
+def backfill_referral_paths(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    ReferralPath = apps.get_model('students', 'ReferralPath')
+    parents = dict(Student.objects.values_list('student_id', 'referred_by_id'))
+    ReferralPath.objects.bulk_create(
+        [ReferralPath(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in referral_paths(parents)],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0009_match_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralPath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='students.student')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='students.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='referral_path_ancestor_idx'), models.Index(fields=['descendant', 'depth'], name='referral_path_descendant_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_referral_paths, migrations.RunPython.noop),
+    ]
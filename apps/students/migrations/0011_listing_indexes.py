@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_listing_indexes'),
+        ('students', '0010_referralpath'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date'], name='payment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['is_deleted', 'deleted_at'], name='student_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='student_trash_pidx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['enrollment_date', 'id'], name='enrollment_list_pidx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['amount_remaining', 'id'], name='enrollment_dues_pidx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(fields=['is_deleted', 'deleted_at'], name='enrollment_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentenrollment',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='enrollment_trash_pidx'),
+        ),
+    ]
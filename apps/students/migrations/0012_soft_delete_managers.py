@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:04
+
+import django.db.models.manager
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0011_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='student',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='studentenrollment',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
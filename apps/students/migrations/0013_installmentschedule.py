@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:11
+
+import datetime
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+from apps.students.models import installment_plan
+
+
+def backfill_installments(apps, schema_editor):
+    StudentEnrollment = apps.get_model('students', 'StudentEnrollment')
+    InstallmentSchedule = apps.get_model('students', 'InstallmentSchedule')
+    rows = []
+    enrollments = StudentEnrollment._default_manager.select_related('course').order_by('pk')
+    for enrollment in enrollments.iterator(chunk_size=500):
+        plan = installment_plan(
+            max(enrollment.course.course_fee - (enrollment.discount or Decimal('0.00')), Decimal('0.00')),
+            enrollment.course_fee_paid_total or Decimal('0.00'),
+            enrollment.payment_method,
+            enrollment.total_installments,
+            enrollment.course.course_duration,
+            enrollment.due_date or enrollment.enrollment_date + datetime.timedelta(days=30),
+        )
+        rows.extend(
+            InstallmentSchedule(
+                enrollment_id=enrollment.pk, number=number, due_date=due_date, amount=amount,
+                amount_paid=amount_paid, status=status,
+            )
+            for number, due_date, amount, amount_paid, status in plan
+        )
+        if len(rows) >= 2000:
+            InstallmentSchedule._default_manager.bulk_create(rows)
+            rows = []
+    InstallmentSchedule._default_manager.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0012_soft_delete_managers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstallmentSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('status', models.CharField(choices=[('paid', 'Paid'), ('partial', 'Partial'), ('due', 'Due')], default='due', max_length=10)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='students.studentenrollment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['due_date', 'status'], name='installment_due_idx')],
+                'unique_together': {('enrollment', 'number')},
+            },
+        ),
+        migrations.RunPython(backfill_installments, migrations.RunPython.noop),
+    ]
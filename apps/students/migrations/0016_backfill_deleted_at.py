@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.utils import timezone
+
+# Models shown in the trash, which pages on (deleted_at, pk)
+TRASHED_MODELS = [
+    ('students', 'Student'),
+    ('students', 'StudentEnrollment'),
+    ('Enquiries', 'Enquiry'),
+    ('courses', 'Course'),
+    ('Expenses', 'Expense'),
+    ('Teams', 'Team'),
+]
+
+
+def backfill_deleted_at(apps, schema_editor):
+    # Rows trashed before deleted_at was always set: NULL never compares in the trash's
+    # keyset seek, so they dropped off every page after the first. They are dated now,
+    # which also starts their retention period for purge_trash.
+    now = timezone.now()
+    for app_label, model_name in TRASHED_MODELS:
+        model = apps.get_model(app_label, model_name)
+        model._default_manager.filter(is_deleted=True, deleted_at__isnull=True).update(deleted_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0015_duesreminder_claimed_at'),
+        ('Enquiries', '0005_soft_delete_managers'),
+        ('courses', '0003_soft_delete_managers'),
+        ('Expenses', '0004_soft_delete_managers'),
+        ('Teams', '0004_soft_delete_managers'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+    ]
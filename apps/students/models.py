@@ -1,9 +1,14 @@
+import datetime
 import re
-from decimal import Decimal
-from django.db import models
+from decimal import ROUND_DOWN, Decimal
+from django.db import models, transaction
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
+from dateutil import relativedelta
 
 from apps.courses import models as course_models
 from apps.Settings import models as setting_models
@@ -75,25 +80,126 @@ PAYMENT_MODE_CHOICES = [
     ('online', 'Online'),
 ]
 
-class SoftDeleteMixin(models.Model):
-    is_deleted = models.BooleanField(default=False)
-    deleted_at = models.DateTimeField(null=True, blank=True)
-
-    def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save(update_fields=['is_deleted', 'deleted_at'])
-
-    def restore(self, *args, **kwargs):
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save(update_fields=['is_deleted', 'deleted_at'])
-
-    class Meta:
-        abstract = True
-
-
-class Student(SoftDeleteMixin):
+ADMISSION_FEE_REMARK = 'Admission Fee'
+COURSE_FEE_REMARK = 'Course Fee'
+
+
+def paid_totals_aggregates(prefix=''):
+    """
+    Conditional Sum expressions for the paid-to-date total of each fee component.
+    `prefix` is the lookup path from the queried model to Payment ('' or 'payments__').
+    """
+    return {
+        'admission_paid': Sum(f'{prefix}amount_paid', filter=Q(**{f'{prefix}remarks__iexact': ADMISSION_FEE_REMARK})),
+        'course_paid': Sum(f'{prefix}amount_paid', filter=Q(**{f'{prefix}remarks__iexact': COURSE_FEE_REMARK})),
+    }
+
+
+def normalise_phone(value):
+    """Last ten digits of a phone number, or '' when it has fewer digits."""
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:] if len(digits) >= 10 else ''
+
+
+def normalise_email(value):
+    return (value or '').strip().lower()
+
+
+def month_start(value):
+    """First day of the month of a date (or datetime), the key of the monthly rollups."""
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def installment_plan(net_fee, paid, payment_method, total_installments, duration, first_due):
+    """
+    [(number, due_date, amount, amount_paid, status)] of a course fee: total_installments
+    installments for the 'installment' method, one per month of the course for 'monthly'
+    and a single one otherwise, a month apart from `first_due`. The fee is split evenly,
+    the rounding remainder going on the last installment, and the course fee paid so far
+    settles them in order. Shared with the 0013 migration's backfill.
+    """
+    if payment_method == 'installment' and total_installments:
+        count = total_installments
+    elif payment_method == 'monthly' and duration:
+        count = duration
+    else:
+        count = 1
+    share = (net_fee / count).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    plan = []
+    for number in range(1, count + 1):
+        amount = share if number < count else net_fee - share * (count - 1)
+        settled = min(paid, amount)
+        paid -= settled
+        status = 'paid' if settled >= amount else 'partial' if settled > 0 else 'due'
+        plan.append((number, first_due + relativedelta.relativedelta(months=number - 1), amount, settled, status))
+    return plan
+
+
+MONEY_FIELD = models.DecimalField(max_digits=10, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY_FIELD)
+
+
+class StudentEnrollmentQuerySet(setting_models.SoftDeleteQuerySet):
+    def with_financials(self):
+        """
+        Annotate each enrollment with its paid, remaining and due figures in a single
+        SQL statement (correlated subqueries over Payment with conditional sums):
+
+        admission_paid_amount, course_paid_amount, total_paid_amount,
+        course_fee_net, admission_remaining_amount, course_remaining_amount,
+        total_remaining_amount and payments_count.
+        """
+        payments = Payment.objects.filter(enrollment=OuterRef('pk')).order_by().values('enrollment')
+
+        def paid(remark):
+            total = payments.annotate(
+                total=Sum('amount_paid', filter=Q(remarks__iexact=remark))
+            ).values('total')
+            return Coalesce(Subquery(total, output_field=MONEY_FIELD), ZERO, output_field=MONEY_FIELD)
+
+        return self.select_related('student', 'course').annotate(
+            admission_paid_amount=paid(ADMISSION_FEE_REMARK),
+            course_paid_amount=paid(COURSE_FEE_REMARK),
+            payments_count=Coalesce(Subquery(payments.annotate(n=Count('pk')).values('n')), 0),
+            course_fee_net=Greatest(F('course__course_fee') - F('discount'), ZERO, output_field=MONEY_FIELD),
+        ).annotate(
+            total_paid_amount=F('admission_paid_amount') + F('course_paid_amount'),
+            admission_remaining_amount=Greatest(
+                Coalesce(F('admission_fee'), ZERO) - F('admission_paid_amount'), ZERO, output_field=MONEY_FIELD
+            ),
+            course_remaining_amount=Greatest(F('course_fee_net') - F('course_paid_amount'), ZERO, output_field=MONEY_FIELD),
+        ).annotate(
+            total_remaining_amount=F('admission_remaining_amount') + F('course_remaining_amount'),
+        )
+
+
+FIRST_STUDENT_ID = 25010001
+
+
+def reserve_student_ids(count=1):
+    first = setting_models.Sequence.reserve('student_id', count, seed=lambda: max(
+        setting_models.max_numeric_suffix(Student.all_objects.all(), 'student_id'), FIRST_STUDENT_ID - 1
+    ))
+    return [str(n) for n in range(first, first + count)]
+
+
+def reserve_t_ids(count=1):
+    first = setting_models.Sequence.reserve('enrollment_t_id', count, seed=lambda: (
+        setting_models.max_numeric_suffix(StudentEnrollment.all_objects.all(), 't_id', 'E')
+    ))
+    return [f"E{n:04d}" for n in range(first, first + count)]
+
+
+def reserve_certificate_numbers(count=1):
+    first = setting_models.Sequence.reserve('certificate_number', count, seed=lambda: (
+        setting_models.max_numeric_suffix(StudentEnrollment.all_objects.all(), 'certificate_number', 'CP-CN-')
+    ))
+    return [f"CP-CN-{n:03d}" for n in range(first, first + count)]
+
+
+class Student(setting_models.SoftDeleteMixin):
     student_id = models.CharField(max_length=20, primary_key=True, editable=False)
     full_name = models.CharField(max_length=200)
     father_name = models.CharField(max_length=200)
@@ -112,20 +218,39 @@ class Student(SoftDeleteMixin):
     photo = models.ImageField(upload_to='students/photos/', blank=True, null=True)
     documents = models.FileField(upload_to='students/documents/', blank=True, null=True)
 
+    # normalise_phone(contact) / normalise_email(email), for matching enquiries and bank statements
+    phone_key = models.CharField(max_length=10, blank=True, default='', db_index=True, editable=False)
+    email_key = models.CharField(max_length=254, blank=True, default='', db_index=True, editable=False)
+
+    # Trashing a student trashes its enrollments (which takes their payments out of the reports)
+    SOFT_DELETE_CASCADE = ('enrollments',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The referrer as loaded, so apps.students.referrals can tell when it changes
+        self._loaded_referred_by_id = self.__dict__.get('referred_by_id')
+
+    def set_match_keys(self):
+        self.phone_key = normalise_phone(self.contact)
+        self.email_key = normalise_email(self.email)
+
     def save(self, *args, **kwargs):
         if not self.student_id:
-            last_student = Student.objects.filter(student_id__regex=r'^\d+$').order_by('-student_id').first()
-            new_id = 25010001
-            if last_student and last_student.student_id.isdigit():
-                new_id = int(last_student.student_id) + 1
-            self.student_id = str(new_id)
+            self.student_id = reserve_student_ids()[0]
+        self.set_match_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'contact', 'email'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'phone_key', 'email_key'}
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = setting_models.soft_delete_indexes('student')
+
     def __str__(self):
         return f"{self.full_name} ({self.student_id})"
 
 
-class StudentEnrollment(SoftDeleteMixin):
+class StudentEnrollment(setting_models.SoftDeleteMixin):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(course_models.Course, on_delete=models.CASCADE)
     enrollment_date = models.DateField(default=timezone.now)
@@ -139,6 +264,10 @@ class StudentEnrollment(SoftDeleteMixin):
     amount_due = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     amount_remaining = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
 
+    # Paid-to-date totals per fee component, kept in sync by Payment.save()/delete()
+    admission_fee_paid_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+    course_fee_paid_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, blank=True, null=True)
     payment_mode = models.CharField(max_length=20, choices=PAYMENT_MODE_CHOICES, blank=True, null=True)
 
@@ -153,8 +282,38 @@ class StudentEnrollment(SoftDeleteMixin):
     t_id = models.CharField(max_length=20, unique=True, blank=True, null=True, editable=False)
     certificate_number = models.CharField(max_length=20, unique=True, blank=True, null=True, editable=False)
 
+    all_objects = StudentEnrollmentQuerySet.as_manager()
+    objects = setting_models.SoftDeleteManager.from_queryset(StudentEnrollmentQuerySet)()
+
+    # Fields written by calculate_amounts(), for callers that persist them with bulk_update()
+    CALCULATED_FIELDS = [
+        'admission_fee', 'discount', 'final_amount', 'amount_remaining', 'amount_due', 'payment_status',
+        'admission_fee_paid_total', 'course_fee_paid_total',
+    ]
+
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            *setting_models.soft_delete_indexes(
+                'enrollment',
+                # Keyset pagination of the enrollment list on (enrollment_date, id)
+                list=['enrollment_date', 'id'],
+                # Pending-dues panel: outstanding balances, largest first
+                dues=['amount_remaining', 'id'],
+            ),
+            models.Index(fields=['payment_status', 'amount_remaining'], name='enrollment_pay_status_idx'),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # What decides where this enrollment's payments are counted in MonthlyPaymentRollup
+        self._loaded_rollup_key = self._rollup_key() if self.pk else None
+
+    def _rollup_key(self):
+        values = self.__dict__
+        if 'course_id' not in values or 'is_deleted' not in values:
+            return None  # deferred; MonthlyPaymentRollup can be repaired with rebuild_finance_rollups
+        return values['course_id'], values.get('payment_method') or '', values['is_deleted']
 
     def save(self, *args, **kwargs):
         if not self.enrollment_date:
@@ -162,10 +321,50 @@ class StudentEnrollment(SoftDeleteMixin):
         if not self.due_date:
             self.due_date = self.enrollment_date + timezone.timedelta(days=30)
 
+        self.calculate_amounts()
+
+        # Generate unique t_id and certificate_number if missing
+        if not self.t_id:
+            self.t_id = reserve_t_ids()[0]
+        if not self.certificate_number:
+            self.certificate_number = reserve_certificate_numbers()[0]
+
+        previous_key, current_key = self._loaded_rollup_key, self._rollup_key()
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous_key and current_key and previous_key != current_key:
+                self._move_payment_rollups(previous_key, current_key)
+            if update_fields is None or INSTALLMENT_FIELDS.intersection(update_fields):
+                sync_installments([self])
+        self._loaded_rollup_key = current_key
+
+    def _move_payment_rollups(self, previous_key, current_key):
+        """
+        Re-file this enrollment's payments in MonthlyPaymentRollup after its course or
+        payment method changed, or it was soft-deleted/restored (deleted enrollments are
+        not counted).
+        """
+        rows = self.payments.annotate(month=TruncMonth('payment_date')).values('month', 'payment_mode').annotate(
+            total=Sum('amount_paid'), count=Count('pk'),
+        ).order_by()
+        deltas = setting_models.rollup_deltas()
+        for row in rows:
+            for (course_id, payment_method, is_deleted), sign in ((previous_key, -1), (current_key, 1)):
+                if not is_deleted:
+                    delta = deltas[(row['month'], course_id, row['payment_mode'], payment_method)]
+                    delta[0] += sign * row['total']
+                    delta[1] += sign * row['count']
+        MonthlyPaymentRollup.objects.add(deltas)
+
+    def calculate_amounts(self):
+        """
+        Derive final_amount, amount_remaining, amount_due and payment_status from the
+        fees and the stored paid-to-date totals. Does not save.
+        """
         # Use admission fee if set, else use default from settings
         if self.admission_fee is None:
-            setting = setting_models.Setting.objects.first()
-            self.admission_fee = setting.admission_fee if setting else Decimal('0.00')
+            self.admission_fee = setting_models.get_settings().admission_fee
 
         course_fee = getattr(self.course, 'course_fee', Decimal('0.00')) or Decimal('0.00')
         self.discount = self.discount or Decimal('0.00')
@@ -174,9 +373,9 @@ class StudentEnrollment(SoftDeleteMixin):
         # Calculate final amount accurately
         self.final_amount = self.admission_fee + discounted_course_fee
 
-        # Recalculate payment totals from payments, or zero without pk
-        paid_admission_fee = self.admission_fee_paid if self.pk else Decimal('0.00')
-        paid_course_fee = self.course_fee_paid if self.pk else Decimal('0.00')
+        # Stored paid-to-date totals (zero until the first payment is recorded)
+        paid_admission_fee = self.admission_fee_paid_total or Decimal('0.00')
+        paid_course_fee = self.course_fee_paid_total or Decimal('0.00')
 
         remaining_admission_fee = max(self.admission_fee - paid_admission_fee, Decimal('0.00'))
         remaining_course_fee = max(discounted_course_fee - paid_course_fee, Decimal('0.00'))
@@ -201,35 +400,34 @@ class StudentEnrollment(SoftDeleteMixin):
         else:
             self.payment_status = 'due'
 
-        # Generate unique t_id if missing
-        if not self.t_id:
-            last_enrollment = StudentEnrollment.objects.filter(t_id__isnull=False).exclude(t_id='').order_by('-id').first()
-            next_id = 1
-            if last_enrollment and last_enrollment.t_id and last_enrollment.t_id[1:].isdigit():
-                next_id = int(last_enrollment.t_id[1:]) + 1
-            self.t_id = f"E{next_id:04d}"
-
-        # Generate certificate_number if missing
-        if not self.certificate_number:
-            last_cert = StudentEnrollment.objects.exclude(certificate_number__isnull=True).exclude(certificate_number='').order_by('-id').first()
-            next_cert_num = 1
-            if last_cert:
-                match = re.search(r"CP-CN-(\d+)", last_cert.certificate_number)
-                if match:
-                    next_cert_num = int(match.group(1)) + 1
-            self.certificate_number = f"CP-CN-{next_cert_num:03d}"
-
-        super().save(*args, **kwargs)
+    def installment_plan(self):
+        """installment_plan() of this enrollment's course fee, net of discount."""
+        course_fee = getattr(self.course, 'course_fee', Decimal('0.00')) or Decimal('0.00')
+        return installment_plan(
+            max(course_fee - (self.discount or Decimal('0.00')), Decimal('0.00')),
+            self.course_fee_paid_total or Decimal('0.00'),
+            self.payment_method,
+            self.total_installments,
+            getattr(self.course, 'course_duration', None),
+            self.due_date or self.enrollment_date + datetime.timedelta(days=30),
+        )
+
+    def refresh_paid_totals(self):
+        """
+        Recompute the stored paid-to-date totals from this enrollment's payments
+        in a single aggregate query. Does not save.
+        """
+        totals = self.payments.aggregate(**paid_totals_aggregates())
+        self.admission_fee_paid_total = Decimal(totals['admission_paid'] or 0)
+        self.course_fee_paid_total = Decimal(totals['course_paid'] or 0)
 
     @property
     def admission_fee_paid(self):
-        total = self.payments.filter(remarks__iexact='Admission Fee').aggregate(total=Sum('amount_paid'))['total']
-        return Decimal(total or 0)
+        return self.admission_fee_paid_total or Decimal('0.00')
 
     @property
     def course_fee_paid(self):
-        total = self.payments.filter(remarks__iexact='Course Fee').aggregate(total=Sum('amount_paid'))['total']
-        return Decimal(total or 0)
+        return self.course_fee_paid_total or Decimal('0.00')
 
     @property
     def admission_fee_remaining(self):
@@ -256,48 +454,127 @@ class StudentEnrollment(SoftDeleteMixin):
         if not self.pk:
             raise ValidationError("Save enrollment before processing payments.")
 
-        payments_created = []
+        # Inserts both payments and recomputes this enrollment once
+        return Payment.objects.post_batch(self.build_initial_payments(initial_payment, payment_mode))
+
+    def build_initial_payments(self, initial_payment: Decimal, payment_mode='cash'):
+        """
+        Split an initial payment into unsaved admission-fee and course-fee Payment
+        objects, settling the admission fee first.
+        """
+        payments = []
         remaining_payment = initial_payment
 
         admission_due = self.admission_fee_remaining
         if admission_due > Decimal('0.00'):
             pay_amount = min(remaining_payment, admission_due)
-            p = Payment.objects.create(
+            payments.append(Payment(
                 enrollment=self,
                 amount=admission_due,
                 amount_paid=pay_amount,
                 payment_mode=payment_mode,
                 payment_status='paid' if pay_amount >= admission_due else 'partial',
-                remarks='Admission Fee',
+                remarks=ADMISSION_FEE_REMARK,
                 payment_date=timezone.now().date(),
-            )
-            payments_created.append(p)
+            ))
             remaining_payment -= pay_amount
 
         course_due = self.course_fee_remaining
         if remaining_payment > Decimal('0.00') and course_due > Decimal('0.00'):
             pay_amount = min(remaining_payment, course_due)
-            p = Payment.objects.create(
+            payments.append(Payment(
                 enrollment=self,
                 amount=course_due,
                 amount_paid=pay_amount,
                 payment_mode=payment_mode,
                 payment_status='paid' if pay_amount >= course_due else 'partial',
-                remarks='Course Fee',
+                remarks=COURSE_FEE_REMARK,
                 payment_date=timezone.now().date(),
-            )
-            payments_created.append(p)
+            ))
             remaining_payment -= pay_amount
 
-        self.refresh_from_db()
-        self.save(update_fields=['payment_status', 'amount_due', 'amount_remaining'])
-
-        return payments_created
+        return payments
 
     def __str__(self):
         return f"{self.student.full_name} ({self.student.student_id}) - {self.course.course_name}"
 
 
+class PaymentQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Delete the payments and resync the enrollments that had them, in one transaction,
+        so the stored totals are never seen out of step (covers the admin's bulk delete).
+        """
+        with transaction.atomic():
+            enrollment_ids = set(self.order_by().values_list('enrollment_id', flat=True).distinct())
+            result = super().delete()
+            Payment.objects.resync_enrollments(enrollment_ids)
+        return result
+
+
+class PaymentManager(models.Manager.from_queryset(PaymentQuerySet)):
+    def post_batch(self, payments):
+        """
+        Insert many payments (possibly across many enrollments) with bulk_create in one
+        transaction, then recompute each affected enrollment's stored totals and amounts
+        once: one locking read of the enrollments, one grouped aggregate and one bulk UPDATE.
+
+        Enrollment instances cached on the payments are updated in place.
+        """
+        payments = list(payments)
+        if not payments:
+            return []
+        for payment in payments:
+            if payment.remarks:
+                payment.remarks = payment.remarks.strip()
+
+        with transaction.atomic():
+            created = self.bulk_create(payments)
+            enrollments = self.resync_enrollments({payment.enrollment_id for payment in payments})
+
+            deltas = setting_models.rollup_deltas()
+            for payment in payments:
+                payment.add_to_rollup(deltas, enrollments[payment.enrollment_id])
+            MonthlyPaymentRollup.objects.add(deltas)
+
+        for payment in payments:
+            if Payment.enrollment.is_cached(payment):
+                fresh = enrollments[payment.enrollment_id]
+                for field in StudentEnrollment.CALCULATED_FIELDS:
+                    setattr(payment.enrollment, field, getattr(fresh, field))
+        return created
+
+    def resync_enrollments(self, enrollment_ids):
+        """
+        Recompute the stored totals, amounts and installment schedules of these enrollments
+        from their payments: one locking read, one grouped aggregate and one bulk UPDATE.
+        Returns {pk: enrollment}.
+        """
+        with transaction.atomic():
+            enrollments = StudentEnrollment.all_objects.select_for_update(of=('self',)).select_related('course').in_bulk(enrollment_ids)
+            totals = {
+                row['enrollment_id']: row
+                for row in self.filter(enrollment_id__in=list(enrollments)).values('enrollment_id').annotate(
+                    **paid_totals_aggregates()
+                ).order_by()
+            }
+            for enrollment in enrollments.values():
+                row = totals.get(enrollment.pk, {})
+                enrollment.admission_fee_paid_total = Decimal(row.get('admission_paid') or 0)
+                enrollment.course_fee_paid_total = Decimal(row.get('course_paid') or 0)
+                enrollment.calculate_amounts()
+            StudentEnrollment.all_objects.bulk_update(enrollments.values(), StudentEnrollment.CALCULATED_FIELDS)
+            sync_installments(enrollments.values())
+
+            # bulk_update sends no signals, so drop the dashboard cache and refresh the
+            # enquiry funnel (payment status) here
+            from .analytics import invalidate_analytics
+            from apps.Enquiries.funnel import refresh_enrollments
+            transaction.on_commit(invalidate_analytics)
+            refresh_enrollments(list(enrollments))
+        return enrollments
+
+
 class Payment(models.Model):
     enrollment = models.ForeignKey(StudentEnrollment, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -309,12 +586,307 @@ class Payment(models.Model):
     remarks = models.CharField(max_length=255, blank=True, null=True)  # 'Admission Fee' or 'Course Fee'
     payment_date = models.DateField(default=timezone.now)
 
+    objects = PaymentManager()
+
+    class Meta:
+        indexes = [
+            # Month-scoped payment summaries and exports
+            models.Index(fields=['payment_date'], name='payment_date_idx'),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Remember the enrollment this payment was loaded with, so moving it keeps both totals in sync
+        self._loaded_enrollment_id = self.enrollment_id
+
     def save(self, *args, **kwargs):
         if self.remarks:
             self.remarks = self.remarks.strip()
-        super().save(*args, **kwargs)
-        # After saving payment, update enrollment's payment status and amounts
+        with transaction.atomic():
+            # Where the stored row is counted in the monthly rollup, before this save changes it
+            previous = None
+            if not self._state.adding:
+                previous = Payment.objects.filter(pk=self.pk).select_related('enrollment').first()
+            super().save(*args, **kwargs)
+            # After saving payment, update enrollment's stored totals, payment status and amounts
+            self._sync_enrollments()
+
+            deltas = setting_models.rollup_deltas()
+            if previous:
+                previous.add_to_rollup(deltas, previous.enrollment, sign=-1)
+            self.add_to_rollup(deltas, self.enrollment)
+            MonthlyPaymentRollup.objects.add(deltas)
+        self._loaded_enrollment_id = self.enrollment_id
+
+    def delete(self, *args, **kwargs):
+        # MonthlyPaymentRollup is updated by the post_delete receiver (which also covers
+        # queryset deletes and cascades); PaymentQuerySet.delete() resyncs for querysets
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self._sync_enrollments()
+        return result
+
+    def add_to_rollup(self, deltas, enrollment, sign=1):
+        """Add (or with sign=-1 remove) this payment's contribution to MonthlyPaymentRollup deltas."""
+        if enrollment.is_deleted:
+            return
+        delta = deltas[(month_start(self.payment_date), enrollment.course_id, self.payment_mode, enrollment.payment_method or '')]
+        delta[0] += sign * Decimal(self.amount_paid)
+        delta[1] += sign
+
+    def _sync_enrollments(self):
+        previous_id = self._loaded_enrollment_id
+        if previous_id and previous_id != self.enrollment_id:
+            previous = StudentEnrollment.all_objects.filter(pk=previous_id).first()
+            if previous:
+                previous.refresh_paid_totals()
+                previous.save()
+        self.enrollment.refresh_paid_totals()
         self.enrollment.save()
 
     def __str__(self):
         return f"{self.payment_date} - {self.enrollment.student.full_name} - ₹{self.amount_paid} ({self.remarks or 'Unknown'})"
+
+
+@receiver(post_delete, sender=Payment, dispatch_uid='payment_rollup_post_delete')
+def _payment_deleted(sender, instance, **kwargs):
+    enrollment = StudentEnrollment.all_objects.filter(pk=instance.enrollment_id).first()
+    if enrollment:
+        deltas = setting_models.rollup_deltas()
+        instance.add_to_rollup(deltas, enrollment, sign=-1)
+        MonthlyPaymentRollup.objects.add(deltas)
+
+
+@receiver(setting_models.soft_delete_changed, sender=StudentEnrollment, dispatch_uid='payment_rollup_soft_delete')
+def _enrollments_trashed(sender, pks, deleted, **kwargs):
+    # Set-based trash/restore: take the enrollments' payments out of the rollup, or put them back
+    rows = Payment.objects.filter(enrollment__in=pks).annotate(month=TruncMonth('payment_date')).values_list(
+        'month', 'enrollment__course_id', 'payment_mode', 'enrollment__payment_method',
+    ).annotate(total=Sum('amount_paid'), count=Count('pk')).order_by()
+    sign = -1 if deleted else 1
+    deltas = setting_models.rollup_deltas()
+    for month, course_id, payment_mode, payment_method, total, count in rows:
+        delta = deltas[(month, course_id, payment_mode, payment_method or '')]
+        delta[0] += sign * total
+        delta[1] += sign * count
+    MonthlyPaymentRollup.objects.add(deltas)
+
+
+# Enrollment fields an installment schedule is derived from
+INSTALLMENT_FIELDS = frozenset({
+    'course', 'discount', 'payment_method', 'total_installments', 'due_date', 'enrollment_date',
+    'course_fee_paid_total',
+})
+
+
+class InstallmentScheduleQuerySet(models.QuerySet):
+    def outstanding(self):
+        """Installments not yet fully paid, of enrollments that are not in the trash."""
+        return self.filter(enrollment__is_deleted=False).exclude(status='paid')
+
+    def due_between(self, start, end):
+        """Outstanding installments falling due from `start` to `end` (inclusive), earliest first."""
+        return self.outstanding().filter(due_date__gte=start, due_date__lte=end).order_by('due_date')
+
+
+class InstallmentSchedule(models.Model):
+    """
+    One row per expected course-fee installment of an enrollment, from its payment method,
+    number of installments and the course duration (see installment_plan()). Written when
+    the enrollment is created and rebalanced in place whenever its payments, discount or
+    plan change, so upcoming and overdue dues are an indexed due_date range instead of a
+    recalculation per enrollment. `manage.py rebuild_installments` regenerates the table.
+    """
+    enrollment = models.ForeignKey(StudentEnrollment, on_delete=models.CASCADE, related_name='installments')
+    number = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    status = models.CharField(max_length=10, choices=[('paid', 'Paid'), ('partial', 'Partial'), ('due', 'Due')], default='due')
+
+    objects = InstallmentScheduleQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('enrollment', 'number')
+        indexes = [
+            # Dues falling in a date range; the status check is answered from the index
+            models.Index(fields=['due_date', 'status'], name='installment_due_idx'),
+        ]
+
+    @property
+    def amount_remaining(self):
+        return max(self.amount - self.amount_paid, Decimal('0.00'))
+
+    def __str__(self):
+        return f"{self.enrollment_id} #{self.number}: ₹{self.amount} due {self.due_date}"
+
+
+def installment_changes(enrollments):
+    """
+    What it takes to bring the schedules of saved enrollments in line with their current
+    plan: (rows to insert, rows to update, rows to delete), from one read of the stored rows.
+    """
+    enrollments = {enrollment.pk: enrollment for enrollment in enrollments if enrollment.pk}
+    stored = {
+        (row.enrollment_id, row.number): row
+        for row in InstallmentSchedule.objects.filter(enrollment__in=list(enrollments))
+    }
+    create, update = [], []
+    for enrollment in enrollments.values():
+        for number, due_date, amount, amount_paid, status in enrollment.installment_plan():
+            row = stored.pop((enrollment.pk, number), None)
+            if row is None:
+                create.append(InstallmentSchedule(
+                    enrollment=enrollment, number=number, due_date=due_date, amount=amount,
+                    amount_paid=amount_paid, status=status,
+                ))
+            elif (row.due_date, row.amount, row.amount_paid, row.status) != (due_date, amount, amount_paid, status):
+                row.due_date, row.amount, row.amount_paid, row.status = due_date, amount, amount_paid, status
+                update.append(row)
+    return create, update, list(stored.values())
+
+
+def sync_installments(enrollments):
+    """Rebalance the schedules of these enrollments in place (a bulk insert, update and delete at most)."""
+    create, update, delete = installment_changes(enrollments)
+    with transaction.atomic():
+        InstallmentSchedule.objects.bulk_create(create)
+        InstallmentSchedule.objects.bulk_update(update, ['due_date', 'amount', 'amount_paid', 'status'])
+        if delete:
+            InstallmentSchedule.objects.filter(pk__in=[row.pk for row in delete]).delete()
+    return len(create) + len(update) + len(delete)
+
+
+class DuesReminder(models.Model):
+    """
+    Queue of fee reminders, one row per student and channel: written by
+    apps.students.reminders.queue_reminders() from the outstanding installments and
+    drained in batches by send_reminders(), which marks a batch 'sending' while it is
+    handed to the backend. Sent rows stay behind as the record of when each student was
+    last reminded.
+    """
+    CHANNEL_CHOICES = [('email', 'Email'), ('sms', 'SMS')]
+    STATUS_CHOICES = [('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='dues_reminders')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The sender's next batch: pending rows in queue order
+            models.Index(fields=['status', 'id'], name='dues_reminder_queue_idx'),
+            # Who has been reminded recently, per channel
+            models.Index(fields=['channel', 'created_at'], name='dues_reminder_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.recipient} ({self.status})"
+
+
+class MonthlyPaymentRollup(models.Model):
+    """
+    Collected payments pre-aggregated per month, course, payment mode and the enrollment's
+    payment method, for the payment and yearly summaries. Kept up to date by Payment and
+    StudentEnrollment writes; payments of soft-deleted enrollments are not counted.
+    `manage.py rebuild_finance_rollups` recomputes it from scratch.
+    """
+    month = models.DateField()
+    course = models.ForeignKey(course_models.Course, on_delete=models.CASCADE, related_name='+')
+    payment_mode = models.CharField(max_length=20, choices=PAYMENT_MODE_CHOICES)
+    payment_method = models.CharField(max_length=20, blank=True, default='')
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    entries = models.IntegerField(default=0)
+
+    ROLLUP_KEY = ('month', 'course_id', 'payment_mode', 'payment_method')
+
+    objects = setting_models.RollupManager()
+
+    class Meta:
+        unique_together = ('month', 'course', 'payment_mode', 'payment_method')
+
+    @classmethod
+    def compute(cls):
+        """Totals recomputed from the Payment table, in the shape of RollupManager.as_totals()."""
+        rows = Payment.objects.filter(enrollment__is_deleted=False).annotate(
+            month=TruncMonth('payment_date'),
+        ).values_list('month', 'enrollment__course_id', 'payment_mode', 'enrollment__payment_method').annotate(
+            total=Sum('amount_paid'), count=Count('pk'),
+        ).order_by()
+        totals = {}
+        for month, course_id, payment_mode, payment_method, total, count in rows:
+            key = (month, course_id, payment_mode, payment_method or '')
+            amount, entries = totals.get(key, (Decimal('0.00'), 0))
+            totals[key] = (amount + total, entries + count)
+        return totals
+
+    def __str__(self):
+        return f"{self.month:%b %Y} {self.course_id} {self.payment_mode}: ₹{self.total_amount}"
+
+
+class StudentSearchTerm(models.Model):
+    """
+    Normalised search terms of a student for api_student_search, one row per term, each
+    prefixed with its kind: name/email words ('w:'), whole email ('e:'), phone digits
+    ('p:'), student ID ('i:') and name trigrams for typo tolerance ('g:'). Rewritten on
+    every Student save by apps.students.search; `manage.py rebuild_student_search`
+    rebuilds it from scratch.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            # Exact and prefix (LIKE 'abc%') lookups, grouped by student
+            models.Index(fields=['term', 'student'], name='student_search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.term}"
+
+
+class AutocompleteChange(models.Model):
+    """
+    Change log behind the per-process autocomplete indexes (apps.students.autocomplete):
+    one row per saved or deleted Student/Course, so each worker can bring its index up
+    to date by re-reading only the objects changed since its last look. Rows older than
+    a day are pruned.
+    """
+    kind = models.CharField(max_length=10)
+    object_id = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_id}"
+
+
+class ReferralPath(models.Model):
+    """
+    Closure table of the Student.referred_by tree: one row per (ancestor, descendant)
+    pair with the number of referral hops between them, plus a depth-0 row per student.
+    Lets referral counts and revenue for any set of students be read with one grouped
+    query instead of walking the tree. Maintained by apps.students.referrals;
+    `manage.py rebuild_referrals` rebuilds it from scratch.
+    """
+    ancestor = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    descendant = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['ancestor', 'depth'], name='referral_path_ancestor_idx'),
+            models.Index(fields=['descendant', 'depth'], name='referral_path_descendant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
@@ -0,0 +1,252 @@
+"""
+Streaming import of payments from CSV files and bank-statement exports.
+
+Rows are read one at a time, validated in chunks against the same rules as the
+add_payment view, matched to enrollments by t_id, student_id or contact number
+with one set-based query per key type per chunk, and posted with
+Payment.objects.post_batch(). Rows that cannot be matched or fail validation are
+collected in the report for reconciliation.
+"""
+import csv
+import datetime
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .models import (
+    Payment, StudentEnrollment, PAYMENT_MODE_CHOICES, ADMISSION_FEE_REMARK, COURSE_FEE_REMARK, normalise_phone,
+)
+
+IMPORT_CHUNK_SIZE = 500
+
+# Accepted header spellings, normalised to lower case without punctuation
+COLUMN_ALIASES = {
+    'amount': ['amount', 'amount_paid', 'credit', 'credit_amount', 'deposit', 'deposit_amount', 'cr'],
+    'date': ['date', 'payment_date', 'txn_date', 'transaction_date', 'value_date'],
+    't_id': ['t_id', 'tid', 'enrollment_id', 'enrollment'],
+    'student_id': ['student_id', 'registration_number', 'reg_no'],
+    'contact': ['contact', 'phone', 'mobile', 'contact_number'],
+    'payment_type': ['payment_type', 'type', 'fee_type'],
+    'payment_mode': ['payment_mode', 'mode'],
+    'narration': ['narration', 'description', 'particulars', 'remarks', 'reference'],
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d/%m/%y', '%d-%b-%Y', '%d %b %Y']
+
+T_ID_PATTERN = re.compile(r'\bE\d{4,}\b')
+STUDENT_ID_PATTERN = re.compile(r'(?<!\d)\d{8}(?!\d)')
+PHONE_PATTERN = re.compile(r'(?<!\d)(?:\+?91[\s-]?)?([6-9]\d{9})(?!\d)')
+
+
+def _normalise_header(name):
+    return re.sub(r'[^a-z0-9]+', '_', (name or '').strip().lower()).strip('_')
+
+
+def _column_map(fieldnames):
+    headers = {_normalise_header(name): name for name in fieldnames or []}
+    columns = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[column] = headers[alias]
+                break
+    return columns
+
+
+def _parse_amount(value):
+    try:
+        return Decimal(str(value).replace(',', '').replace('₹', '').strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ImportRow:
+    def __init__(self, number, raw, columns, default_mode):
+        self.number = number
+        self.raw = raw
+
+        def get(column):
+            return (raw.get(columns[column]) or '').strip() if column in columns else ''
+
+        narration = get('narration')
+
+        self.amount = _parse_amount(get('amount'))
+        self.payment_date = _parse_date(get('date'))
+        self.payment_type = get('payment_type').title()
+        mode = get('payment_mode').lower().replace(' ', '_')
+        self.payment_mode = mode if mode in dict(PAYMENT_MODE_CHOICES) else default_mode
+
+        # Explicit columns win; otherwise look for identifiers inside the bank narration
+        self.t_id = get('t_id').upper() or next(iter(T_ID_PATTERN.findall(narration.upper())), '')
+        self.student_id = get('student_id') or next(iter(STUDENT_ID_PATTERN.findall(narration)), '')
+        phone = PHONE_PATTERN.search(narration)
+        self.contact = normalise_phone(get('contact')) or (phone.group(1) if phone else '')
+
+
+class PaymentImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.payments_posted = 0
+        self.amount_posted = Decimal('0.00')
+        self.rejected = []  # (row number, raw row, reason)
+
+    def reject(self, row, reason):
+        self.rejected.append((row.number, row.raw, reason))
+
+    def write_csv(self, stream):
+        """Write the unmatched/rejected rows, with the reason, as CSV for reconciliation."""
+        writer = None
+        for number, raw, reason in self.rejected:
+            if writer is None:
+                writer = csv.DictWriter(stream, fieldnames=['row', 'reason'] + list(raw.keys()), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({'row': number, 'reason': reason, **raw})
+
+
+def _match_enrollments(rows):
+    """
+    Resolve each row's enrollment with one query per identifier type for the whole chunk.
+    A student_id or contact only matches when it points at exactly one active enrollment
+    with an outstanding balance.
+    """
+    t_ids = {row.t_id for row in rows if row.t_id}
+    student_ids = {row.student_id for row in rows if row.student_id and not row.t_id}
+    contacts = {row.contact for row in rows if row.contact and not row.t_id and not row.student_id}
+
+    base = StudentEnrollment.objects.filter(is_deleted=False).select_related('course', 'student')
+    by_t_id = {e.t_id: e for e in base.filter(t_id__in=t_ids)} if t_ids else {}
+
+    by_student, by_contact = {}, {}
+    if student_ids or contacts:
+        open_dues = base.filter(amount_remaining__gt=0).exclude(status='deactive')
+        lookup = Q(student_id__in=student_ids) | Q(student__phone_key__in=contacts)
+        for enrollment in open_dues.filter(lookup):
+            by_student.setdefault(enrollment.student_id, []).append(enrollment)
+            by_contact.setdefault(enrollment.student.phone_key, []).append(enrollment)
+
+    matches = {}
+    for row in rows:
+        if row.t_id:
+            matches[row.number] = by_t_id.get(row.t_id) or 'no enrollment with t_id ' + row.t_id
+        else:
+            candidates, key = ((by_student.get(row.student_id), 'student_id ' + row.student_id) if row.student_id
+                               else (by_contact.get(row.contact), 'contact ' + row.contact) if row.contact
+                               else (None, ''))
+            if not key:
+                matches[row.number] = 'no t_id, student_id or contact found'
+            elif not candidates:
+                matches[row.number] = 'no enrollment with dues for ' + key
+            elif len(candidates) > 1:
+                matches[row.number] = f'{key} matches {len(candidates)} enrollments with dues'
+            else:
+                matches[row.number] = candidates[0]
+    return matches
+
+
+def _build_payments(row, enrollment, dues, report):
+    """
+    Apply the add_payment rules to one row and return the Payment objects it becomes.
+    `dues` tracks each enrollment's remaining (admission, course) fees across the chunk.
+    Rows without a payment type settle the admission fee first, like apply_initial_payment().
+    """
+    if row.amount is None or row.amount <= 0:
+        report.reject(row, 'amount must be positive')
+        return []
+    if row.payment_date is None:
+        report.reject(row, 'unrecognised date')
+        return []
+
+    admission_due, course_due = dues.setdefault(
+        enrollment.pk, [enrollment.admission_fee_remaining, enrollment.course_fee_remaining]
+    )
+    if row.payment_type == ADMISSION_FEE_REMARK:
+        allocation = [(ADMISSION_FEE_REMARK, row.amount, admission_due)]
+    elif row.payment_type == COURSE_FEE_REMARK:
+        allocation = [(COURSE_FEE_REMARK, row.amount, course_due)]
+    elif row.payment_type:
+        report.reject(row, 'invalid payment type')
+        return []
+    else:
+        to_admission = min(row.amount, admission_due)
+        allocation = [(ADMISSION_FEE_REMARK, to_admission, admission_due),
+                      (COURSE_FEE_REMARK, row.amount - to_admission, course_due)]
+        allocation = [part for part in allocation if part[1] > 0]
+        if row.amount > admission_due + course_due:
+            report.reject(row, f'amount exceeds remaining dues of ₹{admission_due + course_due}')
+            return []
+
+    payments = []
+    for remark, amount, due in allocation:
+        if due <= 0:
+            report.reject(row, f'{remark.lower()} already settled')
+            return []
+        if amount > due:
+            report.reject(row, f'amount exceeds due {remark.lower()} of ₹{due}')
+            return []
+        payments.append(Payment(
+            enrollment=enrollment,
+            amount=amount,
+            amount_paid=amount,
+            payment_mode=row.payment_mode,
+            payment_date=row.payment_date,
+            remarks=remark,
+            payment_status='paid',
+        ))
+
+    for payment in payments:
+        index = 0 if payment.remarks == ADMISSION_FEE_REMARK else 1
+        dues[enrollment.pk][index] -= payment.amount_paid
+    return payments
+
+
+def _process_chunk(rows, report, dry_run):
+    matches = _match_enrollments(rows)
+    dues = {}
+    payments = []
+    for row in rows:
+        enrollment = matches[row.number]
+        if isinstance(enrollment, str):
+            report.reject(row, enrollment)
+            continue
+        payments.extend(_build_payments(row, enrollment, dues, report))
+
+    if payments and not dry_run:
+        Payment.objects.post_batch(payments)
+    report.payments_posted += len(payments)
+    report.amount_posted += sum((p.amount_paid for p in payments), Decimal('0.00'))
+
+
+def import_payments(stream, default_mode='bank_transfer', chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """
+    Import payments from a text stream of CSV data. Only `chunk_size` rows are held in
+    memory at a time; each chunk is posted in its own transaction. Returns a PaymentImportReport.
+    """
+    report = PaymentImportReport()
+    reader = csv.DictReader(stream)
+    columns = _column_map(reader.fieldnames)
+    if 'amount' not in columns:
+        raise ValueError("The file has no amount/credit column.")
+
+    chunk = []
+    for number, raw in enumerate(reader, start=2):  # row 1 is the header
+        if not any((value or '').strip() for value in raw.values()):
+            continue
+        report.rows_read += 1
+        chunk.append(ImportRow(number, raw, columns, default_mode))
+        if len(chunk) >= chunk_size:
+            _process_chunk(chunk, report, dry_run)
+            chunk = []
+    if chunk:
+        _process_chunk(chunk, report, dry_run)
+    return report
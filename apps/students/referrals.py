@@ -0,0 +1,245 @@
+"""
+Referral counts, revenue and top referrers, read from the ReferralPath closure table.
+
+Every student has a depth-0 path to itself and a path to each student below it in the
+Student.referred_by tree, so "everyone student X brought in, directly or not" is one
+indexed range of ReferralPath rows. The table is kept in step by the receivers below
+(new students, changed referrers, hard deletes) and by explicit add_students() calls
+from bulk inserts; `manage.py rebuild_referrals` rebuilds it from the referred_by column.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce, Lower
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import ReferralPath, Student, normalise_email, normalise_phone
+
+TOP_REFERRERS = 20
+# Aggregates the referral report can rank referrers by (?order=)
+REFERRER_ORDERINGS = ('direct', 'network', 'revenue')
+
+_EMAIL = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_DIGITS = re.compile(r'\d+')
+
+
+class ReferralCycleError(ValueError):
+    """The new referrer is the student or someone the student (indirectly) referred."""
+
+
+def referral_paths(parents):
+    """
+    Every (ancestor, descendant, depth) path, depth-0 rows included, of the forest given
+    as {student id: referrer id or None}. Shared with the 0010 migration's backfill. A
+    cycle already present in the data is cut where the walk meets it again.
+    """
+    paths = []
+    for student_id in parents:
+        seen = {student_id}
+        paths.append((student_id, student_id, 0))
+        ancestor, depth = parents.get(student_id), 1
+        while ancestor is not None and ancestor in parents and ancestor not in seen:
+            seen.add(ancestor)
+            paths.append((ancestor, student_id, depth))
+            ancestor, depth = parents.get(ancestor), depth + 1
+    return paths
+
+
+def _create(paths):
+    ReferralPath.objects.bulk_create(
+        [ReferralPath(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in paths],
+        batch_size=2000,
+    )
+
+
+def add_students(students):
+    """Add the paths of newly inserted students (whose referrers may be in the same batch)."""
+    students = list(students)
+    if not students:
+        return
+    parents = {student.pk: student.referred_by_id for student in students}
+    outside = {pk for pk in parents.values() if pk is not None and pk not in parents}
+    known = {}
+    for ancestor, descendant, depth in ReferralPath.objects.filter(descendant__in=outside).values_list(
+        'ancestor_id', 'descendant_id', 'depth',
+    ):
+        known.setdefault(descendant, []).append((ancestor, depth))
+
+    ancestors = {}
+
+    def ancestors_of(pk, seen=()):
+        # [(ancestor, depth)] of a student in this batch
+        if pk not in ancestors:
+            parent = parents[pk]
+            if parent is None or parent in seen or parent == pk:
+                ancestors[pk] = []
+            elif parent in parents:
+                ancestors[pk] = [(parent, 1)] + [(a, d + 1) for a, d in ancestors_of(parent, seen + (pk,))]
+            else:
+                ancestors[pk] = [(a, d + 1) for a, d in known.get(parent, [(parent, 0)])]
+        return ancestors[pk]
+
+    _create([(pk, pk, 0) for pk in parents] + [(a, pk, d) for pk in parents for a, d in ancestors_of(pk)])
+
+
+def would_create_cycle(student_id, referrer_id):
+    """True if making `referrer_id` the referrer of `student_id` would close a loop."""
+    if not student_id or not referrer_id:
+        return False
+    return student_id == referrer_id or ReferralPath.objects.filter(
+        ancestor_id=student_id, descendant_id=referrer_id,
+    ).exists()
+
+
+def move_student(student_id, referrer_id):
+    """Re-hang a student and everyone below it under `referrer_id` (None: make it a root)."""
+    with transaction.atomic():
+        subtree = dict(ReferralPath.objects.filter(ancestor_id=student_id).values_list('descendant_id', 'depth'))
+        if not subtree:
+            subtree = {student_id: 0}
+            _create([(student_id, student_id, 0)])
+        if referrer_id in subtree:
+            raise ReferralCycleError(f"{referrer_id} is referred (directly or not) by {student_id}")
+        ReferralPath.objects.filter(descendant_id__in=list(subtree)).exclude(ancestor_id__in=list(subtree)).delete()
+        if referrer_id is not None:
+            above = ReferralPath.objects.filter(descendant_id=referrer_id).values_list('ancestor_id', 'depth')
+            _create([(a, d, above_depth + depth + 1) for a, above_depth in above for d, depth in subtree.items()])
+
+
+def _referral_aggregates(paths):
+    """Per-ancestor referral counts and revenue of a ReferralPath queryset (deleted students excluded)."""
+    live = Q(depth__gte=1, descendant__is_deleted=False)
+    paid = Q(live, descendant__enrollments__is_deleted=False)
+    revenue = F('descendant__enrollments__admission_fee_paid_total') + F('descendant__enrollments__course_fee_paid_total')
+    money = DecimalField(max_digits=14, decimal_places=2)
+    return paths.filter(depth__gte=1).values('ancestor_id').annotate(
+        direct=Count('descendant', distinct=True, filter=live & Q(depth=1)),
+        network=Count('descendant', distinct=True, filter=live),
+        direct_revenue=Coalesce(Sum(revenue, filter=paid & Q(depth=1), output_field=money), 0, output_field=money),
+        revenue=Coalesce(Sum(revenue, filter=paid, output_field=money), 0, output_field=money),
+    ).order_by()
+
+
+def referral_stats(student_ids):
+    """
+    {student id: {'direct', 'indirect', 'network', 'direct_revenue', 'revenue'}} for the
+    given students, in one query. Revenue is what the referred students have paid so far.
+    """
+    stats = {pk: {'direct': 0, 'indirect': 0, 'network': 0, 'direct_revenue': 0, 'revenue': 0} for pk in student_ids}
+    for row in _referral_aggregates(ReferralPath.objects.filter(ancestor_id__in=list(stats))):
+        row['indirect'] = row['network'] - row['direct']
+        stats[row.pop('ancestor_id')] = row
+    return stats
+
+
+def top_referrers(limit=TOP_REFERRERS, order='direct'):
+    """[(student, stats)] of the active students with the most referrals, by REFERRER_ORDERINGS[order]."""
+    key = order if order in REFERRER_ORDERINGS else 'direct'
+    rows = list(_referral_aggregates(ReferralPath.objects.filter(ancestor__is_deleted=False)).filter(
+        direct__gt=0,
+    ).order_by(f'-{key}', '-network', 'ancestor_id')[:limit])
+    students = Student.objects.in_bulk([row['ancestor_id'] for row in rows])
+    result = []
+    for row in rows:
+        row['indirect'] = row['network'] - row['direct']
+        result.append((students[row.pop('ancestor_id')], row))
+    return result
+
+
+def referred_students(student_id, max_depth=None):
+    """Active students below `student_id` in the referral tree, each with `referral_depth`, nearest first."""
+    paths = ReferralPath.objects.filter(ancestor_id=student_id, depth__gte=1, descendant__is_deleted=False)
+    if max_depth is not None:
+        paths = paths.filter(depth__lte=max_depth)
+    students = []
+    for path in paths.select_related('descendant').order_by('depth', 'descendant__full_name'):
+        path.descendant.referral_depth = path.depth
+        students.append(path.descendant)
+    return students
+
+
+def _name_key(value):
+    return ' '.join((value or '').lower().split())
+
+
+def resolve_referrer_names(queryset=None):
+    """
+    Match the free-text referred_by_name of students without a referrer to existing
+    students: a student ID, email or phone number in the text, or else a unique
+    (case-insensitive) full name. Candidates for the whole queryset are fetched with
+    one query. Returns [(student, referrer)] for the unambiguous matches; nothing is saved.
+    """
+    if queryset is None:
+        queryset = Student.objects.filter(is_deleted=False)
+    students = list(queryset.filter(referred_by__isnull=True).exclude(referred_by_name__isnull=True).exclude(
+        referred_by_name='',
+    ).only('pk', 'referred_by_name'))
+    if not students:
+        return []
+
+    clues = {}
+    for student in students:
+        text = student.referred_by_name
+        emails = {normalise_email(email) for email in _EMAIL.findall(text)}
+        numbers = _DIGITS.findall(_EMAIL.sub(' ', text))
+        clues[student.pk] = {
+            'ids': {n for n in numbers if len(n) < 10},
+            'phones': {normalise_phone(n) for n in numbers if len(n) >= 10} - {''},
+            'emails': emails,
+            'name': _name_key(_DIGITS.sub(' ', _EMAIL.sub(' ', text))),
+        }
+    ids = set().union(*(c['ids'] for c in clues.values()))
+    phones = set().union(*(c['phones'] for c in clues.values()))
+    emails = set().union(*(c['emails'] for c in clues.values()))
+    names = {c['name'] for c in clues.values() if c['name']}
+
+    candidates = list(Student.objects.filter(is_deleted=False).annotate(name_key=Lower('full_name')).filter(
+        Q(student_id__in=ids) | Q(phone_key__in=phones) | Q(email_key__in=emails) | Q(name_key__in=names),
+    ).only('pk', 'full_name', 'phone_key', 'email_key'))
+    by = {'ids': {}, 'phones': {}, 'emails': {}, 'name': {}}
+    for candidate in candidates:
+        by['ids'].setdefault(candidate.pk, set()).add(candidate)
+        by['phones'].setdefault(candidate.phone_key, set()).add(candidate)
+        by['emails'].setdefault(candidate.email_key, set()).add(candidate)
+        by['name'].setdefault(_name_key(candidate.full_name), set()).add(candidate)
+
+    matches = []
+    for student in students:
+        clue = clues[student.pk]
+        # Most specific clue first; a clue matching several students is ambiguous
+        for kind in ('ids', 'emails', 'phones', 'name'):
+            values = clue[kind] if kind != 'name' else ({clue['name']} if clue['name'] else set())
+            found = set().union(*(by[kind].get(value, set()) for value in values)) - {student}
+            if found:
+                if len(found) == 1:
+                    matches.append((student, found.pop()))
+                break
+    return matches
+
+
+@receiver(pre_save, sender=Student, dispatch_uid='referral_cycle_check')
+def _check_referrer(sender, instance, **kwargs):
+    if not instance._state.adding and instance.referred_by_id != instance._loaded_referred_by_id:
+        if would_create_cycle(instance.pk, instance.referred_by_id):
+            raise ReferralCycleError(f"{instance.referred_by_id} is referred (directly or not) by {instance.pk}")
+
+
+@receiver(post_save, sender=Student, dispatch_uid='referral_paths_saved')
+def _student_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'referred_by' not in update_fields:
+        return
+    if created:
+        add_students([instance])
+    elif instance.referred_by_id != instance._loaded_referred_by_id:
+        move_student(instance.pk, instance.referred_by_id)
+    instance._loaded_referred_by_id = instance.referred_by_id
+
+
+@receiver(pre_delete, sender=Student, dispatch_uid='referral_paths_deleted')
+def _student_deleted(sender, instance, **kwargs):
+    # The students it referred lose their referrer (SET_NULL, no signal): cut their
+    # subtrees loose from this student's ancestors; its own rows go by CASCADE
+    subtree = list(ReferralPath.objects.filter(ancestor_id=instance.pk).values_list('descendant_id', flat=True))
+    ReferralPath.objects.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
@@ -0,0 +1,213 @@
+"""
+Fee reminders for upcoming and overdue installments.
+
+queue_reminders() reads the outstanding installments due up to Setting.reminder_days_ahead
+days from now (one range of the InstallmentSchedule due_date index), groups them per
+student and writes one DuesReminder row per student and channel, skipping students
+reminded on that channel within the last Setting.reminder_interval_days. send_reminders()
+drains the queue a batch at a time through the channel's backend, outside any transaction:
+email through EMAIL_BACKEND over one connection per batch, SMS through settings.SMS_BACKEND.
+Tests get Django's locmem email backend and can point SMS_BACKEND at LocmemSmsBackend.
+`manage.py dues_reminders` runs both, from cron or as a long-running worker.
+"""
+import datetime
+import sys
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import DuesReminder, InstallmentSchedule
+from apps.Settings.models import get_settings
+
+REMINDER_BATCH_SIZE = 100
+# Sends of a reminder before it is marked failed
+MAX_ATTEMPTS = 3
+# A batch still 'sending' after this was claimed by a worker that stopped; it is sent again
+CLAIM_TIMEOUT = datetime.timedelta(minutes=15)
+
+# What LocmemSmsBackend "sent", like django.core.mail.outbox
+sms_outbox = []
+
+
+def reminder_channels():
+    return list(getattr(settings, 'DUES_REMINDER_CHANNELS', ['email']))
+
+
+def _recipient(student, channel):
+    return (student.email if channel == 'email' else student.contact) or ''
+
+
+def _messages(student, installments, today):
+    """(subject, email body, SMS text, total outstanding) of one student's reminder."""
+    total = sum(installment.amount_remaining for installment in installments)
+    overdue = [installment for installment in installments if installment.due_date < today]
+    lines = []
+    for installment in installments:
+        late = " (overdue)" if installment.due_date < today else ""
+        lines.append(
+            f"- {installment.enrollment.course.course_name}, installment {installment.number}: "
+            f"₹{installment.amount_remaining:.2f} due {installment.due_date:%d %b %Y}{late}"
+        )
+    subject = "Overdue fee reminder" if overdue else "Fee reminder"
+    body = "\n".join([
+        f"Dear {student.full_name},",
+        "",
+        "This is a reminder of the following fees:",
+        "",
+        *lines,
+        "",
+        f"Total outstanding: ₹{total:.2f}",
+        "",
+        "Please ignore this message if you have already paid.",
+    ])
+    earliest = installments[0].due_date
+    sms = (
+        f"Dear {student.full_name}, fees of Rs.{total:.2f} are "
+        f"{'overdue since' if overdue else 'due on'} {earliest:%d %b %Y}. Please ignore if already paid."
+    )
+    return subject, body, sms, total
+
+
+def due_installments(today=None, days_ahead=None):
+    """Outstanding installments of active students due up to `days_ahead` days after `today`, earliest first."""
+    today = today or timezone.localdate()
+    if days_ahead is None:
+        days_ahead = get_settings().reminder_days_ahead
+    return InstallmentSchedule.objects.outstanding().filter(
+        enrollment__student__is_deleted=False,
+        due_date__lte=today + datetime.timedelta(days=days_ahead),
+    ).select_related('enrollment__student', 'enrollment__course').order_by('due_date')
+
+
+def queue_reminders(today=None, days_ahead=None, interval=None, channels=None, dry_run=False):
+    """
+    Queue a reminder per student with dues and channel, unless that student already had
+    one queued on the channel (sent, waiting or failed) within the last `interval` days. Returns
+    {channel: number queued}; with dry_run nothing is written.
+    """
+    today = today or timezone.localdate()
+    if interval is None:
+        interval = get_settings().reminder_interval_days
+    channels = channels or reminder_channels()
+
+    by_student = {}
+    for installment in due_installments(today, days_ahead).iterator(chunk_size=2000):
+        student = installment.enrollment.student
+        by_student.setdefault(student.pk, (student, []))[1].append(installment)
+
+    since = timezone.now() - datetime.timedelta(days=interval)
+    queued = {}
+    reminders = []
+    for channel in channels:
+        recent = set(DuesReminder.objects.filter(
+            channel=channel, created_at__gte=since, student__in=list(by_student),
+        ).values_list('student_id', flat=True))
+        count = 0
+        for pk, (student, installments) in by_student.items():
+            recipient = _recipient(student, channel)
+            if pk in recent or not recipient:
+                continue
+            subject, body, sms, total = _messages(student, installments, today)
+            reminders.append(DuesReminder(
+                student=student, channel=channel, recipient=recipient,
+                subject=subject if channel == 'email' else '', body=body if channel == 'email' else sms,
+                amount=total,
+            ))
+            count += 1
+        queued[channel] = count
+    if not dry_run:
+        DuesReminder.objects.bulk_create(reminders, batch_size=500)
+    return queued
+
+
+class EmailBackend:
+    """Sends reminders as emails through EMAIL_BACKEND, over one connection per batch."""
+
+    def send(self, reminders):
+        """Send each reminder; returns {reminder pk: error message} for the ones that failed."""
+        errors = {}
+        with mail.get_connection() as connection:
+            for reminder in reminders:
+                try:
+                    mail.EmailMessage(
+                        reminder.subject, reminder.body, to=[reminder.recipient], connection=connection,
+                    ).send()
+                except Exception as exc:  # one bad address must not stop the batch
+                    errors[reminder.pk] = str(exc) or exc.__class__.__name__
+        return errors
+
+
+class ConsoleSmsBackend:
+    """Writes SMS reminders to stdout instead of sending them; replace with a gateway backend."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, reminders):
+        for reminder in reminders:
+            self.stream.write(f"SMS to {reminder.recipient}: {reminder.body}\n")
+        return {}
+
+
+class LocmemSmsBackend:
+    """Keeps SMS reminders in `sms_outbox`, for tests."""
+
+    def send(self, reminders):
+        sms_outbox.extend((reminder.recipient, reminder.body) for reminder in reminders)
+        return {}
+
+
+def get_backend(channel):
+    if channel == 'email':
+        return EmailBackend()
+    return import_string(getattr(settings, 'SMS_BACKEND', 'apps.students.reminders.ConsoleSmsBackend'))()
+
+
+def send_reminders(batch_size=REMINDER_BATCH_SIZE, channels=None):
+    """
+    Send pending reminders, oldest first, `batch_size` per channel backend call. Each batch
+    is claimed in a short transaction (SELECT ... FOR UPDATE SKIP LOCKED where the database
+    supports it, then marked 'sending'), so several workers can drain the queue, and is
+    handed to the backend outside it, so a slow mail server holds no locks. A failed send
+    is retried on the next run, until MAX_ATTEMPTS. Rows left 'sending' by a worker that
+    died are sent again after CLAIM_TIMEOUT. Returns (sent, failed).
+    """
+    channels = channels or [choice for choice, _ in DuesReminder.CHANNEL_CHOICES]
+    DuesReminder.objects.filter(
+        status='sending', channel__in=channels, claimed_at__lt=timezone.now() - CLAIM_TIMEOUT,
+    ).update(status='pending')
+    sent = failed = 0
+    retry = []  # failed in this run, left for the next one
+    while True:
+        with transaction.atomic():
+            batch = list(DuesReminder.objects.select_for_update(skip_locked=True).filter(
+                status='pending', channel__in=channels,
+            ).exclude(pk__in=retry).order_by('id')[:batch_size])
+            if not batch:
+                return sent, failed
+            DuesReminder.objects.filter(pk__in=[reminder.pk for reminder in batch]).update(
+                status='sending', claimed_at=timezone.now(),
+            )
+
+        for channel in {reminder.channel for reminder in batch}:
+            reminders = [reminder for reminder in batch if reminder.channel == channel]
+            errors = get_backend(channel).send(reminders)
+            now = timezone.now()
+            for reminder in reminders:
+                reminder.attempts += 1
+                if reminder.pk not in errors:
+                    reminder.status, reminder.sent_at, reminder.last_error = 'sent', now, ''
+                    sent += 1
+                    continue
+                reminder.last_error = errors[reminder.pk]
+                if reminder.attempts >= MAX_ATTEMPTS:
+                    reminder.status = 'failed'
+                    failed += 1
+                else:
+                    reminder.status = 'pending'
+                    retry.append(reminder.pk)
+            # Recorded per channel, so a later backend failing cannot lose these results
+            DuesReminder.objects.bulk_update(reminders, ['status', 'attempts', 'last_error', 'sent_at'])
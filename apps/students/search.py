@@ -0,0 +1,136 @@
+"""
+Student search backed by the StudentSearchTerm table.
+
+Each student is stored as a handful of short, lower-cased terms (see student_search_terms),
+so a query becomes a few indexed exact/prefix lookups instead of four LIKE '%q%' scans
+of the Student table. Results are ranked: an exact name word beats a prefix, which beats
+a fuzzy match on name trigrams (so "raveendra" still finds "Ravindra").
+"""
+import math
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Sum, Value, When
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Student, StudentSearchTerm
+
+SEARCH_RESULTS = 10
+TERM_LENGTH = StudentSearchTerm._meta.get_field('term').max_length
+
+# Points per matching term, by how it matched
+EXACT_SCORE = 10
+PREFIX_SCORE = 6
+GRAM_SCORE = 1
+# Share of a word's trigrams a misspelt query word must share with a name word
+GRAM_MATCH_RATIO = 0.5
+# Query words shorter than this are matched by prefix only
+MIN_FUZZY_LENGTH = 4
+
+# Student fields the terms are built from; saves that touch none of them keep the terms
+INDEXED_FIELDS = {'student_id', 'full_name', 'email', 'contact'}
+
+_WORD = re.compile(r'\w+')
+
+
+def _fold(value):
+    """Lower-case and strip accents."""
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+
+def _words(value):
+    return _WORD.findall(_fold(value).replace('_', ' '))
+
+
+def _trigrams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _phone_digits(value):
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:]  # drop the country code
+
+
+def student_search_terms(student_id, full_name, email, contact):
+    """The set of search terms for one student (shared with the 0007 migration's backfill)."""
+    terms = {f'i:{student_id}'.lower()}
+    name_words = _words(full_name)
+    for word in name_words:
+        terms.add(f'w:{word}')
+        terms.update(f'g:{gram}' for gram in _trigrams(word))
+    if email:
+        terms.add(f'e:{_fold(email)}')
+        terms.update(f'w:{word}' for word in _words(email.split('@')[0]))
+    digits = _phone_digits(contact)
+    if digits:
+        terms.add(f'p:{digits}')
+    return {term[:TERM_LENGTH] for term in terms}
+
+
+def index_students(students):
+    """Rewrite the search terms of `students` (Student instances)."""
+    students = list(students)
+    if not students:
+        return
+    with transaction.atomic():
+        StudentSearchTerm.objects.filter(student__in=[s.pk for s in students]).delete()
+        StudentSearchTerm.objects.bulk_create([
+            StudentSearchTerm(student_id=s.pk, term=term)
+            for s in students
+            for term in student_search_terms(s.student_id, s.full_name, s.email, s.contact)
+        ], batch_size=2000)
+
+
+def _query_conditions(query):
+    """
+    (score expression cases, minimum score) for a search string. The query is folded like
+    the stored terms, so prefixes are matched case-sensitively (startswith, not istartswith,
+    which wraps the column in UPPER() and cannot use the term index).
+    """
+    folded = _fold(query).strip()
+    if '@' in folded:
+        return [When(term__startswith=f'e:{folded}', then=Value(EXACT_SCORE))], EXACT_SCORE
+    cases, minimum = [], 0
+    for word in _words(query):
+        if word.isdigit():
+            digits = _phone_digits(word) if len(word) > 10 else word
+            cases.append(When(Q(term=f'i:{word}') | Q(term=f'p:{digits}'), then=Value(EXACT_SCORE)))
+            cases.append(When(Q(term__startswith=f'i:{word}') | Q(term__startswith=f'p:{digits}'),
+                              then=Value(PREFIX_SCORE)))
+            minimum += PREFIX_SCORE
+            continue
+        cases.append(When(term=f'w:{word}', then=Value(EXACT_SCORE)))
+        cases.append(When(term__startswith=f'w:{word}', then=Value(PREFIX_SCORE)))
+        if len(word) >= MIN_FUZZY_LENGTH:
+            grams = _trigrams(word)
+            cases.append(When(term__in=[f'g:{gram}' for gram in grams], then=Value(GRAM_SCORE)))
+            minimum += min(PREFIX_SCORE, math.ceil(len(grams) * GRAM_MATCH_RATIO) * GRAM_SCORE)
+        else:
+            minimum += PREFIX_SCORE
+    return cases, minimum
+
+
+def search_students(query, limit=SEARCH_RESULTS):
+    """Active students matching `query`, best match first."""
+    cases, minimum = _query_conditions(query)
+    if not cases:
+        return []
+    lookup = Q()
+    for case in cases:
+        lookup |= case.condition
+    ranked = StudentSearchTerm.objects.filter(lookup, student__is_deleted=False).values('student_id').annotate(
+        score=Sum(Case(*cases, default=Value(0), output_field=IntegerField())),
+    ).filter(score__gte=minimum).order_by('-score', 'student_id')[:limit]
+    ranked = [row['student_id'] for row in ranked]
+    students = Student.objects.in_bulk(ranked)
+    return [students[pk] for pk in ranked if pk in students]
+
+
+@receiver(post_save, sender=Student, dispatch_uid='student_search_index')
+def _student_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or INDEXED_FIELDS.intersection(update_fields):
+        index_students([instance])
@@ -0,0 +1,265 @@
+"""
+Bulk onboarding of new students from CSV spreadsheets (campus drives and the like).
+
+Each row is cleaned with the same form fields as StudentEnrollmentForm, then rows are
+handled in chunks: email uniqueness and referrers are checked with one query each per
+chunk, student IDs, t_ids and certificate numbers are reserved as blocks, and Student,
+StudentEnrollment, InstallmentSchedule and initial Payment rows are inserted with bulk_create.
+"""
+import csv
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .forms import StudentEnrollmentForm
+from .models import (
+    Payment, Student, StudentEnrollment, normalise_email,
+    reserve_certificate_numbers, reserve_student_ids, reserve_t_ids, sync_installments,
+)
+from .analytics import invalidate_analytics
+from .autocomplete import record_changes
+from .referrals import add_students
+from .search import index_students
+from .payment_import import PaymentImportReport, _normalise_header
+from apps.courses.models import Course
+from apps.Enquiries.matching import match_students
+from apps.Settings.models import get_settings
+
+IMPORT_CHUNK_SIZE = 500
+
+STUDENT_FIELDS = [
+    'full_name', 'father_name', 'gender', 'email', 'dob', 'contact', 'emergency_contact_number',
+    'address', 'state', 'city', 'pincode', 'referral_source', 'referred_by_name',
+]
+ENROLLMENT_FIELDS = [
+    'status', 'discount', 'admission_fee', 'payment_method', 'payment_mode', 'total_installments',
+    'batch_time', 'enrollment_date', 'due_date', 'notes', 'initial_payment',
+]
+FORM_FIELDS = STUDENT_FIELDS + ENROLLMENT_FIELDS + ['referred_by_student_id']
+
+# The form leaves these optional because an existing student can be picked instead,
+# but a new Student row cannot be saved without them.
+REQUIRED_FIELDS = {'full_name', 'father_name', 'gender', 'email', 'dob', 'contact', 'state', 'city', 'pincode'}
+
+# Extra header spellings, on top of the form field names themselves
+COLUMN_ALIASES = {
+    'full_name': ['name', 'student_name'],
+    'father_name': ['father', 'fathers_name', 'father_s_name'],
+    'dob': ['date_of_birth', 'birth_date'],
+    'contact': ['phone', 'mobile', 'contact_number'],
+    'emergency_contact_number': ['emergency_contact'],
+    'course': ['course_name'],
+    'batch_time': ['batch'],
+    'referred_by_student_id': ['referred_by', 'referrer_id'],
+    'initial_payment': ['amount_paid', 'paid'],
+}
+
+
+def _column_map(fieldnames):
+    headers = {_normalise_header(name): name for name in fieldnames or []}
+    columns = {}
+    for field in FORM_FIELDS + ['course']:
+        for alias in [field] + COLUMN_ALIASES.get(field, []):
+            if alias in headers:
+                columns[field] = headers[alias]
+                break
+    return columns
+
+
+class StudentImportRow:
+    def __init__(self, number, raw, columns, defaults, courses):
+        self.number = number
+        self.raw = raw
+        self.data = {}
+        self.errors = []
+
+        def get(field):
+            return (raw.get(columns[field]) or '').strip() if field in columns else ''
+
+        form_fields = StudentEnrollmentForm.base_fields
+        for field in FORM_FIELDS:
+            value = get(field) or defaults.get(field, '')
+            if not value and field in REQUIRED_FIELDS:
+                self.errors.append(f"{field}: This field is required.")
+                continue
+            try:
+                self.data[field] = form_fields[field].clean(value)
+                if self.data[field] not in (None, '') and field in STUDENT_FIELDS:
+                    # Model limits (max_length, choices) the form fields do not enforce
+                    Student._meta.get_field(field).run_validators(self.data[field])
+            except ValidationError as e:
+                self.errors.append(f"{field}: {' '.join(e.messages)}")
+
+        course = get('course')
+        self.course = courses.get(course.lower())
+        if self.course is None:
+            self.errors.append(f"course: {course!r} is not an active course." if course else "course: This field is required.")
+
+        if self.data.get('email'):
+            self.data['email'] = self.data['email'].strip()
+
+
+class StudentImportReport(PaymentImportReport):
+    def __init__(self):
+        super().__init__()
+        self.students_created = 0
+
+
+def _active_courses():
+    courses = {}
+    for course in Course.objects.filter(is_deleted=False):
+        courses[course.course_name.lower()] = course
+        courses[str(course.pk)] = course
+    return courses
+
+
+def _build_student(row, student_id, referrer_ids):
+    data = row.data
+    referrer = data.get('referred_by_student_id')
+    student = Student(
+        student_id=student_id,
+        full_name=data['full_name'],
+        father_name=data['father_name'],
+        gender=data['gender'],
+        email=data['email'],
+        dob=data['dob'],
+        contact=data['contact'],
+        emergency_contact_number=data.get('emergency_contact_number') or '',
+        address=data.get('address') or '',
+        state=data['state'],
+        city=data['city'],
+        pincode=data['pincode'],
+        referral_source=data.get('referral_source') or '',
+        referred_by_id=referrer if referrer in referrer_ids else None,
+        referred_by_name=data.get('referred_by_name') or '',
+    )
+    student.set_match_keys()  # bulk_create skips save()
+    return student
+
+
+def _build_enrollment(row, student, t_id, certificate_number):
+    data = row.data
+    enrollment_date = data.get('enrollment_date') or timezone.now().date()
+    enrollment = StudentEnrollment(
+        student=student,
+        course=row.course,
+        status=data['status'],
+        enrollment_date=enrollment_date,
+        due_date=data.get('due_date') or (enrollment_date + timezone.timedelta(days=30)),
+        notes=data.get('notes'),
+        payment_method=data.get('payment_method') or None,
+        payment_mode=data['payment_mode'],
+        total_installments=data.get('total_installments'),
+        batch_time=data.get('batch_time'),
+        discount=data.get('discount') or Decimal('0.00'),
+        admission_fee=data.get('admission_fee') or Decimal('0.00'),
+        t_id=t_id,
+        certificate_number=certificate_number,
+    )
+    enrollment.calculate_amounts()
+    return enrollment
+
+
+def _process_chunk(rows, report, seen_emails, dry_run):
+    emails = {normalise_email(row.data['email']) for row in rows}
+    taken = set(Student.all_objects.filter(email_key__in=emails).values_list('email_key', flat=True))
+    referrers = {row.data['referred_by_student_id'] for row in rows if row.data.get('referred_by_student_id')}
+    referrer_ids = set(
+        Student.objects.filter(student_id__in=referrers, is_deleted=False).values_list('student_id', flat=True)
+    ) if referrers else set()
+
+    valid = []
+    for row in rows:
+        email = normalise_email(row.data['email'])
+        if email in taken:
+            report.reject(row, 'email: A student with this email already exists.')
+        elif email in seen_emails:
+            report.reject(row, 'email: Appears more than once in this file.')
+        else:
+            seen_emails.add(email)
+            valid.append(row)
+
+    if not valid:
+        return
+    if dry_run:
+        report.students_created += len(valid)
+        report.payments_posted += sum(1 for row in valid if row.data.get('initial_payment'))
+        report.amount_posted += sum((row.data.get('initial_payment') or Decimal('0.00') for row in valid), Decimal('0.00'))
+        return
+
+    count = len(valid)
+    student_ids = reserve_student_ids(count)
+    t_ids = reserve_t_ids(count)
+    certificate_numbers = reserve_certificate_numbers(count)
+
+    with transaction.atomic():
+        students = [_build_student(row, student_id, referrer_ids) for row, student_id in zip(valid, student_ids)]
+        Student.objects.bulk_create(students)
+        # bulk_create sends no post_save
+        index_students(students)
+        add_students(students)
+        record_changes('student', [student.pk for student in students])
+        enrollments = [
+            _build_enrollment(row, student, t_id, certificate_number)
+            for row, student, t_id, certificate_number in zip(valid, students, t_ids, certificate_numbers)
+        ]
+        StudentEnrollment.objects.bulk_create(enrollments)
+        if any(enrollment.pk is None for enrollment in enrollments):
+            # Backends that cannot return ids from a bulk insert (MySQL): look them up by t_id
+            ids = dict(StudentEnrollment.objects.filter(t_id__in=t_ids).values_list('t_id', 'pk'))
+            for enrollment in enrollments:
+                enrollment.pk = ids[enrollment.t_id]
+        sync_installments(enrollments)
+
+        payments = []
+        for row, enrollment in zip(valid, enrollments):
+            initial_payment = row.data.get('initial_payment')
+            if initial_payment:
+                payments.extend(enrollment.build_initial_payments(initial_payment, enrollment.payment_mode))
+        Payment.objects.post_batch(payments)
+        transaction.on_commit(invalidate_analytics)
+        transaction.on_commit(lambda: match_students([student.pk for student in students]))
+
+    report.students_created += count
+    report.payments_posted += len(payments)
+    report.amount_posted += sum((p.amount_paid for p in payments), Decimal('0.00'))
+
+
+def import_students(stream, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """
+    Create a new Student and StudentEnrollment (plus initial payments) for every valid
+    row of a CSV text stream, `chunk_size` rows per transaction. Returns a StudentImportReport.
+    """
+    report = StudentImportReport()
+    reader = csv.DictReader(stream)
+    columns = _column_map(reader.fieldnames)
+    missing = [field for field in sorted(REQUIRED_FIELDS) + ['course'] if field not in columns]
+    if missing:
+        raise ValueError("The file is missing the columns: " + ", ".join(missing))
+
+    # Same defaults the enrollment form offers
+    defaults = {
+        'status': 'active',
+        'payment_mode': 'cash',
+        'admission_fee': str(get_settings().admission_fee),
+    }
+    courses = _active_courses()
+
+    chunk, seen_emails = [], set()
+    for number, raw in enumerate(reader, start=2):  # row 1 is the header
+        if not any((value or '').strip() for value in raw.values()):
+            continue
+        report.rows_read += 1
+        row = StudentImportRow(number, raw, columns, defaults, courses)
+        if row.errors:
+            report.reject(row, '; '.join(row.errors))
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _process_chunk(chunk, report, seen_emails, dry_run)
+            chunk = []
+    if chunk:
+        _process_chunk(chunk, report, seen_emails, dry_run)
+    return report
@@ -1,3 +1,1225 @@
-from django.test import TestCase
+import csv
+import datetime
+import importlib
+import io
+import re
+import tempfile
+import unittest
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import analytics, autocomplete, certificates, documents
+from .models import (
+    AutocompleteChange, DuesReminder, InstallmentSchedule, MonthlyPaymentRollup, Payment, ReferralPath, Student,
+    StudentEnrollment, StudentSearchTerm,
+    installment_plan, reserve_certificate_numbers,
+)
+from . import reminders
+from .payment_import import import_payments
+from .referrals import ReferralCycleError, referral_stats, referred_students, top_referrers
+from .reminders import REMINDER_BATCH_SIZE, due_installments
+from .search import search_students
+from .student_import import import_students
+from .trash import TRASH_KINDS, TRASH_PAGE_SIZE
+from .views import ENROLLMENT_PAGE_SIZE, PENDING_DUES_PAGE_SIZE, _enrollment_filters, _expense_summary_querysets
+from apps.courses.models import Course
+from apps.Enquiries.models import Enquiry, EnquiryFunnelRollup
+from apps.Enquiries.views import _day_start
+from apps.Expenses.models import Expense
+from apps.Settings.models import Setting, invalidate_settings_cache
+from apps.Teams.models import Team
+
+# Plan lines that mean every row of a table is read, or the result is sorted afterwards
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN \S+$|USE TEMP B-TREE FOR ORDER BY', re.MULTILINE),
+    'postgresql': re.compile(r'Seq Scan|\bSort\b'),
+    'mysql': re.compile(r'^\S+ \S+ \S+ \S+ ALL |Using filesort', re.MULTILINE),
+}
+# Make scans look expensive, so a planner facing near-empty test tables still picks
+# an index wherever one fits (and only a missing index shows up as a scan)
+DISCOURAGE_SCANS = {
+    'postgresql': ['SET LOCAL enable_seqscan = off', 'SET LOCAL enable_sort = off'],
+    'mysql': ['SET SESSION max_seeks_for_key = 1'],
+}
+
+
+def make_course(name='Tally', fee='3000', duration=3, **fields):
+    return Course.objects.create(course_name=name, course_fee=Decimal(fee), course_duration=duration, **fields)
+
+
+def make_student(name='Asha Rao', email=None, **fields):
+    values = {
+        'full_name': name, 'father_name': 'Ravi Rao', 'gender': 'female', 'dob': datetime.date(2001, 5, 4),
+        'email': email or f"{name.lower().replace(' ', '.')}@example.com",
+        'contact': '9876543210', 'state': 'Goa', 'city': 'Panaji', 'pincode': '403001',
+    }
+    values.update(fields)
+    return Student.objects.create(**values)
+
+
+def make_enrollment(student=None, course=None, **fields):
+    fields.setdefault('admission_fee', Decimal('500'))
+    return StudentEnrollment.objects.create(student=student or make_student(), course=course or make_course(), **fields)
+
+
+def make_payment(enrollment, amount_paid, remarks='Course Fee', mode='cash', **fields):
+    payment = Payment(
+        enrollment=enrollment, amount=Decimal(amount_paid), amount_paid=Decimal(amount_paid),
+        payment_mode=mode, remarks=remarks, **fields,
+    )
+    payment.save()
+    return payment
+
+
+@unittest.skipUnless(connection.vendor in FULL_SCAN, 'no query plan checks for this database')
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN every list, trash and filtered report query and fail on a full table scan
+    or a sort, so a dropped index or a query that stops matching one is caught here.
+    The rollup tables behind the summaries are small by design and are not covered.
+    """
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            for statement in DISCOURAGE_SCANS.get(connection.vendor, []):
+                cursor.execute(statement)
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        found = FULL_SCAN[connection.vendor].findall(plan)
+        self.assertFalse(found, f"{found} in the plan of\n{queryset.query}\n{plan}")
+
+    def test_listings(self):
+        listings = {
+            'course_list': Course.objects.filter(is_deleted=False).order_by('-id'),
+            'course_choices': Course.objects.filter(is_deleted=False).order_by('course_name'),
+            'team_list': Team.objects.filter(is_deleted=False).order_by('id'),
+            'expense_list': Expense.objects.filter(is_deleted=False).order_by('-date'),
+            'enquiry_list': Enquiry.objects.filter(is_deleted=False).order_by('-created_at'),
+        }
+        for name, queryset in listings.items():
+            with self.subTest(name):
+                self.assertIndexed(queryset)
+
+    def test_enrollment_pages(self):
+        enrollments = StudentEnrollment.objects.filter(_enrollment_filters(QueryDict()))
+        for order in ('-', ''):
+            with self.subTest(order=order or 'asc'):
+                self.assertIndexed(enrollments.order_by(f'{order}enrollment_date', f'{order}id')[:ENROLLMENT_PAGE_SIZE])
+        pending = enrollments.filter(amount_remaining__gt=0).order_by('-amount_remaining', '-id')
+        self.assertIndexed(pending[:PENDING_DUES_PAGE_SIZE])
+
+    def test_trash(self):
+        for name, kind in TRASH_KINDS.items():
+            with self.subTest(name):
+                self.assertIndexed(kind.model.all_objects.filter(is_deleted=True).order_by('-deleted_at', '-pk')[:TRASH_PAGE_SIZE])
+
+    def test_installments_due(self):
+        today = datetime.date(2026, 3, 2)
+        self.assertIndexed(InstallmentSchedule.objects.due_between(today, today + datetime.timedelta(days=6)))
+
+    def test_dues_reminders(self):
+        self.assertIndexed(due_installments(datetime.date(2026, 3, 2), days_ahead=3))
+        self.assertIndexed(DuesReminder.objects.filter(status='pending').order_by('id')[:REMINDER_BATCH_SIZE])
+
+    def test_month_reports(self):
+        expenses, payments = _expense_summary_querysets(QueryDict('month=2026-03'))
+        self.assertIndexed(expenses.order_by('-date'))
+        self.assertIndexed(payments.order_by())
+        self.assertIndexed(Payment.objects.filter(payment_date__year=2026).order_by('payment_date'))
+
+    def test_conversion_report_range(self):
+        enquiries = Enquiry.objects.filter(
+            is_deleted=False,
+            created_at__gte=_day_start(datetime.date(2026, 1, 1)),
+            created_at__lt=_day_start(datetime.date(2026, 4, 1)),
+        )
+        self.assertIndexed(enquiries.order_by())
+
+
+class PaymentDeleteTests(TestCase):
+    """Deleting payments, however it is done, keeps the enrollment's stored figures in step."""
+
+    def setUp(self):
+        self.enrollment = make_enrollment(payment_method='installment', total_installments=3)
+        Payment.objects.post_batch([
+            Payment(enrollment=self.enrollment, amount=Decimal('500'), amount_paid=Decimal('500'),
+                    payment_mode='cash', remarks='Admission Fee'),
+            Payment(enrollment=self.enrollment, amount=Decimal('3000'), amount_paid=Decimal('2000'),
+                    payment_mode='upi', remarks='Course Fee'),
+            Payment(enrollment=self.enrollment, amount=Decimal('1000'), amount_paid=Decimal('1000'),
+                    payment_mode='cash', remarks='Course Fee'),
+        ])
+
+    def test_queryset_delete(self):
+        Payment.objects.filter(enrollment=self.enrollment, payment_mode='cash').delete()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.admission_fee_paid_total, Decimal('0.00'))
+        self.assertEqual(self.enrollment.course_fee_paid_total, Decimal('2000.00'))
+        self.assertEqual(self.enrollment.amount_remaining, Decimal('1500.00'))
+        self.assertEqual(self.enrollment.payment_status, 'partial')
+        self.assertEqual(
+            list(self.enrollment.installments.order_by('number').values_list('amount_paid', 'status')),
+            [(Decimal('1000.00'), 'paid'), (Decimal('1000.00'), 'paid'), (Decimal('0.00'), 'due')],
+        )
+
+    def test_instance_delete(self):
+        payment = Payment.objects.get(enrollment=self.enrollment, amount_paid=Decimal('2000'))
+        payment.delete()
+        self.assertEqual(payment.enrollment.course_fee_paid_total, Decimal('1000.00'))
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.amount_remaining, Decimal('2000.00'))
+
+
+class EnquiryFunnelTests(TestCase):
+    """The funnel counts an enquiry in its month in local time, not UTC."""
+
+    def test_month_boundary(self):
+        if timezone.get_current_timezone_name() != 'Asia/Kolkata':
+            self.skipTest('the boundary cases assume Asia/Kolkata')
+        course = make_course()
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, created_at in (
+                ('Late September', datetime.datetime(2026, 9, 30, 18, 20, tzinfo=datetime.timezone.utc)),
+                ('Early October', datetime.datetime(2026, 9, 30, 18, 40, tzinfo=datetime.timezone.utc)),
+            ):
+                enquiry = Enquiry.objects.create(name=name, phone='9876543210', state='Goa', city='Panaji', course=course)
+                Enquiry.objects.filter(pk=enquiry.pk).update(created_at=created_at)
+                enquiry.refresh_from_db()
+                enquiry.save()  # update() sends no signals; the save refreshes the rollup
+        september, october = (datetime.date(2026, month, 1) for month in (9, 10))
+        expected = {
+            (september, course.pk, '', 'Goa'): (1, 0, 0, 0),
+            (october, course.pk, '', 'Goa'): (1, 0, 0, 0),
+        }
+        self.assertEqual(EnquiryFunnelRollup.compute(), expected)
+        self.assertEqual(EnquiryFunnelRollup.compute(keys=[(october, course.pk, '', 'Goa')]), {
+            (october, course.pk, '', 'Goa'): (1, 0, 0, 0),
+        })
+        self.assertEqual(
+            set(EnquiryFunnelRollup.objects.values_list('month', 'enquiries')), {(september, 1), (october, 1)},
+        )
+
+
+class AutocompleteTests(TestCase):
+    """Each worker's in-process index follows the AutocompleteChange log."""
+
+    def setUp(self):
+        autocomplete._state['last_change'] = None  # rebuild on first use
+
+    def names(self, query):
+        return [record['full_name'] for record in autocomplete.autocomplete('student', query)]
+
+    def test_change_committed_out_of_order(self):
+        self.assertEqual(self.names('bina'), [])
+        # TestCase runs no on_commit callbacks, so the change rows are written by hand
+        bina = make_student('Bina Rao')
+        chitra = make_student('Chitra Rao')
+        last = autocomplete._state['last_change']
+        # The later id commits first; the worker must not skip the earlier one for good
+        AutocompleteChange.objects.create(pk=last + 2, kind='student', object_id=chitra.pk)
+        self.assertEqual(self.names('chitra'), ['Chitra Rao'])
+        self.assertEqual(self.names('bina'), [])
+        AutocompleteChange.objects.create(pk=last + 1, kind='student', object_id=bina.pk)
+        self.assertEqual(self.names('bina'), ['Bina Rao'])
+
+    def test_prefixes_and_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            asha = make_student('Asha Rao', contact='+91 98450 12345')
+            make_student('Ashok Rao', contact='9000000002')
+            course = make_course('Advanced Excel')
+        self.assertEqual(sorted(self.names('ash')), ['Asha Rao', 'Ashok Rao'])
+        self.assertEqual(self.names('rao asho'), ['Ashok Rao'])
+        self.assertEqual(self.names('98450'), ['Asha Rao'])
+        self.assertEqual(self.names(asha.student_id), ['Asha Rao'])
+        self.assertEqual(self.names('xyz'), [])
+        self.assertEqual([r['course_name'] for r in autocomplete.autocomplete('course', 'exc')], ['Advanced Excel'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asha.full_name = 'Asha Menon'
+            asha.save()
+        self.assertEqual(self.names('rao'), ['Ashok Rao'])
+        self.assertEqual(self.names('menon'), ['Asha Menon'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.filter(pk=asha.pk).soft_delete()
+            course.delete()
+        self.assertEqual(self.names('ash'), ['Ashok Rao'])
+        self.assertEqual(autocomplete.autocomplete('course', 'exc'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.all_objects.filter(pk=asha.pk).restore()
+        self.assertEqual(self.names('menon'), ['Asha Menon'])
+
+
+class StatusRecordingSmsBackend:
+    """Records the stored status of each reminder as the backend is handed it."""
+    statuses = []
+
+    def send(self, batch):
+        StatusRecordingSmsBackend.statuses.extend(
+            DuesReminder.objects.filter(pk__in=[reminder.pk for reminder in batch]).values_list('status', flat=True)
+        )
+        return {}
+
+
+@override_settings(SMS_BACKEND='apps.students.tests.StatusRecordingSmsBackend')
+class SendRemindersTests(TestCase):
+    """send_reminders() claims a batch before sending it and records the outcome after."""
+
+    def setUp(self):
+        StatusRecordingSmsBackend.statuses = []
+        self.reminder = DuesReminder.objects.create(
+            student=make_student(), channel='sms', recipient='9876543210', body='Fees due', amount=Decimal('1000'),
+        )
+
+    def test_claimed_while_sending(self):
+        self.assertEqual(reminders.send_reminders(channels=['sms']), (1, 0))
+        self.assertEqual(StatusRecordingSmsBackend.statuses, ['sending'])
+        self.reminder.refresh_from_db()
+        self.assertEqual((self.reminder.status, self.reminder.attempts), ('sent', 1))
+
+    def test_abandoned_claim(self):
+        claimed_at = timezone.now() - reminders.CLAIM_TIMEOUT / 2
+        DuesReminder.objects.filter(pk=self.reminder.pk).update(status='sending', claimed_at=claimed_at)
+        self.assertEqual(reminders.send_reminders(channels=['sms']), (0, 0))
+        DuesReminder.objects.filter(pk=self.reminder.pk).update(claimed_at=claimed_at - reminders.CLAIM_TIMEOUT)
+        self.assertEqual(reminders.send_reminders(channels=['sms']), (1, 0))
+
+
+class TrashPageTests(TestCase):
+    """The trash API pages through every trashed row, once each."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        for number in range(TRASH_PAGE_SIZE + 5):
+            make_course(f'Course {number:02}').delete()
+
+    def names(self, max_pages=5):
+        names, cursor = [], None
+        for _ in range(max_pages):
+            data = self.client.get(reverse('api_trash', args=['courses']), {'after': cursor} if cursor else {}).json()
+            names.extend(row['cells'][0] for row in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return names
+        self.fail(f'still paging after {max_pages} pages')
+
+    def test_pages(self):
+        names = self.names()
+        self.assertEqual(sorted(names), [f'Course {number:02}' for number in range(TRASH_PAGE_SIZE + 5)])
+
+    def test_rows_trashed_without_a_date(self):
+        # As trashed before deleted_at was always set; the 0016 migration dates them
+        Course.all_objects.filter(course_name__lt='Course 10').update(deleted_at=None)
+        importlib.import_module('apps.students.migrations.0016_backfill_deleted_at').backfill_deleted_at(apps, None)
+        self.assertEqual(len(self.names()), TRASH_PAGE_SIZE + 5)
+
+
+class WithFinancialsTests(TestCase):
+    """with_financials() works out the same figures as the enrollment itself, in one query."""
+
+    def test_annotations(self):
+        enrollment = make_enrollment(discount=Decimal('200'))
+        make_payment(enrollment, '500', remarks='Admission Fee')
+        make_payment(enrollment, '1000', mode='upi')
+        make_payment(enrollment, '300')
+        unpaid = make_enrollment(student=make_student('Bina Rao'), course=enrollment.course)
+        with self.assertNumQueries(1):
+            rows = {row.pk: row for row in StudentEnrollment.objects.with_financials()}
+        row = rows[enrollment.pk]
+        self.assertEqual(
+            (row.admission_paid_amount, row.course_paid_amount, row.total_paid_amount, row.payments_count),
+            (Decimal('500'), Decimal('1300'), Decimal('1800'), 3),
+        )
+        self.assertEqual(row.course_fee_net, Decimal('2800'))
+        self.assertEqual(
+            (row.admission_remaining_amount, row.course_remaining_amount, row.total_remaining_amount),
+            (Decimal('0'), Decimal('1500'), Decimal('1500')),
+        )
+        enrollment.refresh_from_db()
+        self.assertEqual(row.total_remaining_amount, enrollment.amount_remaining)
+        row = rows[unpaid.pk]
+        self.assertEqual((row.total_paid_amount, row.total_remaining_amount, row.payments_count), (0, Decimal('3500'), 0))
+
+
+class EnrollmentPageTests(TestCase):
+    """The enrollment list and the pending-dues panel page through every row once, in order."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        courses = [make_course(f'Course {number}') for number in range(3)]
+        self.count = max(ENROLLMENT_PAGE_SIZE, PENDING_DUES_PAGE_SIZE) + 10
+        for number in range(self.count):
+            # Few distinct dates and amounts, so pages split runs of equal keys
+            make_enrollment(
+                student=make_student(f'Student {number:02}'), course=courses[number % 3],
+                enrollment_date=datetime.date(2026, 1, 1 + number % 4), discount=Decimal(100 * (number % 5)),
+            )
+
+    def pages(self, url, params, rows):
+        seen, cursor = [], None
+        for _ in range(5):
+            response = self.client.get(url, {**params, 'after': cursor} if cursor else params)
+            page, cursor = rows(response)
+            seen.extend(page)
+            if not cursor:
+                return seen
+        self.fail('still paging after 5 pages')
+
+    def test_enrollment_list(self):
+        def rows(response):
+            return [(e.enrollment_date, e.pk) for e in response.context['enrollments']], response.context['next_cursor']
+
+        for order, descending in (('desc', True), ('asc', False)):
+            with self.subTest(order):
+                seen = self.pages(reverse('student_list'), {'order': order}, rows)
+                self.assertEqual(len(seen), self.count)
+                self.assertEqual(seen, sorted(seen, reverse=descending))
+        course = Course.objects.get(course_name='Course 1')
+        seen = self.pages(reverse('student_list'), {'course': course.pk}, rows)
+        self.assertEqual(len(seen), StudentEnrollment.objects.filter(course=course).count())
+
+    def test_pending_dues(self):
+        StudentEnrollment.objects.filter(discount=Decimal('400')).update(amount_remaining=0)
+
+        def rows(response):
+            data = response.json()
+            return [(Decimal(row['amount_remaining']), row['id']) for row in data['results']], data['next_cursor']
+
+        seen = self.pages(reverse('api_pending_dues'), {}, rows)
+        self.assertGreater(len(seen), PENDING_DUES_PAGE_SIZE)
+        self.assertEqual(len(seen), StudentEnrollment.objects.filter(amount_remaining__gt=0).count())
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertNotIn(Decimal('0'), [amount for amount, _ in seen])
+
+
+class IdentifierTests(TestCase):
+    """Student IDs, t_ids and certificate numbers come from the sequences, after any legacy values."""
+
+    def test_identifiers(self):
+        Student.all_objects.bulk_create([Student(
+            student_id='25019999', full_name='Old', father_name='F', gender='male', email='old@example.com',
+            dob=datetime.date(2000, 1, 1), contact='1', state='Goa', city='Panaji', pincode='403001',
+        )])
+        first, second = make_student('Asha Rao'), make_student('Bina Rao')
+        self.assertEqual((first.student_id, second.student_id), ('25020000', '25020001'))
+
+        course = make_course()
+        enrollments = [make_enrollment(student=student, course=course) for student in (first, second)]
+        self.assertEqual([e.t_id for e in enrollments], ['E0001', 'E0002'])
+        self.assertEqual([e.certificate_number for e in enrollments], ['CP-CN-001', 'CP-CN-002'])
+        self.assertEqual(reserve_certificate_numbers(3), ['CP-CN-003', 'CP-CN-004', 'CP-CN-005'])
+
+
+class PostBatchTests(TestCase):
+    """post_batch() recomputes each enrollment once, whatever the number of payments."""
+
+    def batch(self, enrollments, per_enrollment):
+        return [
+            Payment(enrollment=enrollment, amount=Decimal('200'), amount_paid=Decimal('200'),
+                    payment_mode='cash', remarks=' Course Fee ')
+            for enrollment in enrollments for _ in range(per_enrollment)
+        ]
+
+    def test_totals(self):
+        course = make_course()
+        first, second = make_enrollment(course=course), make_enrollment(make_student('Bina Rao'), course)
+        payments = self.batch([first, second], 2) + [Payment(
+            enrollment=second, amount=Decimal('500'), amount_paid=Decimal('500'), payment_mode='upi', remarks='Admission Fee',
+        )]
+        Payment.objects.post_batch(payments)
+        self.assertEqual(payments[0].remarks, 'Course Fee')
+        self.assertEqual(payments[-1].enrollment.admission_fee_paid_total, Decimal('500'))
+        for enrollment, course_paid, remaining in ((first, '400.00', '3100.00'), (second, '400.00', '2600.00')):
+            enrollment.refresh_from_db()
+            self.assertEqual(enrollment.course_fee_paid_total, Decimal(course_paid))
+            self.assertEqual(enrollment.amount_remaining, Decimal(remaining))
+        self.assertEqual(MonthlyPaymentRollup.objects.as_totals(), MonthlyPaymentRollup.compute())
+
+    def test_queries_independent_of_size(self):
+        course = make_course()
+        enrollments = [make_enrollment(make_student(f'Student {n}'), course) for n in range(3)]
+        counts = []
+        # The first batch also inserts the month's rollup row
+        for per_enrollment in (1, 1, 5):
+            with CaptureQueriesContext(connection) as queries:
+                Payment.objects.post_batch(self.batch(enrollments, per_enrollment))
+            counts.append(len(queries))
+        self.assertEqual(counts[1], counts[2])
+
+
+class PaymentImportTests(TestCase):
+    """import_payments() matches rows by t_id, student_id or contact and posts them in chunks."""
+
+    def setUp(self):
+        course = make_course()
+        self.by_t_id = make_enrollment(make_student('Asha Rao', contact='9800000001'), course)
+        self.by_student = make_enrollment(make_student('Bina Rao', contact='9800000002'), course)
+        self.by_contact = make_enrollment(make_student('Charu Rao', contact='9800000003'), course)
+        self.csv = '\n'.join([
+            'Txn Date,Narration,Credit,Type',
+            f'02/03/2026,FEES {self.by_t_id.t_id},"1,000.00",Course Fee',
+            f'03/03/2026,NEFT {self.by_student.student_id} BINA,800,',
+            '04-03-2026,UPI/+91 98000 00003 wrong format,100,',
+            '04-03-2026,UPI/9800000003/CHARU,300,Admission Fee',
+            '05-03-2026,FEES E9999,100,',
+            'someday,FEES 9800000003,100,',
+            f'06-03-2026,FEES {self.by_t_id.t_id},5000,Course Fee',
+            ',,,',
+        ])
+
+    def run_import(self, **options):
+        return import_payments(io.StringIO(self.csv), chunk_size=2, **options)
+
+    def test_import(self):
+        report = self.run_import()
+        self.assertEqual(report.rows_read, 7)
+        self.assertEqual((report.payments_posted, report.amount_posted), (4, Decimal('2100.00')))
+        self.assertEqual([(number, reason) for number, _, reason in report.rejected], [
+            (4, 'no t_id, student_id or contact found'),
+            (6, 'no enrollment with t_id E9999'),
+            (7, 'unrecognised date'),
+            (8, 'amount exceeds due course fee of ₹2000.00'),
+        ])
+
+        self.by_t_id.refresh_from_db()
+        self.assertEqual((self.by_t_id.admission_fee_paid_total, self.by_t_id.course_fee_paid_total), (0, 1000))
+        # No payment type: the admission fee is settled first
+        self.assertEqual(
+            list(self.by_student.payments.order_by('remarks').values_list('remarks', 'amount_paid', 'payment_date')),
+            [('Admission Fee', Decimal('500.00'), datetime.date(2026, 3, 3)),
+             ('Course Fee', Decimal('300.00'), datetime.date(2026, 3, 3))],
+        )
+        self.by_contact.refresh_from_db()
+        self.assertEqual(self.by_contact.admission_fee_paid_total, Decimal('300.00'))
+        self.assertEqual(MonthlyPaymentRollup.objects.as_totals(), MonthlyPaymentRollup.compute())
+
+        output = io.StringIO()
+        report.write_csv(output)
+        self.assertEqual(output.getvalue().splitlines()[0], 'row,reason,Txn Date,Narration,Credit,Type')
+
+    def test_dry_run(self):
+        report = self.run_import(dry_run=True)
+        self.assertEqual(report.payments_posted, 4)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_ambiguous_contact(self):
+        make_enrollment(self.by_contact.student, make_course('Python'))
+        report = self.run_import()
+        self.assertIn((5, 'contact 9800000003 matches 2 enrollments with dues'),
+                      [(number, reason) for number, _, reason in report.rejected])
+
+
+class StudentImportTests(TestCase):
+    """import_students() creates students, enrollments and initial payments for the valid rows."""
+
+    HEADER = 'Name,Father,Gender,Email,DOB,Phone,State,City,Pincode,Course,Paid,Referred By'
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Setting.objects.create(admission_fee=Decimal('500'))  # the default for rows without one
+        self.addCleanup(invalidate_settings_cache)
+        make_course()
+        self.referrer = make_student('Asha Rao', email='asha@example.com')
+
+    def run_import(self, *rows, **options):
+        return import_students(io.StringIO('\n'.join([self.HEADER, *rows])), chunk_size=2, **options)
+
+    def row(self, name, email, course='Tally', paid='', referred_by=''):
+        return f'{name},Ravi,male,{email},2004-01-31,9800000001,Goa,Panaji,403001,{course},{paid},{referred_by}'
+
+    def test_import(self):
+        report = self.run_import(
+            self.row('Bina', 'bina@example.com', paid='1500', referred_by=self.referrer.student_id),
+            self.row('Esha', 'bina@example.com'),
+            self.row('Charu', 'charu@example.com', course='tally'),
+            self.row('Dev', 'ASHA@example.com'),
+            self.row('Farid', 'farid@example.com', course='Python'),
+            'Gita,,female,gita@example.com,2004-01-31,9800000001,Goa,Panaji,403001,Tally,,',
+        )
+        self.assertEqual(report.rows_read, 6)
+        self.assertEqual((report.students_created, report.payments_posted, report.amount_posted), (2, 2, Decimal('1500.00')))
+        self.assertEqual([(number, reason) for number, _, reason in report.rejected], [
+            (3, 'email: Appears more than once in this file.'),
+            (5, 'email: A student with this email already exists.'),
+            (6, "course: 'Python' is not an active course."),
+            (7, 'father_name: This field is required.'),
+        ])
+
+        bina = Student.objects.get(email='bina@example.com')
+        self.assertEqual(bina.referred_by, self.referrer)
+        enrollment = bina.enrollments.get()
+        self.assertEqual((enrollment.admission_fee_paid_total, enrollment.course_fee_paid_total), (500, 1000))
+        self.assertEqual(sorted(StudentEnrollment.objects.values_list('t_id', flat=True)), ['E0001', 'E0002'])
+        self.assertEqual(MonthlyPaymentRollup.objects.as_totals(), MonthlyPaymentRollup.compute())
+
+    def test_dry_run(self):
+        report = self.run_import(self.row('Bina', 'bina@example.com', paid='1500'))
+        self.assertEqual((report.students_created, report.amount_posted), (1, Decimal('1500')))
+        self.assertEqual(Student.objects.count(), 2)
+        report = self.run_import(self.row('Charu', 'charu@example.com', paid='1500'), dry_run=True)
+        self.assertEqual((report.students_created, report.amount_posted), (1, Decimal('1500')))
+        self.assertEqual(Student.objects.count(), 2)
+
+    def test_missing_columns(self):
+        with self.assertRaisesMessage(ValueError, 'missing the columns: pincode'):
+            import_students(io.StringIO(self.HEADER.replace(',Pincode', '')))
+
+
+class ExportTests(TestCase):
+    """The exports stream every matching row, as CSV or as an XLSX workbook."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        course = make_course()
+        self.first = make_enrollment(make_student('Asha Rao'), course, enrollment_date=datetime.date(2026, 1, 5))
+        self.second = make_enrollment(make_student('Bina, "B" Rao'), course, enrollment_date=datetime.date(2026, 2, 5))
+        make_enrollment(make_student('Charu Rao'), course).delete()
+        make_payment(self.first, '500', remarks='Admission Fee', payment_date=datetime.date(2026, 3, 2))
+        make_payment(self.second, '1200', payment_date=datetime.date(2026, 4, 2))
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def sheet_rows(self, content):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        return [
+            [''.join(cell.itertext()) for cell in row.iter(f'{namespace}c')]
+            for row in sheet.iter(f'{namespace}row')
+        ]
+
+    def test_enrollments_csv(self):
+        response, content = self.get('enrollment_export')
+        self.assertIn('.csv"', response['Content-Disposition'])
+        text = content.decode('utf-8')
+        self.assertTrue(text.startswith('﻿Enrollment ID,Student ID,Full Name,'))
+        rows = list(csv.reader(io.StringIO(text.lstrip('﻿'))))
+        self.assertEqual([row[:3] for row in rows[1:]], [
+            [self.first.t_id, self.first.student_id, 'Asha Rao'],
+            [self.second.t_id, self.second.student_id, 'Bina, "B" Rao'],
+        ])
+
+    def test_payments_xlsx(self):
+        response, content = self.get('payment_export', format='xlsx', month='2026-04')
+        self.assertIn('.xlsx"', response['Content-Disposition'])
+        rows = self.sheet_rows(content)
+        self.assertEqual(rows[0][:3], ['Payment Date', 'Enrollment ID', 'Student ID'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][:2], ['2026-04-02', self.second.t_id])
+        self.assertEqual(Decimal(rows[1][7]), Decimal('1200'))
+
+    def test_expenses_xlsx(self):
+        team = Team.objects.create(
+            name='Ravi', designation='Trainer', phone='9876543210', email='ravi@example.com',
+            city='Panaji', state='Goa', pincode='403001',
+        )
+        Expense.objects.create(expense_name='Printer <ink> & paper', expense_by=team, amount=Decimal('250'), remarks='bell\x07')
+        _, content = self.get('expense_export', format='xlsx')
+        self.assertEqual(self.sheet_rows(content)[1][1:], ['Printer <ink> & paper', 'Ravi', '250.00', 'bell'])
+
+
+class FinanceRollupTests(TestCase):
+    """Every way a payment or its enrollment changes keeps MonthlyPaymentRollup equal to a rebuild."""
+
+    def setUp(self):
+        self.tally = make_course()
+        self.enrollment = make_enrollment(course=self.tally, payment_method='one_time')
+        self.other = make_enrollment(make_student('Bina Rao'), make_course('Python'), payment_method='installment')
+        self.payment = make_payment(self.enrollment, '1000', payment_date=datetime.date(2026, 3, 2))
+
+    def assertInSync(self):
+        call_command('rebuild_finance_rollups', check=True, stdout=io.StringIO())
+
+    def totals(self):
+        return MonthlyPaymentRollup.objects.as_totals()
+
+    def test_payment_changes(self):
+        march, april = datetime.date(2026, 3, 1), datetime.date(2026, 4, 1)
+        self.assertEqual(self.totals(), {(march, self.tally.pk, 'cash', 'one_time'): (Decimal('1000.00'), 1)})
+
+        self.payment.amount_paid = Decimal('800')
+        self.payment.payment_mode = 'upi'
+        self.payment.payment_date = datetime.date(2026, 4, 9)
+        self.payment.save()
+        self.assertEqual(self.totals(), {(april, self.tally.pk, 'upi', 'one_time'): (Decimal('800.00'), 1)})
+        self.assertInSync()
+
+        self.payment.enrollment = self.other
+        self.payment.save()
+        self.assertInSync()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.course_fee_paid_total, Decimal('0.00'))
+
+        self.payment.delete()
+        self.assertEqual(self.totals(), {})
+        self.assertInSync()
+
+    def test_enrollment_changes(self):
+        make_payment(self.enrollment, '500', remarks='Admission Fee', payment_date=datetime.date(2026, 3, 2))
+        self.enrollment.course = self.other.course
+        self.enrollment.payment_method = 'installment'
+        self.enrollment.total_installments = 2
+        self.enrollment.save()
+        self.assertEqual(self.totals(), {
+            (datetime.date(2026, 3, 1), self.other.course_id, 'cash', 'installment'): (Decimal('1500.00'), 2),
+        })
+        self.assertInSync()
+
+        self.enrollment.delete()
+        self.assertEqual(self.totals(), {})
+        self.assertInSync()
+        StudentEnrollment.all_objects.filter(pk=self.enrollment.pk).restore()
+        self.assertInSync()
+        StudentEnrollment.objects.filter(pk=self.enrollment.pk).soft_delete()
+        self.assertInSync()
+
+    def test_check_and_rebuild(self):
+        MonthlyPaymentRollup.objects.update(total_amount=Decimal('1.00'))
+        with self.assertRaisesMessage(CommandError, '1 rollup rows are out of sync.'):
+            self.assertInSync()
+        call_command('rebuild_finance_rollups', stdout=io.StringIO())
+        self.assertInSync()
+
+
+class AnalyticsTests(TestCase):
+    """The dashboard datasets are served from the cache until a finance write is committed."""
+
+    def setUp(self):
+        analytics.invalidate_analytics()
+        self.addCleanup(analytics.invalidate_analytics)
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        self.enrollment = make_enrollment(due_date=timezone.localdate() - datetime.timedelta(days=45))
+
+    def collected(self):
+        data = self.client.get(reverse('api_analytics', args=['collections'])).json()
+        return {series['name']: series['data'][-1] for series in data['series']}
+
+    def test_cache_and_invalidation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_payment(self.enrollment, '1000')
+        self.assertEqual(self.collected()['Cash'], 1000.0)
+
+        # Not committed: the cached figures stand
+        make_payment(self.enrollment, '500', mode='upi')
+        self.assertEqual(self.collected()['UPI'], 0.0)
+        with self.assertNumQueries(0):
+            analytics.get_analytics('collections')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.post_batch([Payment(enrollment=self.enrollment, amount=Decimal('200'),
+                                                amount_paid=Decimal('200'), payment_mode='upi', remarks='Course Fee')])
+        self.assertEqual(self.collected()['UPI'], 700.0)
+
+    def test_datasets(self):
+        make_payment(self.enrollment, '1000')
+        ageing = analytics.dues_ageing()
+        self.assertEqual(ageing['counts'], [0, 0, 1, 0, 0])
+        self.assertEqual(ageing['series'][0]['data'][2], 2500.0)
+        self.assertEqual(analytics.income_vs_expenses()['series'][2]['data'][-1], 1000.0)
+        per_course = analytics.enrollments_per_course()
+        self.assertEqual(per_course['labels'], ['Tally'])
+
+        response = self.client.get(reverse('api_analytics', args=['dues-ageing']))
+        self.assertEqual(response.json()['counts'], [0, 0, 1, 0, 0])
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('api_analytics', args=['unknown'])).status_code, 404)
+
+
+class DocumentCacheTests(TestCase):
+    """Receipts are cached under a key of everything they show, and dropped when a payment changes."""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(PDF_CACHE_DIR=cache_dir.name))
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        self.enrollment = make_enrollment()
+        self.payment = make_payment(self.enrollment, '1000')
+
+    def receipt_key(self, payment):
+        return documents.document_key('students/payment_receipt_pdf.html', [payment, payment.enrollment])
+
+    def cached_files(self, kind, owner_id):
+        return list((documents.pdf_cache_dir() / kind / str(owner_id)).glob('*.pdf'))
+
+    def test_key(self):
+        payment = Payment.objects.get(pk=self.payment.pk)
+        key = self.receipt_key(payment)
+        self.assertEqual(self.receipt_key(Payment.objects.get(pk=self.payment.pk)), key)
+        self.assertNotEqual(documents.document_key('students/payment_receipt_pdf.html', [payment]), key)
+        payment.amount_paid = Decimal('900.00')
+        self.assertNotEqual(self.receipt_key(payment), key)
+        student = payment.enrollment.student
+        before = documents.document_key('students/receipt_pdf.html', [student])
+        student.full_name = 'Asha R.'
+        self.assertNotEqual(documents.document_key('students/receipt_pdf.html', [student]), before)
+
+    def test_store_and_invalidate(self):
+        for owner_id, kind in ((self.payment.pk, documents.PAYMENT_RECEIPT), (self.enrollment.pk, documents.ENROLLMENT_RECEIPT)):
+            _, path = documents.cached_document('students/payment_receipt_pdf.html', [owner_id], kind, owner_id)
+            documents.store_document(path, b'%PDF-old')
+            _, path = documents.cached_document('students/payment_receipt_pdf.html', [owner_id, 1], kind, owner_id)
+            documents.store_document(path, b'%PDF-new')
+            self.assertEqual(self.cached_files(kind, owner_id), [path])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.save()
+        self.assertEqual(self.cached_files(documents.PAYMENT_RECEIPT, self.payment.pk), [])
+        self.assertEqual(self.cached_files(documents.ENROLLMENT_RECEIPT, self.enrollment.pk), [])
+
+    @unittest.skipIf(documents.weasyprint, 'WeasyPrint is installed')
+    def test_html_fallback(self):
+        response = self.client.get(reverse('download_payment_receipt', args=[self.payment.pk]))
+        self.assertEqual(response['Content-Type'], 'text/html')
+        self.assertEqual(self.cached_files(documents.PAYMENT_RECEIPT, self.payment.pk), [])
+
+    @unittest.skipUnless(documents.weasyprint, 'WeasyPrint is not installed')
+    def test_pdf_cached(self):
+        url = reverse('download_payment_receipt', args=[self.payment.pk])
+        first, second = self.client.get(url), self.client.get(url)
+        self.assertEqual(first['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(first.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(len(self.cached_files(documents.PAYMENT_RECEIPT, self.payment.pk)), 1)
+
+
+class CertificateBatchTests(TestCase):
+    """A batch is completed in one go and its certificates come back as one ZIP."""
+
+    def setUp(self):
+        self.course = make_course()
+        ten = datetime.time(10, 0)
+        self.batch = [
+            make_enrollment(make_student('Bina Rao'), self.course, batch_time=ten),
+            make_enrollment(make_student('Asha Rao'), self.course, batch_time=ten, status='completed'),
+        ]
+        make_enrollment(make_student('Charu Rao'), self.course, batch_time=ten, status='deactive')
+        make_enrollment(make_student('Dev Rao'), self.course, batch_time=datetime.time(12, 0))
+        make_enrollment(make_student('Esha Rao'), self.course, batch_time=ten).delete()
+        StudentEnrollment.objects.filter(pk=self.batch[0].pk).update(certificate_number='')
+        self.extension = 'pdf' if documents.weasyprint else 'html'
+
+    def test_complete(self):
+        selected = certificates.batch_enrollments(self.course, datetime.time(10, 0))
+        self.assertEqual(set(selected), set(self.batch))
+        self.assertEqual(set(certificates.batch_enrollments(enrollment_ids=[self.batch[0].t_id, str(self.batch[1].pk)])), set(self.batch))
+
+        enrollments = certificates.complete_enrollments(selected)
+        self.assertEqual([e.student.full_name for e in enrollments], ['Asha Rao', 'Bina Rao'])
+        numbers = dict(StudentEnrollment.objects.filter(pk__in=[e.pk for e in self.batch]).values_list('pk', 'certificate_number'))
+        self.assertEqual(numbers, {self.batch[0].pk: 'CP-CN-006', self.batch[1].pk: self.batch[1].certificate_number})
+        self.assertEqual(set(StudentEnrollment.objects.filter(pk__in=numbers).values_list('status', flat=True)), {'completed'})
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = f'{directory}/batch.zip'
+            call_command('generate_certificates', output, course='tally', batch_time='10:00', workers=1, stdout=io.StringIO())
+            with zipfile.ZipFile(output) as archive:
+                names = archive.namelist()
+        self.assertEqual(sorted(names), [f'CP-CN-002-asha-rao.{self.extension}', f'CP-CN-006-bina-rao.{self.extension}'])
+
+        with self.assertRaisesMessage(CommandError, "No active course 'Python'."):
+            call_command('generate_certificates', 'unused.zip', course='Python')
+        with self.assertRaisesMessage(CommandError, 'No enrollments match that batch.'):
+            call_command('generate_certificates', 'unused.zip', course='tally', batch_time='08:00')
+
+    def test_view(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        response = self.client.post(reverse('certificate_batch'), {'enrollment_ids': f'{self.batch[0].t_id}, {self.batch[1].t_id}'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(len(archive.namelist()), 2)
+
+
+class StudentSearchTests(TestCase):
+    """search_students() ranks exact name words over prefixes over fuzzy matches."""
+
+    def setUp(self):
+        self.ravindra = make_student('Ravindra Kumar', contact='+91 98450 12345')
+        self.ravi = make_student('Ravi Shankar', email='shankar.r@example.com', contact='9000000002')
+        self.sita = make_student('Sïta Ravichandran', contact='9000000003')
+
+    def names(self, query):
+        return [student.full_name for student in search_students(query)]
+
+    def test_ranking(self):
+        self.assertEqual(self.names('ravi'), ['Ravi Shankar', 'Ravindra Kumar', 'Sïta Ravichandran'])
+        self.assertEqual(self.names('raveendra'), ['Ravindra Kumar'])
+        self.assertEqual(self.names('sita'), ['Sïta Ravichandran'])
+        self.assertEqual(self.names('ravi kum')[0], 'Ravindra Kumar')
+        self.assertEqual(sorted(self.names('ra')), ['Ravi Shankar', 'Ravindra Kumar', 'Sïta Ravichandran'])
+        self.assertEqual(self.names(''), [])
+
+    def test_identifiers(self):
+        self.assertEqual(self.names('9845012345'), ['Ravindra Kumar'])
+        self.assertEqual(self.names('+919845012345'), ['Ravindra Kumar'])
+        self.assertEqual(self.names('98450'), ['Ravindra Kumar'])
+        self.assertEqual(self.names(self.sita.student_id), ['Sïta Ravichandran'])
+        self.assertEqual(self.names('Shankar.R@'), ['Ravi Shankar'])
+
+    def test_index_updates(self):
+        self.ravi.full_name = 'Ravi Menon'
+        self.ravi.save(update_fields=['full_name'])
+        self.assertEqual(self.names('menon'), ['Ravi Menon'])
+        self.assertEqual(self.names('shankar'), ['Ravi Menon'])  # still in the email
+        self.ravi.delete()
+        self.assertEqual(self.names('menon'), [])
+
+        StudentSearchTerm.objects.all().delete()
+        self.assertEqual(self.names('ravi'), [])
+        call_command('rebuild_student_search', stdout=io.StringIO())
+        self.assertEqual(self.names('ravi'), ['Ravindra Kumar', 'Sïta Ravichandran'])
+
+
+class ReferralTests(TestCase):
+    """The referral closure table answers subtree questions and follows every change of referrer."""
+
+    def setUp(self):
+        self.asha = make_student('Asha Rao')
+        self.bina = make_student('Bina Rao', referred_by=self.asha)
+        self.charu = make_student('Charu Rao', referred_by=self.bina)
+        self.dev = make_student('Dev Rao', referred_by=self.asha)
+
+    def assertInSync(self):
+        call_command('rebuild_referrals', check=True, stdout=io.StringIO())
+
+    def referred(self, student, **options):
+        return [(s.full_name, s.referral_depth) for s in referred_students(student.pk, **options)]
+
+    def test_stats(self):
+        self.assertInSync()
+        make_payment(make_enrollment(self.charu), '1500')
+        make_payment(make_enrollment(self.dev, Course.objects.get()), '1000')
+        stats = referral_stats([self.asha.pk, self.bina.pk, self.charu.pk])
+        self.assertEqual(stats[self.asha.pk], {
+            'direct': 2, 'indirect': 1, 'network': 3, 'direct_revenue': Decimal('1000'), 'revenue': Decimal('2500'),
+        })
+        self.assertEqual(stats[self.charu.pk]['network'], 0)
+        self.assertEqual(self.referred(self.asha), [('Bina Rao', 1), ('Dev Rao', 1), ('Charu Rao', 2)])
+        self.assertEqual(self.referred(self.asha, max_depth=1), [('Bina Rao', 1), ('Dev Rao', 1)])
+        self.assertEqual([(s.full_name, row['network']) for s, row in top_referrers(order='network')],
+                         [('Asha Rao', 3), ('Bina Rao', 1)])
+
+        self.dev.delete()  # trashed students are not counted
+        self.assertEqual(referral_stats([self.asha.pk])[self.asha.pk]['direct'], 1)
+
+    def test_changes(self):
+        self.charu.referred_by = self.dev
+        self.charu.save()
+        self.assertEqual(self.referred(self.dev), [('Charu Rao', 1)])
+        self.assertEqual(self.referred(self.bina), [])
+        self.assertInSync()
+
+        self.asha.referred_by = self.charu
+        with self.assertRaises(ReferralCycleError):
+            self.asha.save()
+
+        self.bina.referred_by = None
+        self.bina.save()
+        self.dev.hard_delete()
+        self.charu.refresh_from_db()
+        self.assertIsNone(self.charu.referred_by)
+        self.assertEqual(self.referred(self.asha), [])
+        self.assertInSync()
+
+    def test_resolve_referrers(self):
+        make_student('Esha Rao', referred_by_name=f'my friend {self.dev.email}')
+        make_student('Farid Khan', referred_by_name='  bina   RAO ')
+        make_student('Gita Rao', referred_by_name='someone')
+        out = io.StringIO()
+        call_command('resolve_referrers', stdout=out)
+        self.assertIn('Linked 2 of 2 matched students', out.getvalue())
+        self.assertEqual(
+            dict(Student.objects.filter(referred_by__isnull=False, referred_by_name__gt='').values_list('full_name', 'referred_by__full_name')),
+            {'Esha Rao': 'Dev Rao', 'Farid Khan': 'Bina Rao'},
+        )
+        self.assertEqual(self.referred(self.bina), [('Charu Rao', 1), ('Farid Khan', 1)])
+        self.assertInSync()
+
+    def test_check_and_rebuild(self):
+        ReferralPath.objects.filter(depth=2).delete()
+        with self.assertRaisesMessage(CommandError, '1 referral paths are out of sync.'):
+            self.assertInSync()
+        call_command('rebuild_referrals', stdout=io.StringIO())
+        self.assertInSync()
+
+
+class SoftDeleteTests(TestCase):
+    """Trash and restore cascade set-wise, and the stored totals and rollups follow."""
+
+    def setUp(self):
+        self.course = make_course()
+        self.student = make_student()
+        self.kept = make_enrollment(self.student, self.course)
+        self.trashed_alone = make_enrollment(self.student, make_course('Python'))
+        make_payment(self.kept, '1000')
+        make_payment(self.trashed_alone, '700')
+        self.trashed_alone.delete()
+        StudentEnrollment.all_objects.filter(pk=self.trashed_alone.pk).update(
+            deleted_at=timezone.now() - datetime.timedelta(days=1),
+        )
+
+    def assertInSync(self):
+        for command in ('rebuild_finance_rollups', 'rebuild_enrollment_totals', 'rebuild_enquiry_funnel'):
+            call_command(command, check=True, stdout=io.StringIO())
+
+    def live(self):
+        return set(StudentEnrollment.objects.values_list('pk', flat=True))
+
+    def collected(self):
+        return sum(amount for amount, _ in MonthlyPaymentRollup.objects.as_totals().values())
+
+    def test_student_cascade(self):
+        self.assertEqual((self.live(), self.collected()), ({self.kept.pk}, Decimal('1000')))
+        self.assertEqual(Student.objects.filter(pk=self.student.pk).soft_delete(), 1)
+        self.assertEqual(Student.objects.filter(pk=self.student.pk).soft_delete(), 0)
+        self.assertEqual((self.live(), self.collected()), (set(), 0))
+        self.assertTrue(StudentEnrollment.all_objects.get(pk=self.kept.pk).is_deleted)
+        self.assertInSync()
+
+        # Only what went into the trash with the student comes back with it
+        self.assertEqual(Student.all_objects.filter(pk=self.student.pk).restore(), 1)
+        self.assertEqual((self.live(), self.collected()), ({self.kept.pk}, Decimal('1000')))
+        self.assertIsNone(StudentEnrollment.all_objects.get(pk=self.kept.pk).deleted_at)
+        self.assertInSync()
+
+        self.student.delete()
+        self.assertEqual(self.live(), set())
+        self.student.restore()
+        self.assertEqual(self.live(), {self.kept.pk})
+        self.assertInSync()
+
+    def test_two_trashed_parents(self):
+        for first, second in ((self.course, self.student), (self.student, self.course)):
+            with self.subTest(first=first._meta.model_name):
+                first.delete()
+                second.delete()
+                for parent in (first, second):
+                    parent.restore()
+                    # Held in the trash until the other parent is restored too
+                    self.assertEqual(self.live(), {self.kept.pk} if parent is second else set())
+                second.delete()
+                first.delete()
+                for parent in (first, second):
+                    parent.restore()
+                    self.assertEqual(self.live(), {self.kept.pk} if parent is second else set())
+                self.assertInSync()
+
+    def test_enrollment_restore(self):
+        StudentEnrollment.all_objects.filter(pk=self.trashed_alone.pk).restore()
+        self.assertEqual(self.collected(), Decimal('1700'))
+        self.trashed_alone.refresh_from_db()
+        self.assertEqual(self.trashed_alone.course_fee_paid_total, Decimal('700'))
+        self.assertInSync()
+
+
+class PurgeTrashTests(TestCase):
+    """purge_trash deletes what has been in the trash past the retention period, and nothing a live row needs."""
+
+    def setUp(self):
+        self.old = timezone.now() - datetime.timedelta(days=100)
+        self.held_course = make_course('Python')
+        live = make_enrollment(make_student('Asha Rao'), self.held_course)
+        self.held_course.delete()
+        StudentEnrollment.all_objects.filter(pk=live.pk).restore()
+
+        self.gone_course = make_course('Tally')
+        self.gone_enrollment = make_enrollment(make_student('Bina Rao'), self.gone_course)
+        make_payment(self.gone_enrollment, '1000')
+        self.gone_course.delete()
+        self.recent_course = make_course('Excel')
+        self.recent_course.delete()
+        Course.all_objects.exclude(pk=self.recent_course.pk).update(deleted_at=self.old)
+        StudentEnrollment.all_objects.filter(pk=self.gone_enrollment.pk).update(deleted_at=self.old)
+
+    def purge(self, **options):
+        out = io.StringIO()
+        call_command('purge_trash', stdout=out, **options)
+        return out.getvalue()
+
+    def test_purge(self):
+        self.assertIn('2 records trashed before', self.purge(dry_run=True))
+        self.assertEqual(Course.all_objects.count(), 3)
+
+        output = self.purge(chunk_size=1)
+        self.assertIn('enrollments: 1\n', output)
+        self.assertIn('courses: 1\n', output)
+        self.assertEqual(set(Course.all_objects.values_list('course_name', flat=True)), {'Python', 'Excel'})
+        self.assertFalse(Payment.objects.filter(enrollment=self.gone_enrollment.pk).exists())
+        call_command('rebuild_finance_rollups', check=True, stdout=io.StringIO())
+        self.assertIn('0 records trashed before', self.purge(days=1))
+
+    def test_unlimited_retention(self):
+        Setting.objects.create(trash_retention_days=0)
+        self.addCleanup(invalidate_settings_cache)
+        invalidate_settings_cache()
+        self.assertIn('nothing to purge', self.purge())
+        self.assertEqual(Course.all_objects.count(), 3)
+
+
+class InstallmentTests(TestCase):
+    """Installment schedules follow the enrollment's plan and payments."""
+
+    def setUp(self):
+        self.enrollment = make_enrollment(
+            payment_method='installment', total_installments=3, due_date=datetime.date(2026, 1, 31),
+        )
+
+    def schedule(self):
+        return list(self.enrollment.installments.order_by('number').values_list('due_date', 'amount', 'amount_paid', 'status'))
+
+    def assertInSync(self):
+        call_command('rebuild_installments', check=True, stdout=io.StringIO())
+
+    def test_plan(self):
+        start = datetime.date(2026, 1, 31)
+        self.assertEqual(installment_plan(Decimal('1000'), Decimal('400'), 'installment', 3, 6, start), [
+            (1, start, Decimal('333.33'), Decimal('333.33'), 'paid'),
+            (2, datetime.date(2026, 2, 28), Decimal('333.33'), Decimal('66.67'), 'partial'),
+            (3, datetime.date(2026, 3, 31), Decimal('333.34'), Decimal('0'), 'due'),
+        ])
+        self.assertEqual(len(installment_plan(Decimal('1000'), 0, 'monthly', None, 6, start)), 6)
+        self.assertEqual(installment_plan(Decimal('1000'), 0, 'one_time', 3, 6, start), [(1, start, Decimal('1000'), 0, 'due')])
+
+    def test_schedule_follows_changes(self):
+        self.assertEqual([row[1] for row in self.schedule()], [Decimal('1000.00')] * 3)
+        make_payment(self.enrollment, '1500')
+        self.assertEqual([row[3] for row in self.schedule()], ['paid', 'partial', 'due'])
+        self.assertInSync()
+
+        self.enrollment.refresh_from_db()
+        self.enrollment.discount = Decimal('600')
+        self.enrollment.save()
+        self.assertEqual([row[1:] for row in self.schedule()], [
+            (Decimal('800.00'), Decimal('800.00'), 'paid'),
+            (Decimal('800.00'), Decimal('700.00'), 'partial'),
+            (Decimal('800.00'), Decimal('0.00'), 'due'),
+        ])
+
+        self.enrollment.payment_method = 'one_time'
+        self.enrollment.save()
+        self.assertEqual(self.schedule(), [(datetime.date(2026, 1, 31), Decimal('2400.00'), Decimal('1500.00'), 'partial')])
+        self.assertInSync()
+
+    def test_due_between(self):
+        other = make_enrollment(make_student('Bina Rao'), Course.objects.get(), payment_method='installment',
+                                total_installments=3, due_date=datetime.date(2026, 2, 10))
+        due = InstallmentSchedule.objects.due_between(datetime.date(2026, 2, 1), datetime.date(2026, 2, 28))
+        self.assertEqual([(row.enrollment_id, row.number) for row in due], [(other.pk, 1), (self.enrollment.pk, 2)])
+        other.delete()
+        self.assertEqual(InstallmentSchedule.objects.due_between(datetime.date(2026, 2, 1), datetime.date(2026, 2, 28)).count(), 1)
+
+    def test_check_and_rebuild(self):
+        self.enrollment.installments.filter(number=3).delete()
+        with self.assertRaisesMessage(CommandError, '1 of 1 enrollments have out-of-sync installment schedules.'):
+            self.assertInSync()
+        call_command('rebuild_installments', stdout=io.StringIO())
+        self.assertInSync()
+        self.assertEqual(len(self.schedule()), 3)
+
+
+class FailingSmsBackend:
+    """Fails every SMS, as a gateway that is down would."""
+
+    def send(self, batch):
+        return {reminder.pk: 'gateway down' for reminder in batch}
+
+
+@override_settings(SMS_BACKEND='apps.students.reminders.LocmemSmsBackend')
+class DuesReminderTests(TestCase):
+    """Reminders are queued per student and channel, spaced out, and sent in batches."""
+
+    def setUp(self):
+        reminders.sms_outbox.clear()
+        self.today = timezone.localdate()
+        self.asha = make_student('Asha Rao')
+        course = make_course()
+        # Installments due 20 days ago (overdue), about 10 days ahead and about 40 days ahead
+        make_enrollment(self.asha, course, payment_method='installment', total_installments=3,
+                        due_date=self.today - datetime.timedelta(days=20))
+        self.bina = make_student('Bina Rao', contact='9000000002')
+        make_enrollment(self.bina, course, payment_method='one_time', due_date=self.today + datetime.timedelta(days=5))
+        paid = make_enrollment(make_student('Chitra Rao'), course, payment_method='one_time', due_date=self.today)
+        make_payment(paid, '3000')
+        trashed = make_student('Dev Rao')
+        make_enrollment(trashed, course, payment_method='one_time', due_date=self.today)
+        Student.objects.filter(pk=trashed.pk).soft_delete()
+
+    def queue(self, **options):
+        options = {'days_ahead': 15, 'interval': 7, 'channels': ['email', 'sms'], **options}
+        return reminders.queue_reminders(**options)
+
+    def test_queue_per_student_and_channel(self):
+        self.assertEqual(self.queue(dry_run=True), {'email': 2, 'sms': 2})
+        self.assertFalse(DuesReminder.objects.exists())
+
+        self.assertEqual(self.queue(), {'email': 2, 'sms': 2})
+        queued = {(row.student_id, row.channel): row for row in DuesReminder.objects.all()}
+        self.assertEqual(sorted(queued), sorted(
+            (student.pk, channel) for student in (self.asha, self.bina) for channel in ('email', 'sms')
+        ))
+        email = queued[self.asha.pk, 'email']
+        self.assertEqual((email.recipient, email.subject, email.amount), ('asha.rao@example.com', 'Overdue fee reminder', Decimal('2000.00')))
+        self.assertEqual(email.body.count('Tally, installment'), 2)
+        self.assertIn('(overdue)', email.body)
+        sms = queued[self.bina.pk, 'sms']
+        self.assertEqual((sms.recipient, sms.subject, sms.amount), ('9000000002', '', Decimal('3000.00')))
+        self.assertIn('Rs.3000.00 are due on', sms.body)
+        self.assertEqual(queued[self.bina.pk, 'email'].subject, 'Fee reminder')
+
+    def test_recently_reminded_students_are_skipped(self):
+        self.queue(channels=['email'])
+        self.assertEqual(self.queue(), {'email': 0, 'sms': 2})
+        DuesReminder.objects.filter(student=self.asha, channel='email').update(created_at=timezone.now() - datetime.timedelta(days=8))
+        self.assertEqual(self.queue(), {'email': 1, 'sms': 0})
+        self.assertEqual(self.queue(interval=10), {'email': 0, 'sms': 0})
+
+    def test_send(self):
+        self.queue()
+        self.assertEqual(reminders.send_reminders(batch_size=1), (4, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['asha.rao@example.com', 'bina.rao@example.com'])
+        self.assertEqual(sorted(recipient for recipient, _ in reminders.sms_outbox), ['9000000002', '9876543210'])
+        self.assertFalse(DuesReminder.objects.exclude(status='sent').exists())
+        self.assertEqual(reminders.send_reminders(), (0, 0))
+
+    @override_settings(SMS_BACKEND='apps.students.tests.FailingSmsBackend')
+    def test_failed_sends_are_retried(self):
+        self.queue(channels=['sms'])
+        for _ in range(reminders.MAX_ATTEMPTS - 1):
+            self.assertEqual(reminders.send_reminders(), (0, 0))
+        self.assertEqual(set(DuesReminder.objects.values_list('status', 'attempts', 'last_error')),
+                         {('pending', reminders.MAX_ATTEMPTS - 1, 'gateway down')})
+        self.assertEqual(reminders.send_reminders(), (0, 2))
+        self.assertEqual(set(DuesReminder.objects.values_list('status', flat=True)), {'failed'})
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('dues_reminders', '--days-ahead', '15', '--interval', '7', '--channel', 'sms', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue(), 'sms: 2 reminders would be queued\n')
+        self.assertFalse(DuesReminder.objects.exists())
+
+        out = io.StringIO()
+        call_command('dues_reminders', '--days-ahead', '15', '--interval', '7', '--channel', 'email', '--queue-only', stdout=out)
+        self.assertEqual(out.getvalue(), 'email: 2 reminders were queued\n')
+        self.assertEqual(mail.outbox, [])
+
+        out = io.StringIO()
+        call_command('dues_reminders', '--send-only', stdout=out)
+        self.assertIn('Sent 2 reminders, 0 failed.', out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
@@ -0,0 +1,121 @@
+"""
+The trash: soft-deleted rows of every kind.
+
+The trash page has a tab per TRASH_KINDS entry; each tab loads its rows a page at a
+time from api_trash, seeking on (deleted_at, pk) through the partial trash indexes.
+`manage.py purge_trash` permanently deletes the rows that have been in the trash longer
+than Setting.trash_retention_days, PURGE_CHUNK_SIZE rows per transaction so each one
+holds its locks briefly.
+"""
+import datetime
+
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Student, StudentEnrollment
+from apps.courses.models import Course
+from apps.Enquiries.models import Enquiry
+from apps.Expenses.models import Expense
+from apps.Settings.models import SoftDeleteMixin, get_settings
+from apps.Teams.models import Team
+
+TRASH_PAGE_SIZE = 25
+PURGE_CHUNK_SIZE = 500
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.date):
+        return f'{value:%Y-%m-%d}'
+    return str(value)
+
+
+class TrashKind:
+    """One tab of the trash: its rows, column headings, and how a row is shown and restored."""
+
+    def __init__(self, model, label, icon, columns, cells, restore_url, related=()):
+        self.model = model
+        self.label = label
+        self.icon = icon
+        self.columns = columns
+        self.cells = cells
+        self.restore_url = restore_url
+        self.related = related
+
+    def queryset(self):
+        return self.model.all_objects.filter(is_deleted=True).select_related(*self.related)
+
+    def record(self, obj):
+        return {
+            'cells': [_text(value) for value in self.cells(obj)],
+            'deleted_at': f'{timezone.localtime(obj.deleted_at):%Y-%m-%d %H:%M}' if obj.deleted_at else '',
+            'restore_url': reverse(self.restore_url, args=[obj.pk]),
+        }
+
+
+TRASH_KINDS = {
+    'students': TrashKind(
+        Student, 'Students', 'bi-person', ['Student ID', 'Name', 'Email', 'Contact'],
+        lambda s: [s.student_id, s.full_name, s.email, s.contact], 'student_restore',
+    ),
+    'enrollments': TrashKind(
+        StudentEnrollment, 'Enrollments', 'bi-journal-check', ['ID', 'Student', 'Course', 'Enrollment Date'],
+        lambda e: [e.t_id, e.student.full_name, e.course.course_name, e.enrollment_date], 'enrollment_restore',
+        related=('student', 'course'),
+    ),
+    'enquiries': TrashKind(
+        Enquiry, 'Enquiries', 'bi-chat-left-text', ['Name', 'Email', 'Phone', 'Course', 'City'],
+        lambda e: [e.name, e.email, e.phone, e.course.course_name, e.city], 'enquiry_restore',
+        related=('course',),
+    ),
+    'courses': TrashKind(
+        Course, 'Courses', 'bi-book', ['Name', 'Fee (₹)', 'Duration'],
+        lambda c: [c.course_name, f'{c.course_fee:.2f}', f'{c.course_duration} {c.get_duration_type_display()}'],
+        'course_restore',
+    ),
+    'expenses': TrashKind(
+        Expense, 'Expenses', 'bi-cash-stack', ['Name', 'By', 'Amount (₹)', 'Date'],
+        lambda e: [e.expense_name, e.expense_by.name, f'{e.amount:.2f}', e.date], 'expense_restore',
+        related=('expense_by',),
+    ),
+    'teams': TrashKind(
+        Team, 'Teams', 'bi-people', ['Employee Code', 'Name', 'Designation', 'Email', 'Phone'],
+        lambda t: [t.employee_code, t.name, t.designation, t.email, t.phone], 'team_restore',
+    ),
+}
+
+# Children before parents, so a parent whose trashed rows go in the same run can follow them
+PURGE_ORDER = ('enrollments', 'enquiries', 'expenses', 'students', 'teams', 'courses')
+
+
+def retention_cutoff(days=None):
+    """Rows trashed before this are due for purging (None: Setting.trash_retention_days is 0, keep everything)."""
+    if days is None:
+        days = get_settings().trash_retention_days
+    return timezone.now() - datetime.timedelta(days=days) if days else None
+
+
+def purgeable(model, cutoff):
+    """
+    Rows of `model` trashed before `cutoff`, less those a live row still depends on:
+    deleting them would cascade to it (e.g. a course with a restored enrollment).
+    """
+    rows = model.all_objects.filter(is_deleted=True, deleted_at__lt=cutoff)
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.CASCADE and issubclass(relation.related_model, SoftDeleteMixin):
+            rows = rows.exclude(**{f'{relation.name}__is_deleted': False})
+    return rows
+
+
+def purge(model, cutoff, chunk_size=PURGE_CHUNK_SIZE):
+    """Permanently delete the purgeable rows of `model`, oldest first, a chunk per transaction. Returns the count."""
+    purged = 0
+    while True:
+        with transaction.atomic():
+            pks = list(purgeable(model, cutoff).order_by('deleted_at', 'pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return purged
+            model.all_objects.filter(pk__in=pks).delete()
+        purged += len(pks)
@@ -6,9 +6,11 @@ urlpatterns = [
     # Student routes
     path('', views.student_list, name='student_list'),
     path('create/', views.student_form, name='student_create'),
+    path('import/', views.student_import, name='student_import'),
     path('<int:pk>/detail/', views.student_detail, name='student_detail'),
     path('<int:pk>/edit/', views.student_edit, name='student_edit'),
     path('<int:pk>/delete/', views.student_delete, name='student_delete'),
+    path('referrals/', views.referral_report, name='referral_report'),
     # Optional update alias if needed; else remove duplicate below
     # path('<int:pk>/edit/', views.student_form, name='student_update'),
 
@@ -29,15 +31,25 @@ urlpatterns = [
 
     # API endpoints
     path('api/student-search/', views.api_student_search, name='api_student_search'),
+    path('api/autocomplete/<slug:kind>/', views.api_autocomplete, name='api_autocomplete'),
+    path('api/pending-dues/', views.api_pending_dues, name='api_pending_dues'),
+    path('api/trash/<slug:kind>/', views.api_trash, name='api_trash'),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('api/analytics/<slug:name>/', views.api_analytics, name='api_analytics'),
     path('api/student-enrollments/<str:student_id>/', views.student_enrollments_api, name='student_enrollments_api'),
 
     # Certificates & Receipts
     path('<int:pk>/certificate/', views.view_certificate, name='view_certificate'),
+    path('certificates/batch/', views.certificate_batch, name='certificate_batch'),
     path('<int:pk>/receipt/', views.download_receipt, name='download_receipt'),
     path('payment/<int:payment_id>/receipt/', views.download_payment_receipt, name='download_payment_receipt'),
 
     # Summary reports
     path('payments/summary/', views.payment_summary, name='payment_summary'),
+    path('payments/import/', views.payment_import, name='payment_import'),
+    path('payments/export/', views.payment_export, name='payment_export'),
+    path('expenses/export/', views.expense_export, name='expense_export'),
+    path('export/', views.enrollment_export, name='enrollment_export'),
     path('expenses/summary/', views.expense_summary, name='expense_summary'),
     path('yearly-summary/', views.yearly_summary, name='yearly_summary'),
 ]
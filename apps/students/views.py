@@ -1,105 +1,42 @@
 import datetime
+import io
 from decimal import Decimal
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.db.models.functions import TruncMonth
 from django.contrib.staticfiles import finders
+from django.utils.dateparse import parse_time
+from django.utils.text import slugify
 
 from dateutil import relativedelta
 
-from .models import Student, StudentEnrollment, Payment
+from .models import Student, StudentEnrollment, Payment, MonthlyPaymentRollup, PAYMENT_MODE_CHOICES
 from .forms import StudentEnrollmentForm
+from .payment_import import import_payments
+from .student_import import import_students
+from .exports import export_enrollments, export_payments, export_expenses
+from .referrals import REFERRER_ORDERINGS, referral_stats, referred_students, top_referrers
+from .search import search_students
+from .trash import TRASH_KINDS, TRASH_PAGE_SIZE
+from . import analytics, autocomplete, certificates, documents
 from apps.courses.models import Course
-from apps.Expenses.models import Expense
+from apps.Expenses.models import Expense, MonthlyExpenseRollup
 from apps.Enquiries.models import Enquiry
 from apps.Teams.models import Team
 
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
-from decimal import Decimal
-from .models import Student, StudentEnrollment
-
-def _annotate_enrollments(enrollments):
-    for enrollment in enrollments:
-        enrollment.admission_fee_display = enrollment.admission_fee
-        enrollment.admission_fee_paid_display = enrollment.admission_fee_paid
-        enrollment.admission_fee_remaining_display = enrollment.admission_fee_remaining
-        course_fee = max(enrollment.course.course_fee - enrollment.discount, Decimal('0.00'))
-        enrollment.course_fee_display = course_fee
-        enrollment.course_fee_paid_display = enrollment.course_fee_paid
-        enrollment.course_fee_remaining_display = enrollment.course_fee_remaining
-
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.contrib.auth.decorators import login_required
-
-@login_required
-def student_list(request):
-    order = request.GET.get('order', 'desc')
-    students = Student.objects.filter(is_deleted=False).order_by('-student_id')
-    enrollments_qs = StudentEnrollment.objects.filter(is_deleted=False).select_related('student', 'course')
-    enrollments_qs = enrollments_qs.order_by('enrollment_date' if order == 'asc' else '-enrollment_date')
-
-    # Optional: annotate your enrollments if necessary
-    _annotate_enrollments(enrollments_qs)
-
-    paginator = Paginator(enrollments_qs, 10)  # 10 per page
-    page_number = request.GET.get('page')
-    try:
-        enrollments = paginator.page(page_number)
-    except PageNotAnInteger:
-        enrollments = paginator.page(1)
-    except EmptyPage:
-        enrollments = paginator.page(paginator.num_pages)
-
-    return render(request, 'students/student_list.html', {
-        'students': students,
-        'enrollments': enrollments,  # This must be the Page object, NOT a QuerySet
-        'order': order,
-        'sidebar': 'students',
-        'page_obj': enrollments,
-        'paginator': paginator,
-    })
-
-
-
-@login_required
-def student_trash(request):
-    students = Student.objects.filter(is_deleted=True).order_by('-deleted_at')
-    enrollments = StudentEnrollment.objects.filter(is_deleted=True).select_related('student', 'course').order_by('-deleted_at')
-    enquiries = Enquiry.objects.filter(is_deleted=True).order_by('created_at')
-    courses = Course.objects.filter(is_deleted=True).order_by('-deleted_at')
-    expenses = Expense.objects.filter(is_deleted=True).order_by('-deleted_at')
-    teams = Team.objects.filter(is_deleted=True).order_by('-deleted_at')
-    return render(request, 'students/student_trash.html', {
-        'students': students,
-        'enrollments': enrollments,
-        'enquiries': enquiries,
-        'courses': courses,
-        'expenses': expenses,
-        'teams': teams,
-        'sidebar': 'trash',
-    })
-
-
 @login_required
 def student_detail(request, pk):
     student = get_object_or_404(Student, student_id=pk, is_deleted=False)
-    enrollments = student.enrollments.filter(is_deleted=False).select_related('course')
+    enrollments = student.enrollments.filter(is_deleted=False).with_financials()
     payments = Payment.objects.filter(enrollment__student=student)
-    _annotate_enrollments(enrollments)
-    for e in enrollments:
-        e.total_paid = e.admission_fee_paid + e.course_fee_paid
-        e.remaining_amount = e.admission_fee_remaining + e.course_fee_remaining
-        e.status_display = e.get_status_display()
-        e.payments_count = e.payments.count()
     return render(request, 'students/student_detail.html', {
         'student': student,
         'enrollments': enrollments,
@@ -109,6 +46,23 @@ def student_detail(request, pk):
     })
 
 
+@login_required
+def referral_report(request):
+    """Top referrers by direct referrals, whole referral network or revenue brought in."""
+    order = request.GET.get('order')
+    if order not in REFERRER_ORDERINGS:
+        order = 'direct'
+    return render(request, 'students/referral_report.html', {
+        'referrers': top_referrers(order=order),
+        'order': order,
+        'orderings': REFERRER_ORDERINGS,
+        'unlinked': Student.objects.filter(
+            is_deleted=False, referred_by__isnull=True,
+        ).exclude(referred_by_name__isnull=True).exclude(referred_by_name='').count(),
+        'sidebar': 'students',
+    })
+
+
 @login_required
 def student_form(request):
     if request.method == 'POST':
@@ -211,8 +165,7 @@ def student_edit(request, pk):
 def student_delete(request, pk):
     student = get_object_or_404(Student, student_id=pk, is_deleted=False)
     if request.method == 'POST':
-        student.delete()
-        student.enrollments.filter(is_deleted=False).update(is_deleted=True, deleted_at=timezone.now())
+        student.delete()  # Soft delete, enrollments included
         messages.success(request, "✅ Student and related enrollments moved to trash.")
         return redirect('student_list')
     return render(request, 'students/student_confirm_delete.html', {
@@ -235,6 +188,7 @@ def enrollment_detail(request, pk):
         'enrollment': enrollment,
         'admission_payments': admission_pays,
         'course_payments': course_pays,
+        'installments': enrollment.installments.order_by('number'),
         'all_payments': all_payments,
         'sidebar': 'students',
     })
@@ -422,7 +376,6 @@ def add_payment(request, pk):
             payment_status='paid',
         )
 
-        enrollment.save()
         messages.success(request, 'Payment added successfully.')
 
     except Exception as e:
@@ -447,26 +400,37 @@ def download_receipt(request, pk):
     except Exception:
         pass
 
-    html = render_to_string('students/receipt_pdf.html', {
+    context = {
         'enrollment': enrollment,
         'student': enrollment.student,
         'now': timezone.now(),
         'logo_path': logo_path,
         'student_photo': student_photo,
-    })
-    return HttpResponse(html, content_type='text/html')
+    }
+    return documents.render_document(
+        request, 'students/receipt_pdf.html', context,
+        # The receipt shows the day it was issued, so it is rendered afresh each day
+        depends_on=[enrollment, enrollment.student, enrollment.course, timezone.localdate()],
+        kind=documents.ENROLLMENT_RECEIPT, owner_id=enrollment.pk,
+        filename=f"receipt-{enrollment.t_id or enrollment.pk}.pdf",
+    )
 
 
 @login_required
 def download_payment_receipt(request, payment_id):
-    payment = get_object_or_404(Payment, pk=payment_id)
-    html = render_to_string('students/payment_receipt_pdf.html', {
+    payment = get_object_or_404(Payment.objects.select_related('enrollment__student', 'enrollment__course'), pk=payment_id)
+    context = {
         'payment': payment,
         'student': payment.enrollment.student,
         'enrollment': payment.enrollment,
         'now': timezone.now(),
-    })
-    return HttpResponse(html, content_type='text/html')
+    }
+    return documents.render_document(
+        request, 'students/payment_receipt_pdf.html', context,
+        depends_on=[payment, payment.enrollment, payment.enrollment.student, payment.enrollment.course, timezone.localdate()],
+        kind=documents.PAYMENT_RECEIPT, owner_id=payment.pk,
+        filename=f"payment-receipt-{payment.pk}.pdf",
+    )
 
 
 from decimal import Decimal
@@ -475,17 +439,79 @@ from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
 @login_required
-def payment_summary(request):
-    selected_month = request.GET.get('month', None)
-    search = request.GET.get('search', '').strip()
-    pay_method = request.GET.get('payment_method')
-    pay_mode = request.GET.get('payment_mode')
+def student_import(request):
+    report = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV file to import.')
+        else:
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                report = import_students(stream, dry_run=bool(request.POST.get('dry_run')))
+            except (ValueError, UnicodeDecodeError) as e:
+                messages.error(request, f"Could not import file: {e}")
+            else:
+                if request.POST.get('download_report') and report.rejected:
+                    response = HttpResponse(content_type='text/csv')
+                    response['Content-Disposition'] = 'attachment; filename="student_import_rejected.csv"'
+                    report.write_csv(response)
+                    return response
+                messages.success(request, f"Processed {report.rows_read} rows, {report.students_created} students created.")
+
+    return render(request, 'students/student_import.html', {
+        'report': report,
+        'sidebar': 'students',
+    })
+
+
+@login_required
+def payment_import(request):
+    report = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV file to import.')
+        else:
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                report = import_payments(
+                    stream,
+                    default_mode=request.POST.get('payment_mode') or 'bank_transfer',
+                    dry_run=bool(request.POST.get('dry_run')),
+                )
+            except (ValueError, UnicodeDecodeError) as e:
+                messages.error(request, f"Could not import file: {e}")
+            else:
+                if request.POST.get('download_report') and report.rejected:
+                    response = HttpResponse(content_type='text/csv')
+                    response['Content-Disposition'] = 'attachment; filename="payment_import_unmatched.csv"'
+                    report.write_csv(response)
+                    return response
+                messages.success(request, f"Processed {report.rows_read} rows, {report.payments_posted} payments posted.")
+
+    return render(request, 'students/payment_import.html', {
+        'report': report,
+        'payment_modes': PAYMENT_MODE_CHOICES,
+        'sidebar': 'payments',
+    })
+
+
+def _payment_summary_querysets(params):
+    """
+    Payments and expenses matching the payment summary filters (month, search,
+    payment_method, payment_mode) in a GET QueryDict. Shared with the exports.
+    """
+    selected_month = params.get('month', None)
+    search = params.get('search', '').strip()
+    pay_method = params.get('payment_method')
+    pay_mode = params.get('payment_mode')
 
     # Base payments queryset on enrollments not deleted
     payments = Payment.objects.filter(enrollment__is_deleted=False).select_related(
         'enrollment', 'enrollment__student', 'enrollment__course'
     )
-    expenses = Expense.objects.all()
+    expenses = Expense.objects.filter(is_deleted=False)
 
     # Filter payments and expenses by selected month (payment_date & expense date)
     if selected_month:
@@ -510,24 +536,64 @@ def payment_summary(request):
     if pay_mode:
         payments = payments.filter(payment_mode=pay_mode)
 
+    return payments, expenses
+
+
+def _finance_rollups(params):
+    """
+    MonthlyPaymentRollup / MonthlyExpenseRollup rows matching the month (YYYY-MM) or
+    year, payment_method and payment_mode filters in a GET QueryDict.
+    """
+    payment_rollup = MonthlyPaymentRollup.objects.all()
+    expense_rollup = MonthlyExpenseRollup.objects.all()
+    selected_month = params.get('month')
+    if selected_month:
+        try:
+            year, month = map(int, selected_month.split('-'))
+            month_start = datetime.date(year, month, 1)
+            payment_rollup = payment_rollup.filter(month=month_start)
+            expense_rollup = expense_rollup.filter(month=month_start)
+        except ValueError:
+            pass
+    year = params.get('year')
+    if year:
+        payment_rollup = payment_rollup.filter(month__year=year)
+        expense_rollup = expense_rollup.filter(month__year=year)
+    if params.get('payment_method'):
+        payment_rollup = payment_rollup.filter(payment_method=params['payment_method'])
+    if params.get('payment_mode'):
+        payment_rollup = payment_rollup.filter(payment_mode=params['payment_mode'])
+    return payment_rollup, expense_rollup
+
+
+def _rollup_totals(rollup):
+    """(grand total, [{'month', 'total'}, ...]) of a rollup queryset."""
+    total = rollup.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    by_month = rollup.values('month').annotate(total=Sum('total_amount')).order_by('month')
+    return total, list(by_month)
+
+
+@login_required
+def payment_summary(request):
+    selected_month = request.GET.get('month', None)
+    payments, expenses = _payment_summary_querysets(request.GET)
+
     # Use enrollment.enrollment_date for guidance if needed (example: filter payments after enrollment date)
     # Uncomment if required:
     # payments = payments.filter(payment_date__gte=F('enrollment__enrollment_date'))
 
-    # Total sums
-    total_collected = payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    # Totals come from the monthly rollups; a free-text search needs the payment rows themselves
+    payment_rollup, expense_rollup = _finance_rollups(request.GET)
+    if request.GET.get('search', '').strip():
+        total_collected = payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
+        payments_by_month = payments.annotate(
+            month=TruncMonth('payment_date')
+        ).values('month').annotate(total=Sum('amount_paid')).order_by('month')
+    else:
+        total_collected, payments_by_month = _rollup_totals(payment_rollup)
+    total_expenses, expenses_by_month = _rollup_totals(expense_rollup)
     net_total = max(total_collected - total_expenses, Decimal('0.00'))
 
-    # Group payments and expenses by month for reports
-    payments_by_month = payments.annotate(
-        month=TruncMonth('payment_date')
-    ).values('month').annotate(total=Sum('amount_paid')).order_by('month')
-
-    expenses_by_month = expenses.annotate(
-        month=TruncMonth('date')
-    ).values('month').annotate(total=Sum('amount')).order_by('month')
-
     return render(request, 'students/payment_summary.html', {
         'payments': payments,
         'expenses': expenses,
@@ -541,9 +607,9 @@ def payment_summary(request):
     })
 
 
-@login_required
-def expense_summary(request):
-    selected_month = request.GET.get('month')
+def _expense_summary_querysets(params):
+    """Expenses and payments for the expense summary's month filter. Shared with the exports."""
+    selected_month = params.get('month')
     year = None
     month = None
     if selected_month:
@@ -552,26 +618,55 @@ def expense_summary(request):
         except Exception:
             year = month = None
 
-    expenses = Expense.objects.all()
+    expenses = Expense.objects.filter(is_deleted=False)
     payments = Payment.objects.filter(enrollment__is_deleted=False)
 
     if year and month:
         expenses = expenses.filter(date__year=year, date__month=month)
         payments = payments.filter(payment_date__year=year, payment_date__month=month)
+    return expenses, payments
+
 
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_payments = payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
+@login_required
+def expense_summary(request):
+    expenses, payments = _expense_summary_querysets(request.GET)
+
+    payment_rollup, expense_rollup = _finance_rollups(request.GET)
+    total_expenses = expense_rollup.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    total_payments = payment_rollup.aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
     net_total = max(total_payments - total_expenses, Decimal('0.00'))
 
-    return render(request, 'expenses/expense_summary.html', {
-        'expenses': expenses.order_by('-date'),
+    expenses = expenses.select_related('expense_by').order_by('-date')
+    return render(request, 'students/expense_summary.html', {
+        'expenses': expenses,
+        'recent_expenses': expenses,
         'total_expenses': total_expenses,
         'total_payments': total_payments,
+        'total_payment_collected': total_payments,
         'net_total': net_total,
+        'selected_month': request.GET.get('month', ''),
         'sidebar': 'expenses',
     })
 
 
+@login_required
+def payment_export(request):
+    payments, _ = _payment_summary_querysets(request.GET)
+    return export_payments(payments, request.GET.get('format'))
+
+
+@login_required
+def expense_export(request):
+    expenses, _ = _expense_summary_querysets(request.GET)
+    return export_expenses(expenses, request.GET.get('format'))
+
+
+@login_required
+def enrollment_export(request):
+    enrollments = StudentEnrollment.objects.filter(_enrollment_filters(request.GET))
+    return export_enrollments(enrollments, request.GET.get('format'))
+
+
 @login_required
 def yearly_summary(request):
     year = request.GET.get('year')
@@ -582,24 +677,23 @@ def yearly_summary(request):
         year = current_year
     years_range = list(range(current_year - 5, current_year + 1))
 
-    payments = Payment.objects.filter(enrollment__is_deleted=False, payment_date__year=year)
-    expenses = Expense.objects.filter(date__year=year)
-
-    total_collected = payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    payment_rollup, expense_rollup = _finance_rollups({'year': year})
+    total_collected, payments_by_month = _rollup_totals(payment_rollup)
+    total_expenses, expenses_by_month = _rollup_totals(expense_rollup)
     net_total = max(total_collected - total_expenses, Decimal('0.00'))
 
-    payments_by_month = payments.annotate(month=TruncMonth('payment_date')).values('month').annotate(total=Sum('amount_paid')).order_by('month')
-    expenses_by_month = expenses.annotate(month=TruncMonth('date')).values('month').annotate(total=Sum('amount')).order_by('month')
-
     return render(request, 'students/yearly_summary.html', {
         'year': year,
         'years_range': years_range,
+        'year_range': years_range,
         'total_collected': total_collected,
         'total_expenses': total_expenses,
         'net_total': net_total,
-        'payments_by_month': list(payments_by_month),
-        'expenses_by_month': list(expenses_by_month),
+        'yearly_payments': total_collected,
+        'yearly_expenses': total_expenses,
+        'yearly_net': net_total,
+        'payments_by_month': payments_by_month,
+        'expenses_by_month': expenses_by_month,
         'sidebar': 'yearly',
     })
 
@@ -608,8 +702,7 @@ def yearly_summary(request):
 def student_restore(request, pk):
     student = get_object_or_404(Student, student_id=pk, is_deleted=True)
     if request.method == 'POST':
-        student.restore()
-        student.enrollments.filter(is_deleted=True).update(is_deleted=False, deleted_at=None)
+        student.restore()  # With the enrollments trashed along with it
         messages.success(request, '✅ Student and related enrollments restored.')
         return redirect('student_detail', student.student_id)
     return render(request, 'students/restore_confirm.html', {
@@ -650,13 +743,7 @@ def api_student_search(request):
     if not q:
         return JsonResponse([], safe=False)
 
-    students = Student.objects.filter(
-        Q(full_name__icontains=q) |
-        Q(email__icontains=q) |
-        Q(contact__icontains=q) |
-        Q(student_id__icontains=q),
-        is_deleted=False
-    )[:10]
+    students = search_students(q)
 
     results = [{
         'student_id': s.student_id,
@@ -669,6 +756,14 @@ def api_student_search(request):
     return JsonResponse(results, safe=False)
 
 
+@login_required
+def api_autocomplete(request, kind):
+    """Typeahead for the student picker and course fields, from the in-process index."""
+    if kind not in autocomplete.INDEXES:
+        raise Http404("Unknown autocomplete index")
+    return JsonResponse(autocomplete.autocomplete(kind, request.GET.get('q', '')), safe=False)
+
+
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
@@ -678,7 +773,7 @@ from .models import Student
 @login_required
 def student_enrollments_api(request, student_id):
     student = get_object_or_404(Student, student_id=student_id, is_deleted=False)
-    enrollments = student.enrollments.filter(is_deleted=False).select_related('course')
+    enrollments = student.enrollments.filter(is_deleted=False).with_financials()
 
     data = {
         "enrollments": [
@@ -686,8 +781,8 @@ def student_enrollments_api(request, student_id):
                 "id": e.id,
                 "course": e.course.course_name,
                 "final_amount": float(e.final_amount),
-                "paid": float(e.admission_fee_paid + e.course_fee_paid),
-                "due": float(e.admission_fee_remaining + e.course_fee_remaining),
+                "paid": float(e.total_paid_amount),
+                "due": float(e.total_remaining_amount),
                 "due_date": e.due_date.strftime("%Y-%m-%d") if e.due_date else "",
                 "status": e.get_status_display(),
             }
@@ -707,9 +802,8 @@ from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 import datetime
-import re
 from dateutil import relativedelta
-from .models import StudentEnrollment
+from .models import StudentEnrollment, reserve_certificate_numbers
 
 @login_required
 def view_certificate(request, pk):
@@ -717,34 +811,56 @@ def view_certificate(request, pk):
 
     # Assign certificate number if none exists
     if not enrollment.certificate_number:
-        last_cert = StudentEnrollment.objects.exclude(certificate_number__isnull=True)\
-            .exclude(certificate_number='').order_by('-id').first()
-        next_num = 1
-        if last_cert:
-            match = re.search(r"CP-CN-(\d+)", last_cert.certificate_number)
-            if match:
-                next_num = int(match.group(1)) + 1
-        enrollment.certificate_number = f"CP-CN-{next_num:03d}"
-        enrollment.save()
-
-    # Use getattr with fallback to avoid AttributeError if 'duration' missing
-    duration = getattr(enrollment.course, 'course_duration', 0) or 0
-    dtype = getattr(enrollment.course, "duration_type", "months")
+        enrollment.certificate_number = reserve_certificate_numbers()[0]
+        enrollment.save(update_fields=['certificate_number'])
+
+    context, depends_on = certificates.certificate_document(enrollment)
+    return documents.render_document(
+        request, certificates.CERTIFICATE_TEMPLATE, context,
+        depends_on=depends_on,
+        kind=documents.CERTIFICATE, owner_id=enrollment.pk,
+        filename=f"certificate-{enrollment.certificate_number}.pdf",
+    )
 
-    if dtype == "months":
-        end_date = enrollment.enrollment_date + relativedelta.relativedelta(months=duration)
-    elif dtype == "weeks":
-        end_date = enrollment.enrollment_date + datetime.timedelta(weeks=duration)
-    elif dtype == "days":
-        end_date = enrollment.enrollment_date + datetime.timedelta(days=duration)
-    else:
-        end_date = None
 
-    return render(request, "students/certificate.html", {
-        "student": enrollment.student,
-        "enrollment": enrollment,
-        "end_date": end_date,
-        "now": timezone.now(),
+@login_required
+def certificate_batch(request):
+    """
+    Complete a batch (course + batch time, or a list of enrollment IDs) and download
+    all of its certificates as one ZIP.
+    """
+    if request.method == 'POST':
+        enrollment_ids = request.POST.get('enrollment_ids', '').replace(',', ' ').split()
+        course_id = request.POST.get('course', '')
+        course = Course.objects.filter(pk=course_id, is_deleted=False).first() if course_id.isdigit() else None
+        batch_time = parse_time(request.POST.get('batch_time') or '')
+        if not enrollment_ids and course is None:
+            messages.error(request, 'Choose a course or enter enrollment IDs.')
+        else:
+            enrollments = certificates.complete_enrollments(
+                certificates.batch_enrollments(course, batch_time, enrollment_ids)
+            )
+            if not enrollments:
+                messages.error(request, 'No enrollments match that batch.')
+            else:
+                response = StreamingHttpResponse(
+                    certificates.certificate_zip_stream(enrollments, request), content_type='application/zip',
+                )
+                label = slugify(course.course_name) if course and not enrollment_ids else 'batch'
+                response['Content-Disposition'] = (
+                    f'attachment; filename="certificates_{label}_{timezone.localdate():%Y%m%d}.zip"'
+                )
+                return response
+
+    batches = StudentEnrollment.objects.filter(
+        is_deleted=False, student__is_deleted=False, status='active', course__is_deleted=False,
+    ).values('course_id', 'course__course_name', 'batch_time').annotate(students=Count('pk')).order_by(
+        'course__course_name', 'batch_time',
+    )
+    return render(request, 'students/certificate_batch.html', {
+        'batches': batches,
+        'courses': Course.objects.filter(is_deleted=False).order_by('course_name'),
+        'sidebar': 'students',
     })
 import datetime
 from decimal import Decimal
@@ -762,7 +878,7 @@ from django.contrib.staticfiles import finders
 
 from dateutil import relativedelta
 
-from .models import Student, StudentEnrollment, Payment
+from .models import Student, StudentEnrollment, Payment, STATUS_CHOICES
 from .forms import StudentEnrollmentForm
 from apps.courses.models import Course
 from apps.Expenses.models import Expense
@@ -770,68 +886,192 @@ from apps.Enquiries.models import Enquiry
 from apps.Teams.models import Team
 
 
-def _annotate_enrollments(enrollments):
-    for enrollment in enrollments:
-        enrollment.admission_fee_display = enrollment.admission_fee
-        enrollment.admission_fee_paid_display = enrollment.admission_fee_paid
-        enrollment.admission_fee_remaining_display = enrollment.admission_fee_remaining
+ENROLLMENT_PAGE_SIZE = 25
+PENDING_DUES_PAGE_SIZE = 25
+PAYMENT_STATUS_CHOICES = StudentEnrollment._meta.get_field('payment_status').choices
 
-        course_fee = max(enrollment.course.course_fee - enrollment.discount, Decimal('0.00'))
-        enrollment.course_fee_display = course_fee
-        enrollment.course_fee_paid_display = enrollment.course_fee_paid
-        enrollment.course_fee_remaining_display = enrollment.course_fee_remaining
+
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _enrollment_filters(params):
+    """
+    Build the server-side enrollment filters (course, status, payment_status,
+    batch_time, date_from/date_to) from a GET QueryDict.
+    """
+    filters = Q(is_deleted=False)
+    course = params.get('course')
+    if course and course.isdigit():
+        filters &= Q(course_id=int(course))
+    status = params.get('status')
+    if status in dict(STATUS_CHOICES):
+        filters &= Q(status=status)
+    payment_status = params.get('payment_status')
+    if payment_status in dict(PAYMENT_STATUS_CHOICES):
+        filters &= Q(payment_status=payment_status)
+    batch_time = params.get('batch_time')
+    if batch_time:
+        try:
+            filters &= Q(batch_time=datetime.time.fromisoformat(batch_time))
+        except ValueError:
+            pass
+    date_from = _parse_date(params.get('date_from'))
+    if date_from:
+        filters &= Q(enrollment_date__gte=date_from)
+    date_to = _parse_date(params.get('date_to'))
+    if date_to:
+        filters &= Q(enrollment_date__lte=date_to)
+    return filters
+
+
+def _seek_page(queryset, key, cursor, parse, descending=True, size=ENROLLMENT_PAGE_SIZE):
+    """
+    Keyset (seek) pagination over (key, pk). `cursor` is the "value|pk" of the last
+    row already shown; returns (rows, next_cursor), with next_cursor None on the last page.
+    """
+    op = 'lt' if descending else 'gt'
+    if cursor:
+        try:
+            raw_value, raw_id = cursor.rsplit('|', 1)
+            value, pk = parse(raw_value), queryset.model._meta.pk.to_python(raw_id)
+        except (ValueError, ArithmeticError, ValidationError):
+            value = None
+        if value is not None:
+            queryset = queryset.filter(
+                Q(**{f'{key}__{op}e': value}),
+                Q(**{f'{key}__{op}': value}) | Q(**{key: value, f'pk__{op}': pk}),
+            )
+    prefix = '-' if descending else ''
+    rows = list(queryset.order_by(f'{prefix}{key}', f'{prefix}pk')[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = f"{getattr(rows[-1], key)}|{rows[-1].pk}"
+    return rows, next_cursor
 
 
 @login_required
 def student_list(request):
     order = request.GET.get('order', 'desc')
-    students = Student.objects.filter(is_deleted=False).order_by('-student_id')
-    enrollments = StudentEnrollment.objects.filter(is_deleted=False).select_related('student', 'course')
-    enrollments = enrollments.order_by('student_id' if order == 'asc' else '-student_id')
-    pending = enrollments.exclude(payment_status='paid')
-    _annotate_enrollments(enrollments)
-    _annotate_enrollments(pending)
+    enrollments = StudentEnrollment.objects.filter(_enrollment_filters(request.GET)).with_financials()
+    enrollments, next_cursor = _seek_page(
+        enrollments, 'enrollment_date', request.GET.get('after'), datetime.date.fromisoformat,
+        descending=order != 'asc',
+    )
+
+    # Query string without the cursor, so pagination links keep the active filters
+    params = request.GET.copy()
+    params.pop('after', None)
+
     return render(request, 'students/student_list.html', {
-        'students': students,
         'enrollments': enrollments,
-        'pending': pending,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
+        'query_string': params.urlencode(),
+        'filters': request.GET,
+        'courses': Course.objects.filter(is_deleted=False).order_by('course_name'),
+        'status_choices': STATUS_CHOICES,
+        'payment_status_choices': PAYMENT_STATUS_CHOICES,
         'order': order,
         'sidebar': 'students',
     })
 
+
+@login_required
+def dashboard(request):
+    # Page shell only; the charts fetch their data from api_analytics after the page renders
+    return render(request, 'students/dashboard.html', {
+        'datasets': list(analytics.DATASETS),
+        'sidebar': 'dashboard',
+    })
+
+
+@login_required
+def api_analytics(request, name):
+    try:
+        data = analytics.get_analytics(name)
+    except KeyError:
+        raise Http404("Unknown dataset")
+    response = JsonResponse(data)
+    response['Cache-Control'] = f'private, max-age={analytics.ANALYTICS_CACHE_TIMEOUT // 5}'
+    return response
+
+
+@login_required
+def api_pending_dues(request):
+    """
+    Paginated pending-dues panel: enrollments with an outstanding balance, largest first.
+    Seeks on (amount_remaining, id) so each page is an index range scan.
+    """
+    params = request.GET.copy()
+    params.pop('payment_status', None)
+    pending = StudentEnrollment.objects.filter(
+        _enrollment_filters(params), amount_remaining__gt=0,
+    ).select_related('student', 'course')
+    rows, next_cursor = _seek_page(
+        pending, 'amount_remaining', request.GET.get('after'), Decimal, size=PENDING_DUES_PAGE_SIZE,
+    )
+    return JsonResponse({
+        'results': [{
+            'id': e.pk,
+            'student_id': e.student.student_id,
+            'full_name': e.student.full_name,
+            'father_name': e.student.father_name,
+            'email': e.student.email,
+            'contact': e.student.contact,
+            'course': e.course.course_name,
+            'admission_fee_paid': str(e.admission_fee_paid),
+            'course_fee_paid': str(e.course_fee_paid),
+            'amount_due': str(e.amount_due),
+            'amount_remaining': str(e.amount_remaining),
+            'payment_status': e.payment_status,
+        } for e in rows],
+        'next_cursor': next_cursor,
+    })
+
+
 @login_required
 def student_trash(request):
-    students = Student.objects.filter(is_deleted=True).order_by('-deleted_at')
-    enrollments = StudentEnrollment.objects.filter(is_deleted=True).select_related('student', 'course').order_by('-deleted_at')
-    enquiries = Enquiry.objects.filter(is_deleted=True).order_by('created_at')
-    courses = Course.objects.filter(is_deleted=True).order_by('-deleted_at')
-    expenses = Expense.objects.filter(is_deleted=True).order_by('-deleted_at')
-    teams = Team.objects.filter(is_deleted=True).order_by('-deleted_at')
+    # Tab shell with per-kind counts; each tab fetches its rows from api_trash when first shown
+    tab = request.GET.get('tab')
     return render(request, 'students/student_trash.html', {
-        'students': students,
-        'enrollments': enrollments,
-        'enquiries': enquiries,
-        'courses': courses,
-        'expenses': expenses,
-        'teams': teams,
+        'kinds': [(name, kind, kind.queryset().count()) for name, kind in TRASH_KINDS.items()],
+        'active_tab': tab if tab in TRASH_KINDS else next(iter(TRASH_KINDS)),
         'sidebar': 'trash',
     })
 
+
+@login_required
+def api_trash(request, kind):
+    """A page of one kind of trashed record, most recently deleted first."""
+    try:
+        trash_kind = TRASH_KINDS[kind]
+    except KeyError:
+        raise Http404("Unknown kind")
+    rows, next_cursor = _seek_page(
+        trash_kind.queryset(), 'deleted_at', request.GET.get('after'), datetime.datetime.fromisoformat,
+        size=TRASH_PAGE_SIZE,
+    )
+    return JsonResponse({
+        'results': [trash_kind.record(obj) for obj in rows],
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def student_detail(request, pk):
     student = get_object_or_404(Student, student_id=pk, is_deleted=False)
-    enrollments = student.enrollments.filter(is_deleted=False).select_related('course')
+    enrollments = student.enrollments.filter(is_deleted=False).with_financials()
     payments = Payment.objects.filter(enrollment__student=student)
-    _annotate_enrollments(enrollments)
-    for e in enrollments:
-        e.total_paid = e.admission_fee_paid + e.course_fee_paid
-        e.remaining_amount = e.admission_fee_remaining + e.course_fee_remaining
-        e.status_display = e.get_status_display()
-        e.payments_count = e.payments.count()
     return render(request, 'students/student_detail.html', {
         'student': student,
         'enrollments': enrollments,
         'payments': payments,
+        'referral_stats': referral_stats([student.pk])[student.pk],
+        'referred_students': referred_students(student.pk, max_depth=2),
         'now': timezone.now(),
         'sidebar': 'students',
     })
@@ -938,7 +1178,6 @@ def add_payment(request, pk):
             remarks=payment_type,
             payment_status='paid',
         )
-        enrollment.save()
         messages.success(request, 'Payment added successfully.')
     except Exception as e:
         messages.error(request, f"Error adding payment: {str(e)}")